@@ -1,7 +1,16 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from router import router
+from services.admission import admission_middleware, admission_stats
+from services.deadlines import DeadlineExceeded, DeadlineMiddleware, RequestCancelled
+from services.ann_index import ANN_INDEX_ENABLED, snapshot_index
+from services.jobs import JOBS_DB_PATH, get_job_queue, stop_job_queue
+from services.memory import install_memory_metrics, memory_report, memory_tracking_middleware
+from services.model_pools import pool_stats, priority_middleware, shutdown_pools
+from services.near_duplicates import near_duplicate_stats
+from services.profiling import profiling_enabled, profiling_middleware
+from services.sharding import shard_stats
 import logging
 import time
 import os
@@ -30,6 +39,8 @@ REQUEST_LATENCY = Histogram(
     'HTTP request latency',
     ['method', 'endpoint']
 )
+# Memory gauges (process, models, caches, per-endpoint peaks) are computed at scrape time
+install_memory_metrics()
 
 app = FastAPI(
     title="Python ML API",
@@ -79,6 +90,31 @@ async def error_handling_middleware(request: Request, call_next):
             content={"detail": "Internal server error", "error": str(e)}
         )
 
+# Per-endpoint memory tracking for /debug/memory
+app.middleware("http")(memory_tracking_middleware)
+
+# Opt-in request profiling; not installed at all unless configured, so it costs nothing when off
+if profiling_enabled():
+    app.middleware("http")(profiling_middleware)
+
+# Admission control runs first so shed requests are cheap and never reach the models
+app.middleware("http")(admission_middleware)
+
+# Interactive vs bulk lane for model pool scheduling
+app.middleware("http")(priority_middleware)
+
+# Outermost: attach each request's deadline and disconnect flag for everything below
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+@app.exception_handler(RequestCancelled)
+async def request_cancelled_handler(request: Request, exc: RequestCancelled):
+    # 499 "client closed request"; nobody reads it, but it keeps the metrics honest
+    return JSONResponse(status_code=499, content={"detail": str(exc)})
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -94,6 +130,48 @@ async def metrics():
     from prometheus_client import generate_latest
     return Response(generate_latest(), media_type="text/plain")
 
+# Current admission state per endpoint
+@app.get("/debug/admission")
+async def debug_admission():
+    return admission_stats()
+
+# Queued model calls per pool and priority lane
+@app.get("/debug/pools")
+async def debug_pools():
+    return pool_stats()
+
+# Memory breakdown by process, model, cache and endpoint
+@app.get("/debug/memory")
+async def debug_memory():
+    return memory_report()
+
+# Encodes skipped in bulk embedding because a near-duplicate ticket was encoded
+@app.get("/debug/near-duplicates")
+async def debug_near_duplicates():
+    return near_duplicate_stats()
+
+# Calls, cache hit rates and load skew per shard of the sharded model pools
+@app.get("/debug/shards")
+async def debug_shards():
+    return shard_stats()
+
+# Resume bulk jobs interrupted by the last shutdown
+@app.on_event("startup")
+async def resume_jobs():
+    if os.path.exists(JOBS_DB_PATH):
+        get_job_queue()
+
+# Stop background work and persist state so restarts resume quickly
+@app.on_event("shutdown")
+async def shutdown():
+    stop_job_queue()
+    shutdown_pools()
+    if ANN_INDEX_ENABLED:
+        try:
+            snapshot_index()
+        except Exception as e:
+            logger.error(f"Failed to snapshot ANN index: {str(e)}", exc_info=True)
+
 # Include the router that handles ML requests
 app.include_router(router, prefix="/api/v1")
 
@@ -1,13 +1,28 @@
 # routers/user_router.py
-from fastapi import APIRouter, HTTPException
-from services.DistilBERT_embedding import get_distilbert_embeddings
-from services.SBERT_embedding import get_embedded_text
-from services.extract_keywords import extract_keywords_from_embedding
-from services.summarize import summarize_texts
-from services.answer import get_answer_from_tickets
-from services.intent_classification import classify_ticket_intent
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Response
+from services.DistilBERT_embedding import get_distilbert_embeddings, MODEL_NAME as DISTILBERT_MODEL_NAME
+from services.SBERT_embedding import (
+    get_embedded_text, encode_texts, combine_ticket_text, resolve_embedding_model,
+    DEFAULT_EMBEDDING_MODEL, DEFAULT_MODEL_NAME as SBERT_MODEL_NAME
+)
+from services.extract_keywords import embedding_digest, extract_keywords_from_embedding, KEYWORD_MODEL_NAME
+from services.summarize import summarize_with_details, MODEL_NAME as SUMMARIZATION_MODEL_NAME
+from services.answer import get_answer_from_tickets, answer_questions, MODEL_NAME as QA_MODEL_NAME, QA_MAX_QUESTIONS
+from services.intent_classification import classify_ticket_intent, intent_model_name
+from services.single_flight import single_flight, make_key
+from services.deadlines import WorkDropped
+from services.ann_index import get_index, snapshot_index, ANN_DEFAULT_NPROBE, ANN_INDEX_ENABLED, ANN_MAX_NLIST, ANN_MAX_TOP_K
+from services.rerank import rerank, lexical_overlap, lexical_text
+from services.embedding_compaction import compact, OUTPUT_MODES
+from services.jobs import get_job_queue, read_tickets_file, resolve_input_path
+from services.enrich import enrich_tickets, ENRICH_OUTPUTS
+from services.model_pools import run_in_pool
+from services.serialization import NumpyJSONResponse
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
+import asyncio
+import os
 import numpy as np
 
 router = APIRouter()
@@ -21,45 +36,144 @@ class QuestionRequest(BaseModel):
     question: str
     tickets: List[Ticket]
 
+class QuestionsRequest(BaseModel):
+    questions: List[str]
+    tickets: List[Ticket]
+
+class SimilarRequest(BaseModel):
+    subject: str
+    description: str
+    top_k: int = Field(10, gt=0, le=ANN_MAX_TOP_K)
+    nprobe: int = Field(ANN_DEFAULT_NPROBE, gt=0, le=ANN_MAX_NLIST)
+
+class IndexedTicket(BaseModel):
+    id: str
+    subject: str = ""
+    description: str = ""
+    embedding: Optional[List[float]] = None
+
+class IndexDeleteRequest(BaseModel):
+    ids: List[str]
+
+class RerankQuery(BaseModel):
+    subject: str = ""
+    description: str = ""
+    embedding: Optional[List[float]] = None
+
+class RerankCandidate(BaseModel):
+    id: str
+    subject: Optional[str] = None
+    description: Optional[str] = None
+    embedding: Optional[List[float]] = None
+
+class RerankRequest(BaseModel):
+    query: RerankQuery
+    candidates: List[RerankCandidate]
+    top_k: int = Field(10, gt=0, le=ANN_MAX_TOP_K)
+    lexical_weight: float = Field(0.0, ge=0.0, le=1.0)
+
+class JobRequest(BaseModel):
+    operations: List[str]
+    tickets: Optional[List[Dict]] = None
+    input_path: Optional[str] = None
+    batch_size: int = 32
+
+class EnrichRequest(BaseModel):
+    ticket: Optional[Ticket] = None
+    tickets: Optional[List[Ticket]] = None
+    outputs: List[str] = list(ENRICH_OUTPUTS)
+
+def _ticket_parts(tickets) -> List[str]:
+    """
+    Flatten tickets into the subject/description parts used for single-flight keys.
+    """
+    parts = []
+    for ticket in tickets:
+        if isinstance(ticket, dict):
+            parts.extend([ticket.get("subject", ""), ticket.get("description", "")])
+        else:
+            parts.extend([ticket.subject, ticket.description])
+    return parts
+
+def _ann_index():
+    try:
+        return get_index()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 @router.post("/distilbert-embed")
 async def embed_ticket(tickets: list[dict[str, str]]):
     """
     API endpoint to generate DistilBERT embeddings for multiple tickets.
     """
-    embeddings = get_distilbert_embeddings(tickets)
-    return embeddings
+    key = make_key("distilbert-embed", DISTILBERT_MODEL_NAME, *_ticket_parts(tickets))
+    embeddings = await single_flight.do(key, get_distilbert_embeddings, tickets)
+    return NumpyJSONResponse(embeddings)
 
 @router.post("/sbert-embed")
-async def sbert_embed_tickets(tickets: list[dict[str, str]]):
+async def sbert_embed_tickets(tickets: list[dict[str, str]], output: str = "float", model: str = DEFAULT_EMBEDDING_MODEL):
     """
     API endpoint to generate SBERT embeddings for multiple tickets.
+    `output` selects full float vectors (default), a PCA-reduced projection ("pca"),
+    int8 codes with per-vector scales ("int8"), or both ("pca_int8").
+    `model` selects the encoder: "mpnet" (default) or the faster "minilm". Vectors from
+    different models are not comparable; the response names the model in X-Embedding-Model.
     """
-    embeddings = get_embedded_text(tickets)
-    return embeddings
+    if output not in OUTPUT_MODES:
+        raise HTTPException(status_code=400, detail=f"output must be one of {', '.join(OUTPUT_MODES)}")
+    try:
+        _, encoder = resolve_embedding_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    key = make_key(encoder.operation, encoder.model_name, *_ticket_parts(tickets))
+    embeddings = await single_flight.do(key, get_embedded_text, tickets, encoder.model_name)
+    headers = {"X-Embedding-Model": encoder.model_name}
+    if output == "float":
+        return NumpyJSONResponse(embeddings, headers=headers)
+
+    try:
+        compacted = compact(embeddings, output, model_name=encoder.model_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return NumpyJSONResponse(compacted, headers=headers)
 
 @router.post("/extract-keywords")
 async def extract_ticket_keywords(ticket: Ticket):
     """
-    API endpoint to extract relevant kewords from a ticket
+    API endpoint to extract relevant kewords from a ticket.
+    The ticket is only re-encoded when no embedding is sent.
     """
-    ticket_embedding = np.array(ticket.embedding)
-    keywords = extract_keywords_from_embedding(ticket.dict(), ticket_embedding)
+    ticket_embedding = np.array(ticket.embedding) if ticket.embedding is not None else None
+    key = make_key(
+        "extract-keywords", KEYWORD_MODEL_NAME, ticket.subject, ticket.description, embedding_digest(ticket_embedding)
+    )
+    keywords = await single_flight.do(key, extract_keywords_from_embedding, ticket.dict(), ticket_embedding)
     return keywords
 
 @router.post("/summarize")
-async def summarize_ticket_text(tickets: List[Ticket]):
+async def summarize_ticket_text(tickets: List[Ticket], response: Response, details: bool = False):
     """
-    API endpoint to summarize multiple ticket descriptions
+    API endpoint to summarize multiple ticket descriptions.
+    X-Summary-Degraded is "true" when the request's time budget forced a cheaper summary for
+    any ticket; `details` returns the tier, strategy and degraded flag of every summary.
     """
     try:
         # Combine subject and description for each ticket
         texts = [f"{ticket.subject} {ticket.description}" for ticket in tickets]
         
         # Get summaries for the list of texts
-        summaries = summarize_texts(texts)
+        key = make_key("summarize", SUMMARIZATION_MODEL_NAME, *texts)
+        results = await single_flight.do(key, summarize_with_details, texts)
+        response.headers["X-Summary-Degraded"] = str(any(result["degraded"] for result in results)).lower()
         
         # Return summaries with corresponding ticket ids or other identifiers if needed
-        return summaries
+        if details:
+            return results
+        return [result["summary"] for result in results]
+    except WorkDropped:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,8 +183,28 @@ async def answer_question(request: QuestionRequest):
     API endpoint to answer a question based on a list of tickets.
     """
     try:
-        answer = get_answer_from_tickets(request.question, [ticket.dict() for ticket in request.tickets])
+        key = make_key("answer", QA_MODEL_NAME, request.question, *_ticket_parts(request.tickets))
+        answer = await single_flight.do(key, get_answer_from_tickets, request.question, [ticket.dict() for ticket in request.tickets])
         return answer
+    except WorkDropped:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/answer-questions")
+async def answer_many_questions(request: QuestionsRequest):
+    """
+    API endpoint to answer several questions about the same tickets in one pass.
+    Answers are returned in question order. At most QA_MAX_QUESTIONS questions per request.
+    """
+    if len(request.questions) > QA_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {QA_MAX_QUESTIONS} questions per request")
+    try:
+        key = make_key("answer-questions", QA_MODEL_NAME, str(len(request.questions)), *request.questions, *_ticket_parts(request.tickets))
+        answers = await single_flight.do(key, answer_questions, request.questions, [ticket.dict() for ticket in request.tickets])
+        return answers
+    except WorkDropped:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -80,7 +214,203 @@ async def classify_intent(ticket: Ticket):
     API endpoint to classify the intent of a support ticket.
     """
     try:
-        intents = classify_ticket_intent(ticket.subject, ticket.description)
+        key = make_key("classify-intent", intent_model_name, ticket.subject, ticket.description)
+        intents = await single_flight.do(key, classify_ticket_intent, ticket.subject, ticket.description)
         return intents
+    except WorkDropped:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/similar")
+async def similar_tickets(request: SimilarRequest):
+    """
+    API endpoint to embed a ticket and return the ids and scores of the most similar indexed tickets.
+    """
+    index = _ann_index()
+    ticket = {"subject": request.subject, "description": request.description}
+    key = make_key("sbert-embed", SBERT_MODEL_NAME, *_ticket_parts([ticket]))
+    embedding = (await single_flight.do(key, get_embedded_text, [ticket]))[0]
+    matches = await asyncio.to_thread(index.search, embedding, request.top_k, request.nprobe)
+    return [{"id": ticket_id, "score": score} for ticket_id, score in matches]
+
+@router.post("/index/tickets")
+async def index_tickets(tickets: List[IndexedTicket]):
+    """
+    API endpoint to insert or replace tickets in the similarity index.
+    Tickets sent without an embedding are embedded with SBERT first.
+    """
+    index = _ann_index()
+    missing = [ticket.dict() for ticket in tickets if ticket.embedding is None]
+    computed = []
+    if missing:
+        key = make_key("sbert-embed", SBERT_MODEL_NAME, *_ticket_parts(missing))
+        computed = await single_flight.do(key, get_embedded_text, missing)
+    computed = iter(computed)
+    vectors = [ticket.embedding if ticket.embedding is not None else next(computed) for ticket in tickets]
+    try:
+        indexed = await asyncio.to_thread(index.upsert, [ticket.id for ticket in tickets], vectors)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"indexed": indexed, "size": await asyncio.to_thread(len, index)}
+
+@router.post("/index/delete")
+async def delete_indexed_tickets(request: IndexDeleteRequest):
+    """
+    API endpoint to remove tickets from the similarity index.
+    Index calls run off the event loop, as they wait for the index lock while it trains.
+    """
+    index = _ann_index()
+    removed = await asyncio.to_thread(index.delete, request.ids)
+    return {"removed": removed, "size": await asyncio.to_thread(len, index)}
+
+@router.post("/index/snapshot")
+async def snapshot_similarity_index():
+    """
+    API endpoint to write the similarity index to disk for fast restarts.
+    """
+    index = _ann_index()
+    await asyncio.to_thread(snapshot_index)
+    return await asyncio.to_thread(index.stats)
+
+@router.get("/index/stats")
+async def similarity_index_stats():
+    """
+    API endpoint to report the size and training state of the similarity index.
+    """
+    return await asyncio.to_thread(_ann_index().stats)
+
+def _rerank_candidates(request: RerankRequest):
+    """
+    Resolve the query and candidate vectors and rerank them.
+    Candidates without an embedding are looked up in the similarity index by id,
+    then in the embedding cache by text; only the remaining misses are encoded.
+    """
+    query_text = combine_ticket_text(request.query.dict())
+    query_vector = request.query.embedding
+    if query_vector is None:
+        query_vector = encode_texts([query_text])[0]
+
+    vectors = [candidate.embedding for candidate in request.candidates]
+    unresolved = [i for i, vector in enumerate(vectors) if vector is None]
+
+    if unresolved and ANN_INDEX_ENABLED:
+        indexed = get_index().get([request.candidates[i].id for i in unresolved])
+        for i in unresolved:
+            vectors[i] = indexed.get(request.candidates[i].id)
+        unresolved = [i for i in unresolved if vectors[i] is None]
+
+    candidate_texts = [
+        combine_ticket_text(candidate.dict()) if candidate.subject or candidate.description else None
+        for candidate in request.candidates
+    ]
+    without_text = [request.candidates[i].id for i in unresolved if candidate_texts[i] is None]
+    if without_text:
+        raise ValueError(f"Candidates need an embedding, an indexed id or text: {without_text[:10]}")
+    if unresolved:
+        encoded = encode_texts([candidate_texts[i] for i in unresolved])
+        for i, vector in zip(unresolved, encoded):
+            vectors[i] = vector
+
+    # Lexical overlap only applies when the query has text to match
+    lexical_scores = None
+    lexical_query = lexical_text(request.query.subject, request.query.description)
+    if request.lexical_weight > 0 and lexical_query:
+        lexical_scores = lexical_overlap(lexical_query, [
+            lexical_text(candidate.subject, candidate.description) or None for candidate in request.candidates
+        ])
+
+    return rerank(
+        query_vector,
+        np.vstack([np.asarray(vector, dtype=np.float32) for vector in vectors]),
+        [candidate.id for candidate in request.candidates],
+        top_k=request.top_k,
+        lexical_scores=lexical_scores,
+        lexical_weight=request.lexical_weight
+    )
+
+@router.post("/rerank")
+async def rerank_candidates(request: RerankRequest):
+    """
+    API endpoint to rerank candidate tickets against a query and return the top-k ids and scores.
+    """
+    if not request.candidates:
+        return []
+    try:
+        # Runs in this process even when SBERT is isolated: it reads the similarity index
+        return await run_in_pool("sbert", _rerank_candidates, request, local=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/jobs")
+async def create_job(request: JobRequest):
+    """
+    API endpoint to queue a bulk enrichment job over tickets sent inline or read from a server-side
+    file under JOBS_INPUT_DIR.
+    """
+    if (request.tickets is None) == (request.input_path is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'tickets' or 'input_path'")
+    tickets = request.tickets
+    if request.input_path is not None:
+        try:
+            tickets = read_tickets_file(resolve_input_path(request.input_path))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await asyncio.to_thread(get_job_queue().submit, tickets, request.operations, request.batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """
+    API endpoint to list recent jobs with their progress.
+    """
+    return await asyncio.to_thread(get_job_queue().list, limit)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    API endpoint to poll a job's status, progress and throughput.
+    """
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    API endpoint to cancel a queued or running job after its current batch.
+    """
+    job = await asyncio.to_thread(get_job_queue().cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str):
+    """
+    API endpoint to download the JSONL results written so far.
+    """
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not os.path.exists(job["output_path"]):
+        raise HTTPException(status_code=404, detail="Job has no results yet")
+    return FileResponse(job["output_path"], media_type="application/x-ndjson")
+
+@router.post("/enrich")
+async def enrich(request: EnrichRequest):
+    """
+    API endpoint to compute any of embedding, intent, keywords and summary for a ticket
+    or a batch of tickets in one pass, sharing normalization and the SBERT embedding.
+    """
+    if (request.ticket is None) == (request.tickets is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'ticket' or 'tickets'")
+    tickets = [request.ticket] if request.ticket is not None else request.tickets
+    try:
+        results = await enrich_tickets([ticket.dict() for ticket in tickets], request.outputs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return NumpyJSONResponse(results[0] if request.ticket is not None else results)
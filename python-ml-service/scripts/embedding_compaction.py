@@ -0,0 +1,84 @@
+"""
+Fit and evaluate the reduced-dimension embedding projection.
+
+    python scripts/embedding_compaction.py fit tickets.jsonl --dim 128
+    python scripts/embedding_compaction.py evaluate tickets.jsonl --k 10
+
+Input is a .npy matrix of SBERT embeddings or a JSON/JSONL file of tickets with
+'subject' and 'description' (embedded with the service's SBERT model).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_compaction import (  # noqa: E402
+    OUTPUT_MODES, PROJECTION_PATH, evaluate_recall, fit_projection, load_projection, save_projection
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_embeddings(path: str, model_name: str) -> np.ndarray:
+    """Load embeddings from a .npy file, or embed the tickets in a JSON/JSONL file."""
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float32)
+
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            tickets = [json.loads(line) for line in f if line.strip()]
+        else:
+            tickets = json.load(f)
+
+    from services.SBERT_embedding import get_embedded_text
+    logger.info(f"Embedding {len(tickets)} tickets with {model_name}")
+    return np.asarray(get_embedded_text(tickets, model_name), dtype=np.float32)
+
+
+def report(embeddings: np.ndarray, projection, ks):
+    for mode in OUTPUT_MODES:
+        if mode.startswith("pca") and projection is None:
+            continue
+        recalls = ", ".join(f"recall@{k}={evaluate_recall(embeddings, mode, projection, k=k):.4f}" for k in ks)
+        logger.info(f"{mode:>9}: {recalls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["fit", "evaluate"])
+    parser.add_argument("input", help=".npy embeddings or JSON/JSONL tickets")
+    parser.add_argument("--dim", type=int, default=128, help="Number of PCA components to keep")
+    parser.add_argument("--output", default=PROJECTION_PATH, help="Projection artifact path")
+    parser.add_argument("--model", default="all-mpnet-base-v2", help="SBERT model the embeddings come from")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of the sample kept out of fitting")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    embeddings = load_embeddings(args.input, args.model)
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(embeddings))
+    split = int(len(embeddings) * (1 - args.holdout))
+    train, holdout = embeddings[order[:split]], embeddings[order[split:]]
+
+    if args.command == "fit":
+        projection = fit_projection(train, args.dim, args.model)
+        save_projection(args.output, projection)
+        logger.info(
+            f"Saved {args.dim}-dim projection to {args.output} "
+            f"(explained variance {projection['explained_variance_ratio'].sum():.3f})"
+        )
+    else:
+        projection = load_projection(args.output) if os.path.exists(args.output) else None
+
+    logger.info(f"Recall against full-precision vectors on {len(holdout)} held-out embeddings:")
+    report(holdout, projection, args.k)
+
+
+if __name__ == "__main__":
+    main()
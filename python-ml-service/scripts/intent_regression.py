@@ -0,0 +1,85 @@
+"""
+Accuracy and latency regression check for the intent classifier.
+
+    python scripts/intent_regression.py --output intent-baseline.json
+    python scripts/intent_regression.py --baseline intent-baseline.json --output intent-report.json
+
+Runs classify_ticket_intent over a labeled dataset (JSON/JSONL tickets with
+'subject', 'description' and 'intent'), reports per-intent precision/recall,
+per-stage latency and tickets per second, and exits non-zero when accuracy or
+p95 latency regresses against the baseline report.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.intent_evaluation import (  # noqa: E402
+    EVALUATION_MODES, compare_reports, evaluate, load_labeled_tickets
+)
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_tickets.jsonl")
+
+
+def print_report(report: dict):
+    print(f"Model {report['model']}, fingerprint {report['fingerprint']}, {report['tickets']} tickets")
+    for mode, result in report["modes"].items():
+        total = result["latency"]["total"]
+        print(f"\n[{mode}] accuracy {result['accuracy']:.4f}  macro F1 {result['macro_f1']:.4f}  "
+              f"{result['tickets_per_second']:.1f} tickets/s  p50 {total['p50_ms']:.2f}ms  p95 {total['p95_ms']:.2f}ms")
+        print(f"  {'intent':<24}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>9}")
+        for intent, metrics in result["per_intent"].items():
+            print(f"  {intent:<24}{metrics['precision']:>10.4f}{metrics['recall']:>10.4f}"
+                  f"{metrics['f1']:>10.4f}{metrics['support']:>9}")
+        if result["unexpected_predictions"]:
+            print(f"  predicted outside the label set: {', '.join(result['unexpected_predictions'])}")
+        for stage, latency in result["latency"]["stages"].items():
+            print(f"  stage {stage:<14} mean {latency['mean_ms']:.3f}ms  p95 {latency['p95_ms']:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", nargs="?", default=DEFAULT_DATASET, help="Labeled tickets (JSON or JSONL)")
+    parser.add_argument("--modes", nargs="+", default=list(EVALUATION_MODES), choices=EVALUATION_MODES)
+    parser.add_argument("--output", help="Where to save the report (JSON)")
+    parser.add_argument("--baseline", help="Earlier report to check for regressions")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    parser.add_argument("--max-recall-drop", type=float, default=0.05)
+    parser.add_argument("--max-latency-increase", type=float, default=0.25,
+                        help="Allowed relative p95 latency increase, e.g. 0.25 for +25%%")
+    args = parser.parse_args()
+
+    tickets = load_labeled_tickets(args.dataset)
+    report = evaluate(tickets, args.modes)
+    report["dataset"] = args.dataset
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("fingerprint") == report["fingerprint"]:
+            print("\nBaseline has the same ruleset and model fingerprint; differences are run-to-run noise")
+        regressions = compare_reports(
+            report, baseline, args.max_accuracy_drop, args.max_recall_drop, args.max_latency_increase
+        )
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark response serialization of embedding batches.
+
+    python scripts/serialization_benchmark.py --batches 1 10 50 --dim 768
+
+Compares the old path (ndarray -> .tolist() -> FastAPI jsonable_encoder -> JSONResponse)
+with NumpyJSONResponse rendering the arrays directly, for float vectors and int8 codes.
+Reports milliseconds per response and body size. Runs without loading any model.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import serialization  # noqa: E402
+from services.embedding_compaction import compact  # noqa: E402
+from services.serialization import NumpyJSONResponse  # noqa: E402
+
+
+def list_response(content) -> bytes:
+    if isinstance(content, dict):
+        content = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in content.items()}
+    else:
+        content = content.tolist()
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def numpy_response(content) -> bytes:
+    return NumpyJSONResponse(content).body
+
+
+def time_call(fn, content, repeat: int) -> float:
+    fn(content)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(content)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Encoder: {'orjson' if serialization.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'payload':<16}{'batch':>7}{'lists ms':>11}{'numpy ms':>11}{'speedup':>9}{'lists KB':>11}{'numpy KB':>11}")
+    rng = np.random.default_rng(0)
+    for batch in args.batches:
+        vectors = rng.standard_normal((batch, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        payloads = {"float": vectors, "int8": compact(vectors, "int8")}
+        for name, content in payloads.items():
+            before = time_call(list_response, content, args.repeat)
+            after = time_call(numpy_response, content, args.repeat)
+            print(f"{name:<16}{batch:>7}{before:>11.3f}{after:>11.3f}{before / after:>8.1f}x"
+                  f"{len(list_response(content)) / 1024:>11.1f}{len(numpy_response(content)) / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
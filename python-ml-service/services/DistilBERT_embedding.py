@@ -1,56 +1,70 @@
+import numpy as np
 import torch
 from transformers import DistilBertTokenizer, DistilBertModel
 import os
+from services.deadlines import check_deadline
+from services.model_workers import loads_model_here
+from services.single_flight import dedupe_batch, normalize_input
+from services.text_normalization import ticket_text
 
 # Set cache directory for models
 cache_dir = os.environ.get('TRANSFORMERS_CACHE', '/app/models')
 
-# Load DistilBERT model and tokenizer with proper error handling
-try:
-    distilbert_model = DistilBertModel.from_pretrained(
-        "distilbert-base-uncased",
-        cache_dir=cache_dir,
-        local_files_only=False  # Try online first, fallback to local
-    )
-    distilbert_tokenizer = DistilBertTokenizer.from_pretrained(
-        "distilbert-base-uncased",
-        cache_dir=cache_dir,
-        local_files_only=False
-    )
-    print("DistilBERT model loaded successfully")
-except Exception as e:
-    print(f"Error loading DistilBERT model: {e}")
-    # Try loading from local cache only
+MODEL_NAME = "distilbert-base-uncased"
+
+# Load DistilBERT model and tokenizer with proper error handling (only in its worker process
+# when the distilbert pool is isolated)
+distilbert_model = None
+distilbert_tokenizer = None
+if loads_model_here("distilbert"):
     try:
         distilbert_model = DistilBertModel.from_pretrained(
             "distilbert-base-uncased",
             cache_dir=cache_dir,
-            local_files_only=True
+            local_files_only=False  # Try online first, fallback to local
         )
         distilbert_tokenizer = DistilBertTokenizer.from_pretrained(
             "distilbert-base-uncased",
             cache_dir=cache_dir,
-            local_files_only=True
+            local_files_only=False
         )
-        print("DistilBERT model loaded from local cache")
-    except Exception as local_e:
-        print(f"Failed to load DistilBERT model from cache: {local_e}")
-        distilbert_model = None
-        distilbert_tokenizer = None
+        print("DistilBERT model loaded successfully")
+    except Exception as e:
+        print(f"Error loading DistilBERT model: {e}")
+        # Try loading from local cache only
+        try:
+            distilbert_model = DistilBertModel.from_pretrained(
+                "distilbert-base-uncased",
+                cache_dir=cache_dir,
+                local_files_only=True
+            )
+            distilbert_tokenizer = DistilBertTokenizer.from_pretrained(
+                "distilbert-base-uncased",
+                cache_dir=cache_dir,
+                local_files_only=True
+            )
+            print("DistilBERT model loaded from local cache")
+        except Exception as local_e:
+            print(f"Failed to load DistilBERT model from cache: {local_e}")
+            distilbert_model = None
+            distilbert_tokenizer = None
 
 def get_distilbert_embeddings(tickets):
     """
-    Generates DistilBERT CLS token embeddings for an array of tickets.
+    Generates DistilBERT CLS token embeddings for an array of tickets, one float32 row per ticket.
+    Duplicate tickets are encoded once and fanned back out.
     """
     if distilbert_model is None or distilbert_tokenizer is None:
         raise RuntimeError("DistilBERT model not available. Please check model loading.")
     
+    texts = [ticket_text(ticket.get("subject"), ticket.get("description")) for ticket in tickets]
+    unique_positions, inverse = dedupe_batch("distilbert-embed", [normalize_input(text) for text in texts])
+
     embeddings = []
     
-    for ticket in tickets:
-        subject = ticket.get("subject", "")
-        description = ticket.get("description", "")
-        combined_text = f"{subject} [SEP] {description}"
+    for position in unique_positions:
+        check_deadline("distilbert-embed")
+        combined_text = texts[position]
         
         # Tokenize
         tokens = distilbert_tokenizer(combined_text, return_tensors="pt", truncation=True, padding=True)
@@ -60,7 +74,9 @@ def get_distilbert_embeddings(tickets):
             output = distilbert_model(**tokens)
         
         # Extract CLS token embedding
-        cls_embedding = output.last_hidden_state[:, 0, :].squeeze().tolist()
+        cls_embedding = output.last_hidden_state[0, 0, :].float().cpu().numpy()
         embeddings.append(cls_embedding)
     
-    return embeddings
+    if not embeddings:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(embeddings)[np.asarray(inverse, dtype=np.intp)]
@@ -1,47 +1,123 @@
 import os
 import gc
+import threading
+import time
+import numpy as np
 import torch
+from prometheus_client import Counter, Histogram
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Tuple
 from functools import lru_cache
+from services.cache import LRUCache
+from services.deadlines import check_deadline
+from services.near_duplicates import group_near_duplicates
+from services.single_flight import dedupe_batch, normalize_input
+from services.text_normalization import ticket_text
 
 # Set cache directory
 cache_dir = os.environ.get('SENTENCE_TRANSFORMERS_HOME', '/app/models/sentence-transformers')
 
-# Global model instance
-_model = None
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '10000'))
 
-def get_model(model_name='all-mpnet-base-v2') -> SentenceTransformer:
+class EmbeddingModel(NamedTuple):
+    model_name: str
+    # Single-flight operation for this model, which also selects its model pool
+    operation: str
+
+# Encoders the embedding endpoints can select with ?model=. Vectors from different
+# models are not comparable, so stored vectors (the similarity index, PCA projection)
+# stay on the default model.
+EMBEDDING_MODELS = {
+    "mpnet": EmbeddingModel("all-mpnet-base-v2", "sbert-embed"),
+    "minilm": EmbeddingModel("all-MiniLM-L6-v2", "minilm-embed"),
+}
+DEFAULT_EMBEDDING_MODEL = "mpnet"
+
+# Default encoder used by the embedding endpoints
+DEFAULT_MODEL_NAME = EMBEDDING_MODELS[DEFAULT_EMBEDDING_MODEL].model_name
+
+EMBEDDING_TEXTS = Counter(
+    'ml_embedding_texts_total',
+    'Texts embedded, by model and whether the vector came from the cache or the model',
+    ['model', 'source']
+)
+EMBEDDING_BATCH_SECONDS = Histogram(
+    'ml_embedding_batch_seconds',
+    'Model time per encoded batch',
+    ['model'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Loaded model instances by model name
+_models: Dict[str, SentenceTransformer] = {}
+_models_lock = threading.Lock()
+
+# Normalized float32 embeddings, one cache per model keyed by normalized text
+_embedding_caches: Dict[str, LRUCache] = {}
+_caches_lock = threading.Lock()
+
+def resolve_embedding_model(selector: str) -> Tuple[str, EmbeddingModel]:
     """
-    Get or create the model instance. Uses a singleton pattern to avoid reloading.
+    Look up an embedding model by short name ("minilm") or model name ("all-MiniLM-L6-v2").
     """
-    global _model
-    if _model is None:
-        try:
-            # Clear any existing model from memory
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-            gc.collect()
-            
-            # Load the model
-            _model = SentenceTransformer(model_name, cache_folder=cache_dir)
-            
-            # Set model to evaluation mode
-            _model.eval()
-            
-            # Move to CPU and use float32 for better memory efficiency
-            _model = _model.to('cpu')
-            _model.half()  # Use float16 instead of float32
-            
-            print(f"Model {model_name} loaded successfully")
-        except Exception as e:
-            print(f"Error loading model {model_name}: {e}")
-            raise RuntimeError(f"SentenceTransformer model {model_name} not available. Please check model loading.")
+    for name, model in EMBEDDING_MODELS.items():
+        if selector in (name, model.model_name):
+            return name, model
+    raise ValueError(f"Unknown embedding model '{selector}'. Expected one of {', '.join(EMBEDDING_MODELS)}")
+
+def _short_name(model_name: str) -> str:
+    for name, model in EMBEDDING_MODELS.items():
+        if model.model_name == model_name:
+            return name
+    return model_name
+
+def _cache_for(model_name: str) -> LRUCache:
+    cache = _embedding_caches.get(model_name)
+    if cache is None:
+        with _caches_lock:
+            cache = _embedding_caches.get(model_name)
+            if cache is None:
+                cache = LRUCache(f"sbert-embeddings-{_short_name(model_name)}", EMBEDDING_CACHE_SIZE)
+                _embedding_caches[model_name] = cache
+    return cache
+
+def get_model(model_name=DEFAULT_MODEL_NAME) -> SentenceTransformer:
+    """
+    Get or create the instance of a model. Each model is loaded once and shared.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            try:
+                # Clear any existing model from memory
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                gc.collect()
+                
+                # Load the model
+                model = SentenceTransformer(model_name, cache_folder=cache_dir)
+                
+                # Set model to evaluation mode
+                model.eval()
+                
+                # Move to CPU and use float32 for better memory efficiency
+                model = model.to('cpu')
+                model.half()  # Use float16 instead of float32
+                
+                _models[model_name] = model
+                print(f"Model {model_name} loaded successfully")
+            except Exception as e:
+                print(f"Error loading model {model_name}: {e}")
+                raise RuntimeError(f"SentenceTransformer model {model_name} not available. Please check model loading.")
     
-    return _model
+    return model
 
 @lru_cache(maxsize=1000)
-def get_cached_embedding(text: str, model_name='all-mpnet-base-v2') -> List[float]:
+def get_cached_embedding(text: str, model_name=DEFAULT_MODEL_NAME) -> List[float]:
     """
     Get embedding for a single text with caching.
     """
@@ -50,55 +126,88 @@ def get_cached_embedding(text: str, model_name='all-mpnet-base-v2') -> List[floa
         embedding = model.encode(text, convert_to_tensor=True, normalize_embeddings=True)
         return embedding.tolist()
 
-def get_embedded_text(tickets: List[Dict[str, str]], model_name='all-mpnet-base-v2') -> List[List[float]]:
+def combine_ticket_text(ticket: Dict[str, str]) -> str:
+    """
+    Combine subject and description into the text SBERT encodes, safely handling None values.
+    """
+    return ticket_text(ticket.get("subject"), ticket.get("description"))
+
+def encode_texts(texts: List[str], model_name=DEFAULT_MODEL_NAME, batch_size: int = 5) -> np.ndarray:
     """
-    Extract embeddings using SBERT (Sentence-BERT).
+    Encode texts into normalized float32 embeddings, one row per text.
+    Cached vectors are reused and only the misses go through the model.
+    The returned rows must be treated as read-only.
+    """
+    cache = _cache_for(model_name)
+    short_name = _short_name(model_name)
+    operation = EMBEDDING_MODELS[short_name].operation if short_name in EMBEDDING_MODELS else "sbert-embed"
+    vectors = [cache.get(normalize_input(text)) for text in texts]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    EMBEDDING_TEXTS.labels(model=short_name, source="cache").inc(len(texts) - len(missing))
+    EMBEDDING_TEXTS.labels(model=short_name, source="model").inc(len(missing))
+
+    if missing:
+        model = get_model(model_name)
+
+        # Process in smaller batches to manage memory
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            check_deadline(operation)
+
+            started = time.perf_counter()
+            with torch.no_grad():  # Disable gradient calculation
+                batch_embeddings = model.encode(
+                    [texts[i] for i in batch],
+                    convert_to_tensor=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+            batch_embeddings = batch_embeddings.float().cpu().numpy()
+            EMBEDDING_BATCH_SECONDS.labels(model=short_name).observe(time.perf_counter() - started)
+
+            for i, vector in zip(batch, batch_embeddings):
+                vector.setflags(write=False)
+                vectors[i] = vector
+                cache.set(normalize_input(texts[i]), vector)
+
+            # Clear memory after each batch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            gc.collect()
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(vectors)
+
+def get_embedded_text(tickets: List[Dict[str, str]], model_name=DEFAULT_MODEL_NAME,
+                      near_duplicates: bool = False) -> np.ndarray:
+    """
+    Extract embeddings using SBERT (Sentence-BERT), one float32 row per ticket.
     Uses caching and memory-efficient processing.
+    Duplicate tickets in the batch are encoded once and fanned back out. With
+    `near_duplicates`, tickets that differ only slightly (ids, timestamps) share the
+    vector of one representative; meant for bulk ingestion, not per-request embedding.
     """
-    embeddings = []
-    model = get_model(model_name)
-    
-    # Process in smaller batches to manage memory
-    batch_size = 5
-    for i in range(0, len(tickets), batch_size):
-        batch = tickets[i:i + batch_size]
-        batch_texts = []
-        
-        for ticket in batch:
-            # Ensure 'subject' and 'description' are not None
-            subject = ticket.get("subject", "")
-            description = ticket.get("description", "")
-            
-            # Combine subject and description, safely handling None values
-            combined_text = (subject or "") + " [SEP] " + (description or "")
-            batch_texts.append(combined_text)
-        
-        # Get embeddings for the batch
-        with torch.no_grad():  # Disable gradient calculation
-            batch_embeddings = model.encode(
-                batch_texts,
-                convert_to_tensor=True,
-                normalize_embeddings=True,
-                show_progress_bar=False
-            )
-            embeddings.extend(batch_embeddings.tolist())
-        
-        # Clear memory after each batch
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        gc.collect()
-    
-    return embeddings
+    texts = [combine_ticket_text(ticket) for ticket in tickets]
+    unique_positions, inverse = dedupe_batch("sbert-embed", [normalize_input(text) for text in texts])
+    inverse = np.asarray(inverse, dtype=np.intp)
+
+    if near_duplicates:
+        representatives, groups = group_near_duplicates(
+            "sbert-embed", [texts[position] for position in unique_positions]
+        )
+        unique_positions = [unique_positions[slot] for slot in representatives]
+        inverse = np.asarray(groups, dtype=np.intp)[inverse]
+
+    embeddings = encode_texts([texts[position] for position in unique_positions], model_name)
+    return embeddings[inverse]
 
 def clear_model_cache():
     """
     Clear the model cache and free memory.
     """
-    global _model
-    if _model is not None:
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        del _model
-        _model = None
+    with _models_lock:
+        _models.clear()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
     gc.collect()
-
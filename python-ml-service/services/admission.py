@@ -0,0 +1,212 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Gauge, Histogram
+
+from services.deadlines import DeadlineExceeded, RequestState, WorkDropped, check_deadline, current_state, operation_name
+
+# Concurrent requests and queued requests per operation (see deadlines.operation_name),
+# e.g. "summarize=1:8,answer=2:16". Operations without a limit are admitted immediately.
+DEFAULT_ADMISSION_LIMITS = {
+    "sbert-embed": (4, 32),
+    "minilm-embed": (8, 64),
+    "distilbert-embed": (2, 16),
+    "extract-keywords": (4, 32),
+    "classify-intent": (8, 64),
+    "summarize": (2, 16),
+    "answer": (2, 16),
+    "answer-questions": (2, 16),
+    "enrich": (2, 16),
+    "similar": (4, 32),
+    "rerank": (4, 32),
+}
+# Longest a request may wait in the queue before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '30'))
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'ml_admission_queue_depth',
+    'Requests waiting for admission',
+    ['endpoint']
+)
+ADMISSION_ACTIVE = Gauge(
+    'ml_admission_active',
+    'Requests admitted and running',
+    ['endpoint']
+)
+ADMISSION_WAIT = Histogram(
+    'ml_admission_wait_seconds',
+    'Time spent waiting for admission',
+    ['endpoint'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+ADMISSION_REJECTED = Counter(
+    'ml_admission_rejected_total',
+    'Requests shed by admission control',
+    ['endpoint', 'reason']
+)
+
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    limits = dict(DEFAULT_ADMISSION_LIMITS)
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        concurrency, _, queue = value.partition(":")
+        limits[name.strip()] = (max(int(concurrency), 1), max(int(queue or 0), 0))
+    return limits
+
+
+ADMISSION_LIMITS = _parse_limits(os.environ.get('ADMISSION_LIMITS', ''))
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted; carries the suggested Retry-After in seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one endpoint.
+
+    A released slot is handed directly to the oldest waiter, so queued requests are
+    served in order and a newcomer cannot overtake them. Retry-After is estimated from
+    a moving average of service time and the current queue length.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_time = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._service_time * (self.queued + 1) / self.concurrency))
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self._admit()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTED.labels(endpoint=self.name, reason="queue_full").inc()
+            raise Overloaded("queue_full", self.retry_after())
+
+        # Never wait past the request's own deadline
+        timeout = self.queue_timeout
+        state = current_state()
+        if isinstance(state, RequestState) and state.remaining() is not None:
+            timeout = min(timeout, state.remaining())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(endpoint=self.name).set(len(self._waiters))
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.labels(endpoint=self.name).set(len(self._waiters))
+            if isinstance(e, asyncio.TimeoutError):
+                check_deadline(self.name, stage="admission")
+                ADMISSION_REJECTED.labels(endpoint=self.name, reason="timeout").inc()
+                raise Overloaded("timeout", self.retry_after())
+            raise
+        finally:
+            ADMISSION_WAIT.labels(endpoint=self.name).observe(time.monotonic() - start_time)
+
+        try:
+            # The client may have gone or run out of time while queued
+            check_deadline(self.name, stage="admission")
+        except WorkDropped:
+            self.release()
+            raise
+
+    def _admit(self):
+        self.active += 1
+        ADMISSION_ACTIVE.labels(endpoint=self.name).set(self.active)
+
+    def release(self, service_time: Optional[float] = None):
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            ADMISSION_QUEUE_DEPTH.labels(endpoint=self.name).set(len(self._waiters))
+            if not waiter.done():
+                # The slot moves to the waiter; active count is unchanged
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        ADMISSION_ACTIVE.labels(endpoint=self.name).set(self.active)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "service_time": round(self._service_time, 4),
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {
+    name: AdmissionController(name, concurrency, max_queue)
+    for name, (concurrency, max_queue) in ADMISSION_LIMITS.items()
+}
+
+
+def get_controller(path: str, query_string: str = "") -> Optional[AdmissionController]:
+    return _controllers.get(operation_name(path, query_string))
+
+
+def admission_stats() -> Dict[str, dict]:
+    return {name: controller.stats() for name, controller in _controllers.items()}
+
+
+async def admission_middleware(request, call_next):
+    """
+    Bound concurrency and queueing per operation; shed excess load with 503 and Retry-After.
+    """
+    controller = get_controller(request.url.path, request.url.query)
+    if controller is None:
+        return await call_next(request)
+
+    try:
+        await controller.acquire()
+    except Overloaded as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service overloaded ({e.reason}), retry later"},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except DeadlineExceeded as e:
+        return JSONResponse(status_code=504, content={"detail": str(e)})
+    except WorkDropped as e:
+        return JSONResponse(status_code=499, content={"detail": str(e)})
+
+    start_time = time.monotonic()
+    try:
+        return await call_next(request)
+    finally:
+        controller.release(time.monotonic() - start_time)
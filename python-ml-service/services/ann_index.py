@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Index configuration
+ANN_INDEX_ENABLED = os.environ.get('ANN_INDEX_ENABLED', 'false').lower() == 'true'
+ANN_INDEX_PATH = os.environ.get('ANN_INDEX_PATH', '/app/data/ann-index')
+ANN_TRAIN_THRESHOLD = int(os.environ.get('ANN_TRAIN_THRESHOLD', '2048'))
+ANN_DEFAULT_NPROBE = int(os.environ.get('ANN_NPROBE', '8'))
+# Largest number of inverted lists a trained index uses, and of results one search returns
+ANN_MAX_NLIST = 4096
+ANN_MAX_TOP_K = 1000
+
+_SNAPSHOT_FILES = ("vectors.npy", "assignments.npy", "alive.npy", "meta.json")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _spherical_kmeans(data: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Cluster unit vectors into `nlist` centroids with spherical k-means (inner-product assignment).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Re-seed empty clusters from random points so every list stays usable
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.integers(0, len(data), int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids.astype(np.float32)
+
+
+class ANNIndex:
+    """
+    In-process inverted-file (IVF) index over unit-normalized embeddings.
+
+    Vectors live in one growable float32 matrix; every row is assigned to its nearest
+    coarse centroid. Searches score only the rows in the `nprobe` closest lists and fall
+    back to an exact scan until enough vectors exist to train the centroids.
+    Rows are deleted by tombstoning and compacted on snapshot.
+    """
+
+    def __init__(self, dim: Optional[int] = None, train_threshold: int = ANN_TRAIN_THRESHOLD):
+        self.dim = dim
+        self.train_threshold = train_threshold
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._count = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": len(self._rows),
+                "rows": self._count,
+                "dim": self.dim,
+                "lists": 0 if self._centroids is None else len(self._centroids),
+                "trained": self._centroids is not None,
+            }
+
+    def _ensure_capacity(self, extra: int):
+        needed = self._count + extra
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        vectors = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        vectors[:self._count] = self._vectors[:self._count]
+        assignments = np.zeros(new_capacity, dtype=np.int32)
+        assignments[:self._count] = self._assignments[:self._count]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._count] = self._alive[:self._count]
+        self._vectors, self._assignments, self._alive = vectors, assignments, alive
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def upsert(self, ids: Sequence[str], vectors) -> int:
+        """
+        Insert or replace vectors by id. Returns the number of vectors written.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        if len(ids) == 0:
+            return 0
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+            vectors = _normalize_rows(vectors)
+            assignments = self._assign(vectors)
+            self._ensure_capacity(len(ids))
+
+            for ticket_id, vector, assignment in zip(ids, vectors, assignments):
+                ticket_id = str(ticket_id)
+                row = self._rows.get(ticket_id)
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                    self._ids.append(ticket_id)
+                    self._rows[ticket_id] = row
+                self._vectors[row] = vector
+                self._assignments[row] = assignment
+                self._alive[row] = True
+
+            self._maybe_train()
+            return len(ids)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """
+        Remove vectors by id. Unknown ids are ignored. Returns the number removed.
+        """
+        removed = 0
+        with self._lock:
+            for ticket_id in ids:
+                row = self._rows.pop(str(ticket_id), None)
+                if row is not None:
+                    self._alive[row] = False
+                    removed += 1
+        return removed
+
+    def get(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Return the stored (normalized) vectors for the ids present in the index.
+        """
+        with self._lock:
+            return {
+                str(ticket_id): self._vectors[self._rows[str(ticket_id)]].copy()
+                for ticket_id in ids if str(ticket_id) in self._rows
+            }
+
+    def _maybe_train(self):
+        alive = len(self._rows)
+        if alive < self.train_threshold:
+            return
+        # Retrain when the index has grown well past the data the centroids were fitted on
+        if self._centroids is not None and alive < self._trained_size * 4:
+            return
+        self.train()
+
+    def train(self, iterations: int = 10):
+        """
+        Fit the coarse centroids on the live vectors and reassign every row.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._count])
+            if len(rows) == 0:
+                return
+            nlist = int(min(max(np.sqrt(len(rows)), 1), ANN_MAX_NLIST))
+            sample = rows
+            if len(rows) > nlist * 256:
+                sample = np.random.default_rng(0).choice(rows, nlist * 256, replace=False)
+            self._centroids = _spherical_kmeans(self._vectors[sample], nlist, iterations)
+            self._assignments[:self._count] = self._assign(self._vectors[:self._count])
+            self._trained_size = len(rows)
+            logger.info(f"ANN index trained with {nlist} lists over {len(rows)} vectors")
+
+    def search(self, query, top_k: int = 10, nprobe: int = ANN_DEFAULT_NPROBE) -> List[Tuple[str, float]]:
+        """
+        Return up to `top_k` (id, cosine score) pairs for the query, best first.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            if not self._rows:
+                return []
+            if query.shape[1] != self.dim:
+                raise ValueError(f"Expected a query of dimension {self.dim}, got {query.shape[1]}")
+            query = _normalize_rows(query)[0]
+
+            alive = self._alive[:self._count]
+            if self._centroids is None:
+                candidates = np.flatnonzero(alive)
+            else:
+                nprobe = min(max(nprobe, 1), len(self._centroids))
+                probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+                candidates = np.flatnonzero(alive & np.isin(self._assignments[:self._count], probes))
+            if len(candidates) == 0:
+                return []
+
+            scores = self._vectors[candidates] @ query
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(self._ids[candidates[i]], float(scores[i])) for i in best]
+
+    def snapshot(self, path: str = ANN_INDEX_PATH):
+        """
+        Write a compacted copy of the index to `path`, replacing any previous snapshot atomically.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._count])
+            tmp_path = f"{path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            np.save(os.path.join(tmp_path, "vectors.npy"), self._vectors[rows])
+            np.save(os.path.join(tmp_path, "assignments.npy"), self._assignments[rows])
+            np.save(os.path.join(tmp_path, "alive.npy"), np.ones(len(rows), dtype=bool))
+            if self._centroids is not None:
+                np.save(os.path.join(tmp_path, "centroids.npy"), self._centroids)
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({
+                    "dim": self.dim,
+                    "ids": [self._ids[row] for row in rows],
+                    "trained_size": self._trained_size,
+                }, f)
+
+            old_path = f"{path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(path):
+                os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            logger.info(f"ANN index snapshot with {len(rows)} vectors written to {path}")
+
+    @classmethod
+    def load(cls, path: str = ANN_INDEX_PATH, train_threshold: int = ANN_TRAIN_THRESHOLD) -> "ANNIndex":
+        """
+        Load a snapshot. The vector matrix is memory-mapped copy-on-write, so restarts do not
+        re-read the whole file up front and updates never touch the snapshot on disk.
+        """
+        if not all(os.path.exists(os.path.join(path, name)) for name in _SNAPSHOT_FILES):
+            raise FileNotFoundError(f"No ANN index snapshot at {path}")
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        index = cls(dim=meta["dim"], train_threshold=train_threshold)
+        index._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="c")
+        index._assignments = np.load(os.path.join(path, "assignments.npy"))
+        index._alive = np.load(os.path.join(path, "alive.npy"))
+        index._ids = list(meta["ids"])
+        index._rows = {ticket_id: row for row, ticket_id in enumerate(index._ids)}
+        index._count = len(index._ids)
+        index._trained_size = meta.get("trained_size", 0)
+        centroids_path = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            index._centroids = np.load(centroids_path)
+        return index
+
+
+# Global index instance
+_index: Optional[ANNIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ANNIndex:
+    """
+    Get or create the process-wide index, restoring the last snapshot when one exists.
+    """
+    global _index
+    if not ANN_INDEX_ENABLED:
+        raise RuntimeError("ANN index is disabled. Set ANN_INDEX_ENABLED=true to enable it.")
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = ANNIndex.load(ANN_INDEX_PATH)
+                logger.info(f"ANN index restored from {ANN_INDEX_PATH} with {len(_index)} vectors")
+            except FileNotFoundError:
+                _index = ANNIndex()
+            except Exception:
+                logger.exception(f"Error restoring ANN index from {ANN_INDEX_PATH}; starting empty")
+                _index = ANNIndex()
+    return _index
+
+
+def snapshot_index():
+    """
+    Snapshot the process-wide index if it has been created.
+    """
+    if _index is not None:
+        _index.snapshot(ANN_INDEX_PATH)
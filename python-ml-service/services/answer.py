@@ -1,28 +1,124 @@
 from transformers import pipeline
+import hashlib
 import os
+import torch
+from typing import Dict, List
+from services.cache import LRUCache
+from services.deadlines import check_deadline
+from services.model_workers import loads_model_here
+from services.qa_spans import ContextWindows, best_span, context_start, slice_windows
 
 # Set cache directory
 cache_dir = os.environ.get('TRANSFORMERS_CACHE', '/app/models')
 
-# Load the QA model with error handling
-try:
-    qa_pipeline = pipeline("question-answering", model="deepset/roberta-base-squad2")
-    print("RoBERTa QA model loaded successfully")
-except Exception as e:
-    print(f"Error loading RoBERTa QA model: {e}")
-    qa_pipeline = None
+MODEL_NAME = "deepset/roberta-base-squad2"
 
-def get_answer_from_tickets(question, tickets):
+# Tokens per (question, context window) pair; questions longer than QA_MAX_QUESTION_TOKENS are cut
+QA_MAX_LENGTH = int(os.environ.get('QA_MAX_LENGTH', '384'))
+QA_MAX_QUESTION_TOKENS = int(os.environ.get('QA_MAX_QUESTION_TOKENS', '64'))
+# Context tokens shared by consecutive windows, so answers near a window edge are not lost
+QA_DOC_STRIDE = int(os.environ.get('QA_DOC_STRIDE', '128'))
+QA_MAX_ANSWER_TOKENS = int(os.environ.get('QA_MAX_ANSWER_TOKENS', '30'))
+# (question, window) pairs per forward pass
+QA_BATCH_SIZE = int(os.environ.get('QA_BATCH_SIZE', '16'))
+# Questions per request; each one runs against every context window
+QA_MAX_QUESTIONS = int(os.environ.get('QA_MAX_QUESTIONS', '16'))
+# Tokenized ticket contexts kept for follow-up questions about the same tickets
+QA_CONTEXT_CACHE_SIZE = int(os.environ.get('QA_CONTEXT_CACHE_SIZE', '64'))
+QA_CONTEXT_CACHE_TTL = float(os.environ.get('QA_CONTEXT_CACHE_TTL', '300'))
+
+# Load the QA model with error handling (only in its worker process when the qa pool is isolated)
+qa_pipeline = None
+if loads_model_here("qa"):
+    try:
+        qa_pipeline = pipeline("question-answering", model=MODEL_NAME)
+        print("RoBERTa QA model loaded successfully")
+    except Exception as e:
+        print(f"Error loading RoBERTa QA model: {e}")
+        qa_pipeline = None
+
+_context_windows = LRUCache("qa-context-windows", QA_CONTEXT_CACHE_SIZE, ttl=QA_CONTEXT_CACHE_TTL)
+
+def build_context(tickets) -> str:
     """
-    Answers a question based on the content of multiple support tickets.
+    Combine all ticket information into a single context.
+    """
+    return " ".join([f"{ticket.get('subject', '')} {ticket.get('description', '')}" for ticket in tickets])
+
+def context_windows(context: str) -> ContextWindows:
+    """
+    Tokenize a context once into overlapping windows, cached by context hash for a short TTL.
+    """
+    key = hashlib.sha1(f"{MODEL_NAME}\x00{context}".encode("utf-8")).hexdigest()
+    cached = _context_windows.get(key)
+    if cached is not None:
+        return cached
+
+    tokenizer = qa_pipeline.tokenizer
+    encoded = tokenizer(context, add_special_tokens=False, return_offsets_mapping=True)
+    size = QA_MAX_LENGTH - QA_MAX_QUESTION_TOKENS - tokenizer.num_special_tokens_to_add(pair=True)
+    cached = slice_windows(context, encoded["input_ids"], encoded["offset_mapping"], size, QA_DOC_STRIDE)
+    _context_windows.set(key, cached)
+    return cached
+
+def answer_questions(questions: List[str], tickets) -> List[Dict]:
+    """
+    Answer several questions about the same tickets. The context is tokenized once (and
+    reused for follow-up calls within QA_CONTEXT_CACHE_TTL), and every (question, window)
+    pair runs through the model in batched forward passes.
     """
     if qa_pipeline is None:
         raise RuntimeError("Question-answering model not available. Please check model loading.")
-    
-    # Combine all ticket information into a single context
-    context = " ".join([f"{ticket.get('subject', '')} {ticket.get('description', '')}" for ticket in tickets])
-    
-    # Get the answer using the QA pipeline
-    answer = qa_pipeline(question=question, context=context)
-    
-    return answer
\ No newline at end of file
+    if not questions:
+        return []
+    if len(questions) > QA_MAX_QUESTIONS:
+        raise ValueError(f"At most {QA_MAX_QUESTIONS} questions per request, got {len(questions)}")
+
+    tokenizer, model = qa_pipeline.tokenizer, qa_pipeline.model
+    shared = context_windows(build_context(tickets))
+
+    pairs = []
+    for q, question in enumerate(questions):
+        question_ids = tokenizer(question, add_special_tokens=False)["input_ids"][:QA_MAX_QUESTION_TOKENS]
+        for w, window in enumerate(shared.windows):
+            input_ids = tokenizer.build_inputs_with_special_tokens(question_ids, window)
+            pairs.append((q, w, input_ids, context_start(tokenizer, question_ids)))
+
+    best = [{"score": 0.0, "start": 0, "end": 0, "answer": ""} for _ in questions]
+    for batch_start in range(0, len(pairs), QA_BATCH_SIZE):
+        check_deadline("answer")
+        batch = pairs[batch_start:batch_start + QA_BATCH_SIZE]
+        width = max(len(input_ids) for _, _, input_ids, _ in batch)
+        input_ids = torch.full((len(batch), width), tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, (_, _, ids, _) in enumerate(batch):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+
+        with torch.no_grad():
+            output = model(input_ids=input_ids, attention_mask=attention_mask)
+        start_logits = output.start_logits.float().cpu().numpy()
+        end_logits = output.end_logits.float().cpu().numpy()
+
+        for row, (q, w, _, first_token) in enumerate(batch):
+            window = shared.windows[w]
+            if not window:
+                continue
+            span = slice(first_token, first_token + len(window))
+            start, end, score = best_span(start_logits[row, span], end_logits[row, span], QA_MAX_ANSWER_TOKENS)
+            if score > best[q]["score"]:
+                char_start = shared.offsets[w][start][0]
+                char_end = shared.offsets[w][end][1]
+                best[q] = {
+                    "score": score,
+                    "start": char_start,
+                    "end": char_end,
+                    "answer": shared.context[char_start:char_end],
+                }
+    return best
+
+def get_answer_from_tickets(question, tickets):
+    """
+    Answers a question based on the content of multiple support tickets.
+    """
+    return answer_questions([question], tickets)[0]
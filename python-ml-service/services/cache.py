@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from prometheus_client import Counter
+
+CACHE_REQUESTS = Counter(
+    'ml_cache_requests_total',
+    'Cache lookups by cache and outcome',
+    ['cache', 'outcome']
+)
+
+# Every named cache in the process, for stats and introspection
+_registry: Dict[str, "LRUCache"] = {}
+_registry_lock = threading.Lock()
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU cache with an optional per-entry TTL.
+    Hits and misses are counted per cache name.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with _registry_lock:
+            _registry[name] = self
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self.ttl is not None and entry[1] < time.monotonic():
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                CACHE_REQUESTS.labels(cache=self.name, outcome="miss").inc()
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+        CACHE_REQUESTS.labels(cache=self.name, outcome="hit").inc()
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[tuple]:
+        """
+        Snapshot of the live (key, value) pairs, oldest first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (value, expires) in self._data.items()
+                if expires is None or expires >= now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def get_caches() -> Dict[str, LRUCache]:
+    """
+    Return every named cache created in this process.
+    """
+    with _registry_lock:
+        return dict(_registry)
@@ -0,0 +1,233 @@
+import asyncio
+import contextvars
+import os
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from prometheus_client import Counter
+
+API_PREFIX = "/api/v1/"
+# Remaining time budget sent by the caller, in milliseconds
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+# Endpoints where a query parameter selects another operation with its own timeout, admission
+# limit and priority lane: endpoint -> (parameter, {value: operation}). Values mirror
+# SBERT_embedding.EMBEDDING_MODELS.
+QUERY_OPERATIONS: Dict[str, Tuple[str, Dict[str, str]]] = {
+    "sbert-embed": ("model", {"minilm": "minilm-embed", "all-MiniLM-L6-v2": "minilm-embed"}),
+}
+
+WORK_DROPPED = Counter(
+    'ml_work_dropped_total',
+    'Work dropped because its deadline passed or its client disconnected',
+    ['operation', 'stage', 'reason']
+)
+
+
+def _parse_timeouts(spec: str) -> Dict[str, float]:
+    timeouts = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = entry.partition("=")
+        timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+# Budget in seconds per operation for requests that send no x-request-timeout-ms header,
+# e.g. "summarize=60,minilm-embed=10". Operations not listed have none, so callers that
+# never sent a deadline are not cut off unless the deployment opts in.
+REQUEST_TIMEOUTS = _parse_timeouts(os.environ.get('REQUEST_TIMEOUTS', ''))
+
+
+class WorkDropped(Exception):
+    """
+    Base class for work abandoned before completion.
+    """
+    reason = "dropped"
+
+
+class DeadlineExceeded(WorkDropped):
+    reason = "deadline"
+
+
+class RequestCancelled(WorkDropped):
+    reason = "disconnected"
+
+
+class RequestState:
+    """
+    Deadline and disconnect flag of one request.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self._cancelled = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def drop_reason(self) -> Optional[str]:
+        if self.cancelled:
+            return RequestCancelled.reason
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return DeadlineExceeded.reason
+        return None
+
+
+class FlightState:
+    """
+    Combined state of every request waiting on one shared computation.
+    The work is only dropped once all of its waiters have given up.
+    """
+
+    def __init__(self, waiter: Optional[RequestState] = None):
+        self.waiters: List[Optional[RequestState]] = [waiter]
+
+    def join(self, waiter: Optional[RequestState]):
+        self.waiters.append(waiter)
+
+    @property
+    def deadline(self) -> Optional[float]:
+        # The latest deadline of any waiter; None if some waiter has none
+        deadlines = [waiter.deadline if waiter is not None else None for waiter in self.waiters]
+        return None if None in deadlines else max(deadlines)
+
+    def drop_reason(self) -> Optional[str]:
+        reasons = [waiter.drop_reason() if waiter is not None else None for waiter in self.waiters]
+        if None in reasons:
+            return None
+        return DeadlineExceeded.reason if DeadlineExceeded.reason in reasons else RequestCancelled.reason
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_state", default=None)
+
+
+def current_state():
+    return _current.get()
+
+
+def bind(state) -> contextvars.Token:
+    return _current.set(state)
+
+
+def endpoint_name(path: str) -> str:
+    if path.startswith(API_PREFIX):
+        return path[len(API_PREFIX):].strip("/")
+    return path.strip("/")
+
+
+def operation_name(path: str, query_string: str = "") -> str:
+    """
+    The operation a request runs, which keys its default timeout, admission limit and
+    priority lane: the endpoint name, unless a query parameter selects another operation
+    (QUERY_OPERATIONS), e.g. /sbert-embed?model=minilm runs "minilm-embed".
+    """
+    endpoint = endpoint_name(path)
+    selector = QUERY_OPERATIONS.get(endpoint)
+    if selector is not None and query_string:
+        parameter, operations = selector
+        for value in parse_qs(query_string).get(parameter, []):
+            if value in operations:
+                return operations[value]
+    return endpoint
+
+
+def _raise_dropped(reason: str, operation: str, stage: str):
+    WORK_DROPPED.labels(operation=operation, stage=stage, reason=reason).inc()
+    if reason == RequestCancelled.reason:
+        raise RequestCancelled(f"{operation}: client disconnected")
+    raise DeadlineExceeded(f"{operation}: deadline exceeded")
+
+
+def check_deadline(operation: str, stage: str = "batch"):
+    """
+    Raise DeadlineExceeded or RequestCancelled if the current request (or every request
+    sharing this computation) has given up. Cheap enough to call between batches.
+    """
+    state = _current.get()
+    if state is None:
+        return
+    reason = state.drop_reason()
+    if reason is not None:
+        _raise_dropped(reason, operation, stage)
+
+
+async def wait_within_deadline(awaitable: Awaitable, operation: str) -> Any:
+    """
+    Await a (usually shielded) result, giving up when the current request's deadline
+    passes or its client disconnects. The awaited work itself is not cancelled here.
+    """
+    state = _current.get()
+    if not isinstance(state, RequestState):
+        return await awaitable
+
+    result = asyncio.ensure_future(awaitable)
+    disconnected = asyncio.ensure_future(state._cancelled.wait())
+    try:
+        await asyncio.wait({result, disconnected}, timeout=state.remaining(), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnected.cancel()
+    if result.done():
+        return result.result()
+    result.cancel()
+    _raise_dropped(state.drop_reason() or DeadlineExceeded.reason, operation, "waiting")
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving every request a RequestState: a deadline from the
+    x-request-timeout-ms header or the operation's REQUEST_TIMEOUTS entry (none if neither
+    is set), and a disconnect flag that is set when the client goes away after sending its body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        budget = REQUEST_TIMEOUTS.get(operation_name(scope["path"], scope.get("query_string", b"").decode("latin-1")))
+        for name, value in scope.get("headers", []):
+            if name.decode("latin-1").lower() == DEADLINE_HEADER:
+                try:
+                    budget = max(float(value) / 1000, 0.0)
+                except ValueError:
+                    pass
+        state = RequestState(time.monotonic() + budget if budget is not None else None)
+        watcher: Optional[asyncio.Future] = None
+
+        async def watch_disconnect():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                state.cancel()
+            return message
+
+        async def receive_and_watch():
+            nonlocal watcher
+            if watcher is not None:
+                return await asyncio.shield(watcher)
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                state.cancel()
+            elif not message.get("more_body", False):
+                # The body is complete; the next message can only be a disconnect
+                watcher = asyncio.ensure_future(watch_disconnect())
+            return message
+
+        token = bind(state)
+        try:
+            await self.app(scope, receive_and_watch, send)
+        finally:
+            _current.reset(token)
+            if watcher is not None:
+                watcher.cancel()
@@ -0,0 +1,162 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Projection artifact produced by scripts/embedding_compaction.py
+PROJECTION_PATH = os.environ.get('EMBEDDING_PROJECTION_PATH', '/app/models/embedding-projection.npz')
+
+# Output modes selectable per request
+OUTPUT_MODES = ("float", "pca", "int8", "pca_int8")
+
+_projection = None
+_projection_lock = threading.Lock()
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def fit_projection(embeddings, dim: int, model_name: str = "") -> Dict[str, np.ndarray]:
+    """
+    Fit a PCA projection to `dim` components on a sample of embeddings.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dim > min(embeddings.shape):
+        raise ValueError(f"Cannot fit {dim} components on a sample of shape {embeddings.shape}")
+    mean = embeddings.mean(axis=0)
+    _, singular_values, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+    variance = singular_values ** 2
+    return {
+        "mean": mean.astype(np.float32),
+        "components": vt[:dim].astype(np.float32),
+        "explained_variance_ratio": (variance[:dim] / variance.sum()).astype(np.float32),
+        "model_name": np.array(model_name),
+    }
+
+
+def save_projection(path: str, projection: Dict[str, np.ndarray]):
+    """
+    Store a fitted projection as an .npz artifact.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, **projection)
+
+
+def load_projection(path: str = PROJECTION_PATH) -> Dict[str, np.ndarray]:
+    """
+    Load a projection artifact.
+    """
+    with np.load(path) as artifact:
+        return {name: artifact[name] for name in artifact.files}
+
+
+def get_projection() -> Dict[str, np.ndarray]:
+    """
+    Get the process-wide projection, loading the artifact on first use.
+    """
+    global _projection
+    with _projection_lock:
+        if _projection is None:
+            if not os.path.exists(PROJECTION_PATH):
+                raise RuntimeError(
+                    f"No embedding projection at {PROJECTION_PATH}. Fit one with scripts/embedding_compaction.py"
+                )
+            _projection = load_projection(PROJECTION_PATH)
+    return _projection
+
+
+def project(vectors, projection: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Project embeddings onto the fitted components and renormalize them.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not vectors.size:
+        return np.zeros((0, len(projection["components"])), dtype=np.float32)
+    reduced = (vectors - projection["mean"]) @ projection["components"].T
+    return _normalize_rows(reduced).astype(np.float32)
+
+
+def quantize_int8(vectors) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-vector symmetric int8 scalar quantization.
+
+    :return: (codes, scales) where vectors ~= codes * scales[:, None]
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1, initial=0.0) / 127.0
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_int8(codes, scales) -> np.ndarray:
+    """
+    Reconstruct float vectors from int8 codes and their scales.
+    """
+    return np.asarray(codes, dtype=np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def compact(vectors, mode: str, projection: Optional[Dict[str, np.ndarray]] = None,
+            model_name: Optional[str] = None) -> Dict:
+    """
+    Apply an output mode to a batch of embeddings; an empty batch gives empty vectors.
+    PCA modes raise ValueError when the projection was fitted on another `model_name`.
+
+    :return: {'output': mode, 'dim': ..., 'vectors': ndarray} plus 'scales' for int8 modes.
+    """
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{mode}'. Expected one of {', '.join(OUTPUT_MODES)}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not vectors.size:
+        vectors = vectors.reshape(0, vectors.shape[1] if vectors.ndim == 2 else 0)
+    if mode.startswith("pca"):
+        projection = projection if projection is not None else get_projection()
+        fitted_on = str(projection.get("model_name", ""))
+        if model_name and fitted_on and fitted_on != model_name:
+            raise ValueError(f"The PCA projection was fitted on {fitted_on}, not {model_name}")
+        vectors = project(vectors, projection)
+
+    result = {"output": mode, "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0}
+    if mode.endswith("int8"):
+        result["vectors"], result["scales"] = quantize_int8(vectors)
+    else:
+        result["vectors"] = vectors
+    return result
+
+
+def reconstruct(compacted: Dict) -> np.ndarray:
+    """
+    Turn a compact() result back into float vectors in the (possibly reduced) space.
+    """
+    if "scales" in compacted:
+        return dequantize_int8(compacted["vectors"], compacted["scales"])
+    return np.asarray(compacted["vectors"], dtype=np.float32)
+
+
+def evaluate_recall(embeddings, mode: str, projection: Optional[Dict[str, np.ndarray]] = None,
+                    k: int = 10, num_queries: int = 200, seed: int = 0) -> float:
+    """
+    Recall@k of nearest-neighbour search on compacted vectors against full-precision search.
+    Queries are sampled from the corpus and excluded from their own neighbour lists.
+    """
+    embeddings = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(embeddings), min(num_queries, len(embeddings)), replace=False)
+
+    compacted = reconstruct(compact(embeddings, mode, projection))
+    compacted = _normalize_rows(compacted)
+
+    exact_scores = embeddings[queries] @ embeddings.T
+    approx_scores = compacted[queries] @ compacted.T
+    rows = np.arange(len(queries))
+    exact_scores[rows, queries] = -np.inf
+    approx_scores[rows, queries] = -np.inf
+
+    k = min(k, len(embeddings) - 1)
+    exact = np.argpartition(-exact_scores, k - 1, axis=1)[:, :k]
+    approx = np.argpartition(-approx_scores, k - 1, axis=1)[:, :k]
+    hits = sum(len(set(e) & set(a)) for e, a in zip(exact, approx))
+    return hits / (len(queries) * k)
@@ -0,0 +1,110 @@
+import asyncio
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from services.SBERT_embedding import get_embedded_text, DEFAULT_MODEL_NAME as SBERT_MODEL_NAME
+from services.extract_keywords import embedding_digest, extract_keywords_from_embedding, KEYWORD_MODEL_NAME
+from services.intent_classification import classify_ticket_intent, intent_model_name
+from services.summarize import summarize_with_details, MODEL_NAME as SUMMARIZATION_MODEL_NAME
+from services.single_flight import single_flight, make_key, dedupe_batch, fan_out, normalize_input
+
+ENRICH_OUTPUTS = ("embedding", "intent", "keywords", "summary")
+
+
+def _ticket_parts(tickets: Sequence[Dict[str, str]]) -> List[str]:
+    parts = []
+    for ticket in tickets:
+        parts.extend([ticket["subject"], ticket["description"]])
+    return parts
+
+
+async def _embed(tickets: List[Dict[str, str]]) -> np.ndarray:
+    key = make_key("sbert-embed", SBERT_MODEL_NAME, *_ticket_parts(tickets))
+    return await single_flight.do(key, get_embedded_text, tickets)
+
+
+async def _keywords(tickets: List[Dict[str, str]], embeddings_task: asyncio.Task) -> List[List[str]]:
+    # Keyword extraction reuses the SBERT embedding instead of encoding the ticket again
+    embeddings = await embeddings_task
+
+    async def one(ticket, embedding):
+        vector = np.asarray(embedding)
+        key = make_key(
+            "extract-keywords", KEYWORD_MODEL_NAME, ticket["subject"], ticket["description"], embedding_digest(vector)
+        )
+        return await single_flight.do(key, extract_keywords_from_embedding, ticket, vector)
+
+    return list(await asyncio.gather(*(one(t, e) for t, e in zip(tickets, embeddings))))
+
+
+async def _intents(tickets: List[Dict[str, str]]) -> List[List[Dict]]:
+    async def one(ticket):
+        key = make_key("classify-intent", intent_model_name, ticket["subject"], ticket["description"])
+        return await single_flight.do(key, classify_ticket_intent, ticket["subject"], ticket["description"])
+
+    return list(await asyncio.gather(*(one(t) for t in tickets)))
+
+
+async def _summaries(tickets: Sequence[Dict[str, str]]) -> List[str]:
+    # Raw text: preprocessing drops greeting and closing lines, so line breaks matter here
+    texts = [f"{t.get('subject') or ''} {t.get('description') or ''}" for t in tickets]
+    key = make_key("summarize", SUMMARIZATION_MODEL_NAME, *texts)
+    # Same computation as /summarize, so identical requests in flight are shared
+    results = await single_flight.do(key, summarize_with_details, texts)
+    return [result["summary"] for result in results]
+
+
+async def enrich_tickets(tickets: Sequence[Dict[str, str]], outputs: Sequence[str] = ENRICH_OUTPUTS) -> List[Dict]:
+    """
+    Compute several outputs for a batch of tickets as one plan.
+
+    Text is normalized once and duplicate tickets are planned once. Summaries are the
+    exception: they get the raw text, since line breaks decide which lines preprocessing
+    keeps, and summarize_with_details dedupes them after preprocessing. The SBERT embedding
+    is computed once and shared with keyword extraction, and every stage runs concurrently
+    on its own model pool through the single-flight layer, so identical work already
+    in flight from other endpoints is shared rather than repeated.
+
+    :param tickets: Tickets with 'subject' and 'description'.
+    :param outputs: Any of 'embedding', 'intent', 'keywords', 'summary'.
+    :return: One dict per ticket with the requested outputs.
+    """
+    unknown = [output for output in outputs if output not in ENRICH_OUTPUTS]
+    if not outputs or unknown:
+        raise ValueError(f"Unknown outputs {unknown}. Expected some of {', '.join(ENRICH_OUTPUTS)}")
+    if not tickets:
+        return []
+
+    normalized = [
+        {"subject": normalize_input(t.get("subject")), "description": normalize_input(t.get("description"))}
+        for t in tickets
+    ]
+    unique_positions, inverse = dedupe_batch(
+        "enrich", [(t["subject"], t["description"]) for t in normalized]
+    )
+    unique = [normalized[position] for position in unique_positions]
+
+    stages = {}
+    if "embedding" in outputs or "keywords" in outputs:
+        stages["embedding"] = asyncio.ensure_future(_embed(unique))
+    if "keywords" in outputs:
+        stages["keywords"] = asyncio.ensure_future(_keywords(unique, stages["embedding"]))
+    if "intent" in outputs:
+        stages["intent"] = asyncio.ensure_future(_intents(unique))
+    if "summary" in outputs:
+        stages["summary"] = asyncio.ensure_future(_summaries(tickets))
+
+    try:
+        await asyncio.gather(*stages.values())
+    except BaseException:
+        for stage in stages.values():
+            stage.cancel()
+        raise
+
+    # Summaries come back per ticket, every other output per distinct ticket
+    columns = {
+        output: stages[output].result() if output == "summary" else fan_out(stages[output].result(), inverse)
+        for output in outputs
+    }
+    return [{output: columns[output][i] for output in outputs} for i in range(len(tickets))]
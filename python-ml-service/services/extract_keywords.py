@@ -1,46 +1,134 @@
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+import os
+import re
+from typing import List, Optional, Tuple
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-# ✅ Define the model at the top level
-  # Load the model globally once
+from services.SBERT_embedding import get_model, DEFAULT_MODEL_NAME
+
+# Candidates are encoded with the same model as the ticket embedding so the two are comparable
+KEYWORD_MODEL_NAME = DEFAULT_MODEL_NAME
+
+# Upper bound on candidates scored per ticket, keeping the most frequent ones
+MAX_CANDIDATES = int(os.environ.get('KEYPHRASE_MAX_CANDIDATES', '300'))
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been before being
+below between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down
+during each few for from further get got had hadn't has hasn't have haven't having he her here hers
+herself him himself his how i i'm i've if in into is isn't it it's its itself just let's me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own please same she
+should shouldn't so some such than that that's the their theirs them themselves then there there's
+these they this those through to too under until up us very was wasn't we we're were weren't what
+what's when where which while who whom why will with won't would wouldn't you you're your yours
+yourself yourselves hi hello hey thanks thank regards dear sep
+""".split())
 
-def extract_keywords_from_embedding(ticket, embedding, top_n=5):
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+# Phrases never span sentence or clause punctuation
+_CHUNK_BOUNDARY = re.compile(r"[.!?,;:()\[\]{}\"\n]+|\s-\s")
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9'&\-]*[a-z0-9]|[a-z]")
+
+
+def generate_candidates(text: str, ngram_range: Tuple[int, int] = (1, 3),
+                        max_candidates: int = MAX_CANDIDATES) -> List[str]:
+    """
+    Generate n-gram keyphrase candidates that neither start nor end with a stopword
+    and do not cross punctuation. Most frequent candidates are kept first.
+    """
+    min_n, max_n = ngram_range
+    counts = {}
+    for chunk in _CHUNK_BOUNDARY.split(text.lower()):
+        tokens = _TOKEN.findall(chunk)
+        for n in range(min_n, max_n + 1):
+            for start in range(len(tokens) - n + 1):
+                gram = tokens[start:start + n]
+                if gram[0] in STOPWORDS or gram[-1] in STOPWORDS or gram[0].isdigit() and n == 1:
+                    continue
+                phrase = " ".join(gram)
+                counts[phrase] = counts.get(phrase, 0) + 1
+
+    # dicts keep insertion order, so ties keep the order of first appearance
+    ranked = sorted(counts, key=counts.get, reverse=True)
+    return ranked[:max_candidates]
+
+
+def maximal_marginal_relevance(doc_similarity: np.ndarray, candidate_embeddings: np.ndarray,
+                               top_n: int, diversity: float) -> List[int]:
+    """
+    Select `top_n` candidate indices balancing relevance to the document against
+    redundancy with the candidates already selected.
+
+    :param doc_similarity: Cosine similarity of every candidate to the document.
+    :param candidate_embeddings: Normalized candidate embeddings, one row per candidate.
+    :param diversity: 0 ranks by relevance only, 1 by novelty only.
+    """
+    top_n = min(top_n, len(doc_similarity))
+    if top_n <= 0:
+        return []
+
+    selected = [int(np.argmax(doc_similarity))]
+    redundancy = candidate_embeddings @ candidate_embeddings[selected[0]]
+    chosen = np.zeros(len(doc_similarity), dtype=bool)
+    chosen[selected[0]] = True
+
+    while len(selected) < top_n:
+        scores = (1 - diversity) * doc_similarity - diversity * redundancy
+        scores[chosen] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        chosen[best] = True
+        redundancy = np.maximum(redundancy, candidate_embeddings @ candidate_embeddings[best])
+
+    return selected
+
+
+def embedding_digest(embedding: Optional[np.ndarray]) -> str:
+    """
+    Digest of a supplied ticket embedding for single-flight keys ("" when there is none),
+    since the keywords are ranked against it.
+    """
+    if embedding is None:
+        return ""
+    return hashlib.sha1(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+def extract_keywords_from_embedding(ticket, embedding: Optional[np.ndarray] = None, top_n: int = 5,
+                                    ngram_range: Tuple[int, int] = (1, 3), diversity: float = 0.5) -> List[str]:
     """
     Extracts key phrases from a ticket using its SBERT embedding.
-    
+
+    All candidates are encoded in one batched call and scored with one matrix product;
+    the ticket itself is only encoded when no compatible embedding is supplied.
+
     :param ticket: Dictionary containing 'subject' and 'description'.
-    :param embedding: Precomputed SBERT embedding (numpy array).
+    :param embedding: Precomputed SBERT embedding (numpy array), optional.
     :param top_n: Number of key phrases to return.
+    :param ngram_range: Smallest and largest phrase length in words.
+    :param diversity: MMR trade-off between relevance and diversity.
     :return: List of extracted key phrases.
     """
     try:
-        text = f"{ticket['subject']} {ticket['description']}".strip()
-
-        # Tokenize and get unique words
-        words = list(set(text.lower().split()))
-        if not words:
+        text = f"{ticket.get('subject') or ''} {ticket.get('description') or ''}".strip()
+        candidates = generate_candidates(text, ngram_range)
+        if not candidates:
             return []  # No keywords to extract
 
-        # Ensure embedding is 2D
-        if len(embedding.shape) == 1:
-            embedding = embedding.reshape(1, -1)
-
-        # ✅ Encode each word using SBERT
-        word_embeddings = np.array([model.encode(word) for word in words])
-
-        if word_embeddings.size == 0:  # No valid words
-            return []
-
-        # Compute cosine similarity
-        similarities = cosine_similarity(embedding, word_embeddings)[0]
+        model = get_model(KEYWORD_MODEL_NAME)
+        candidate_embeddings = model.encode(
+            candidates, batch_size=64, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+        ).astype(np.float32)
 
-        # Get the top N words based on similarity scores
-        top_indices = np.argsort(similarities)[-top_n:][::-1]
-        top_keywords = [words[i] for i in top_indices]
+        doc_embedding = None if embedding is None else np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if doc_embedding is None or doc_embedding.shape[0] != candidate_embeddings.shape[1]:
+            doc_embedding = model.encode(
+                text, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+            ).astype(np.float32)
+        doc_embedding = doc_embedding / max(float(np.linalg.norm(doc_embedding)), 1e-12)
 
-        return top_keywords
+        doc_similarity = candidate_embeddings @ doc_embedding
+        selected = maximal_marginal_relevance(doc_similarity, candidate_embeddings, top_n, diversity)
+        return [candidates[i] for i in selected]
 
     except Exception as e:
         print(f"Error in extract_keywords_from_embedding: {str(e)}")
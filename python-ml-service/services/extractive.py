@@ -0,0 +1,69 @@
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Sentence ends: terminal punctuation followed by whitespace, or a line break
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text or "") if sentence.strip()]
+
+
+def textrank(embeddings: np.ndarray, damping: float = 0.85, iterations: int = 30, tolerance: float = 1e-6) -> np.ndarray:
+    """
+    TextRank centrality of sentences from their normalized embeddings: PageRank over the
+    cosine-similarity graph (negative similarities and self-loops dropped), by power iteration.
+    """
+    count = len(embeddings)
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    similarity = np.clip(embeddings @ embeddings.T, 0.0, None)
+    np.fill_diagonal(similarity, 0.0)
+    totals = similarity.sum(axis=1, keepdims=True)
+    # Sentences similar to nothing link to every sentence equally
+    transition = np.where(totals > 0, similarity / np.where(totals > 0, totals, 1.0), 1.0 / count)
+
+    scores = np.full(count, 1.0 / count)
+    for _ in range(iterations):
+        updated = (1 - damping) / count + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def summary_tier(text: str, max_words: int, extractive_max_words: int) -> str:
+    """
+    How to summarize a preprocessed text into at most `max_words` words: "passthrough" when
+    it already fits, "extractive" when it is at most `extractive_max_words` long and splits
+    into several sentences, else "abstractive". Preprocessing joins lines with single spaces,
+    so an unpunctuated chat transcript is one sentence and cannot be summarized by selection.
+    """
+    words = len(text.split())
+    if words <= max_words:
+        return "passthrough"
+    if words <= extractive_max_words and len(split_sentences(text)) > 1:
+        return "extractive"
+    return "abstractive"
+
+
+def select_sentences(sentences: Sequence[str], scores: np.ndarray, max_words: int) -> Optional[str]:
+    """
+    Take the best-ranked sentences that fit in `max_words` and join them in their original
+    order, or None when no sentence is short enough.
+    """
+    chosen, words = [], 0
+    for index in np.argsort(-np.asarray(scores), kind="stable"):
+        length = len(sentences[index].split())
+        if words + length > max_words:
+            continue
+        chosen.append(index)
+        words += length
+        if words >= max_words:
+            break
+    if not chosen:
+        return None
+    return " ".join(sentences[index] for index in sorted(chosen))
@@ -0,0 +1,55 @@
+import os
+import threading
+from typing import Optional, Sequence, Tuple
+
+# Abstractive generation strategies, richest first: (name, beams). The first whose estimated
+# time fits the request's remaining budget is used; four beams is BART-large-cnn's default.
+GENERATION_STRATEGIES = (("beam4", 4), ("beam2", 2), ("greedy", 1))
+# Starting estimate of generation seconds per (text x beam x output token) for a 512-word input;
+# refined from measured batches
+SUMMARY_SECONDS_PER_TOKEN = float(os.environ.get('SUMMARY_SECONDS_PER_TOKEN', '0.01'))
+
+
+class GenerationCost:
+    """
+    Running estimate of generation time in seconds per (text x beam x output token),
+    with each text weighted by its input length.
+    """
+
+    def __init__(self, seconds_per_token: float = SUMMARY_SECONDS_PER_TOKEN, smoothing: float = 0.2):
+        self.seconds_per_token = seconds_per_token
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def units(words: Sequence[int], beams: int, max_tokens: int) -> float:
+        return beams * max_tokens * sum(max(count / 512, 0.25) for count in words)
+
+    def estimate(self, words: Sequence[int], beams: int, max_tokens: int) -> float:
+        return self.seconds_per_token * self.units(words, beams, max_tokens)
+
+    def observe(self, words: Sequence[int], beams: int, max_tokens: int, seconds: float):
+        units = self.units(words, beams, max_tokens)
+        if units <= 0:
+            return
+        with self._lock:
+            self.seconds_per_token += self.smoothing * (seconds / units - self.seconds_per_token)
+
+
+def plan_generation(cost: GenerationCost, words: Sequence[int], max_tokens: int, min_tokens: int,
+                    budget: Optional[float]) -> Optional[Tuple[str, int, int]]:
+    """
+    Pick (strategy, beams, max tokens) for a batch so generation is expected to finish within
+    `budget` seconds, or None when not even a short greedy summary fits.
+    """
+    if budget is None:
+        name, beams = GENERATION_STRATEGIES[0]
+        return name, beams, max_tokens
+    for name, beams in GENERATION_STRATEGIES:
+        if cost.estimate(words, beams, max_tokens) <= budget:
+            return name, beams, max_tokens
+    # Not even a full greedy summary fits: shorten it while it can still say something
+    tokens = int(budget / max(cost.estimate(words, 1, 1), 1e-9))
+    if tokens >= min_tokens:
+        return "greedy-short", 1, tokens
+    return None
@@ -0,0 +1,120 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from services.cache import CACHE_REQUESTS, LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+INTENT_CACHE_SIZE = int(os.environ.get('INTENT_CACHE_SIZE', '5000'))
+INTENT_CACHE_TTL = float(os.environ.get('INTENT_CACHE_TTL', '86400'))
+# Optional SQLite file so cached results survive deploys; empty disables persistence
+INTENT_CACHE_PATH = os.environ.get('INTENT_CACHE_PATH', '')
+
+
+class IntentResultCache:
+    """
+    Bounded TTL/LRU cache of final intent results.
+
+    Keys hash the preprocessed subject and description together with a fingerprint of
+    the ruleset and model, so entries stop matching as soon as either changes.
+    With a persistence path, entries are written through to SQLite and read back on
+    memory misses; rows from other fingerprints are dropped when the cache opens.
+    """
+
+    def __init__(self, fingerprint: str, maxsize: int = INTENT_CACHE_SIZE, ttl: float = INTENT_CACHE_TTL,
+                 path: Optional[str] = INTENT_CACHE_PATH or None, name: str = "intent-results"):
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+        self._memory = LRUCache(name, maxsize, ttl)
+        self._conn = None
+        self._lock = threading.Lock()
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS intent_results "
+                "(key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, results TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "DELETE FROM intent_results WHERE fingerprint != ? OR expires_at < ?",
+                (self.fingerprint, time.time())
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Intent cache persistence disabled, could not open {path}: {e}")
+            self._conn = None
+
+    def key(self, processed_subject: str, processed_description: str) -> str:
+        digest = hashlib.sha256(f"{processed_subject}\x1f{processed_description}".encode("utf-8")).hexdigest()
+        return f"{self.fingerprint}:{digest}"
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        results = self._memory.get(key)
+        if results is None and self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT results FROM intent_results WHERE key = ? AND expires_at >= ?", (key, time.time())
+                ).fetchone()
+            CACHE_REQUESTS.labels(cache=f"{self._memory.name}-disk", outcome="hit" if row else "miss").inc()
+            if row is not None:
+                results = json.loads(row[0])
+                self._memory.set(key, results)
+        # Callers get their own copy so a shared entry is never mutated
+        return copy.deepcopy(results) if results is not None else None
+
+    def set(self, key: str, results: List[dict]):
+        results = copy.deepcopy(results)
+        self._memory.set(key, results)
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO intent_results (key, fingerprint, results, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, self.fingerprint, json.dumps(results), time.time() + self.ttl)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist intent cache entry: {e}")
+
+    def clear(self):
+        """
+        Drop every entry, in memory and on disk.
+        """
+        self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM intent_results")
+
+    def stats(self) -> dict:
+        stats = self._memory.stats()
+        stats["fingerprint"] = self.fingerprint
+        stats["persistent"] = self._conn is not None
+        return stats
+
+
+def ruleset_fingerprint(source_paths: Sequence[str], model_name: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Fingerprint everything a classification result depends on: the source of the classifier
+    and of the modules it matches text with (rules, weights, normalization and ensemble code),
+    the model name and the settings that change matching.
+    """
+    digest = hashlib.sha1()
+    for path in source_paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\x00")
+    digest.update(model_name.encode("utf-8"))
+    for name, value in sorted((settings or {}).items()):
+        digest.update(f"\x00{name}={value}".encode("utf-8"))
+    return digest.hexdigest()[:16]
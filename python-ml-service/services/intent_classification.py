@@ -1,10 +1,18 @@
 from transformers import pipeline
 import torch
+import contextvars
 import logging
 import os
 import re
-from typing import List, Dict, Tuple, Set
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Set, NamedTuple, Optional
 from collections import defaultdict, Counter
+from services.intent_cache import INTENT_CACHE_PATH, IntentResultCache, ruleset_fingerprint
+from services.model_workers import loads_model_here
+from services import phrase_rules, text_normalization
+from services.phrase_rules import PHRASE_GAP_CHARS, PHRASE_MAX_CHARS, PhraseRuleSet, engine_name
+from services.text_normalization import intent_text
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,41 +21,106 @@ logger = logging.getLogger(__name__)
 # Set cache directory
 cache_dir = os.environ.get('TRANSFORMERS_CACHE', '/app/models')
 
-# Load intent classification model with proper error handling
+# Load intent classification model with proper error handling (only in its worker process
+# when the intent pool is isolated)
 intent_classifier = None
+intent_model_name = "unavailable"
 
-try:
-    intent_classifier = pipeline(
-        "text-classification",
-        model="vineetsharma/customer-support-intent-albert",
-        return_all_scores=True,
-        device=0 if torch.cuda.is_available() else -1
-    )
-    logger.info("Loaded customer support intent classification model")
-except Exception as e:
-    logger.warning(f"Could not load customer support model, trying general intent model: {e}")
+if loads_model_here("intent"):
     try:
         intent_classifier = pipeline(
             "text-classification",
-            model="Sarthak279/Intent",
+            model="vineetsharma/customer-support-intent-albert",
             return_all_scores=True,
             device=0 if torch.cuda.is_available() else -1
         )
-        logger.info("Loaded general intent classification model")
+        intent_model_name = "vineetsharma/customer-support-intent-albert"
+        logger.info("Loaded customer support intent classification model")
     except Exception as e:
-        logger.warning(f"Could not load intent models, falling back to text classification: {e}")
+        logger.warning(f"Could not load customer support model, trying general intent model: {e}")
         try:
-            # Last fallback to a general text classification model (not sentiment-specific)
             intent_classifier = pipeline(
                 "text-classification",
-                model="distilbert-base-uncased-finetuned-sst-2-english",
+                model="Sarthak279/Intent",
                 return_all_scores=True,
                 device=0 if torch.cuda.is_available() else -1
             )
-            logger.info("Using general text classification model as fallback")
-        except Exception as fallback_e:
-            logger.error(f"Failed to load any classification model: {fallback_e}")
-            intent_classifier = None
+            intent_model_name = "Sarthak279/Intent"
+            logger.info("Loaded general intent classification model")
+        except Exception as e:
+            logger.warning(f"Could not load intent models, falling back to text classification: {e}")
+            try:
+                # Last fallback to a general text classification model (not sentiment-specific)
+                intent_classifier = pipeline(
+                    "text-classification",
+                    model="distilbert-base-uncased-finetuned-sst-2-english",
+                    return_all_scores=True,
+                    device=0 if torch.cuda.is_available() else -1
+                )
+                intent_model_name = "distilbert-base-uncased-finetuned-sst-2-english"
+                logger.info("Using general text classification model as fallback")
+            except Exception as fallback_e:
+                logger.error(f"Failed to load any classification model: {fallback_e}")
+                intent_classifier = None
+
+# Cache of final results, invalidated whenever this file, the phrase rule engine, text
+# normalization, the matching settings or the loaded model change. Only the process that
+# loads the model persists it, so the API process of an isolated pool (which has no model
+# name in its fingerprint) never prunes the worker's rows from the shared file.
+intent_result_cache = IntentResultCache(
+    ruleset_fingerprint(
+        [__file__, phrase_rules.__file__, text_normalization.__file__],
+        intent_model_name,
+        {"phrase_gap_chars": PHRASE_GAP_CHARS, "phrase_max_chars": PHRASE_MAX_CHARS, "phrase_engine": engine_name()},
+    ),
+    path=(INTENT_CACHE_PATH or None) if loads_model_here("intent") else None,
+)
+
+# Result cache classify_ticket_intent uses in place of intent_result_cache, inside use_result_cache()
+_result_cache: contextvars.ContextVar = contextvars.ContextVar("intent_result_cache", default=None)
+
+# Per-stage timings of classify_ticket_intent, collected only inside collect_stage_timings()
+_stage_timings: contextvars.ContextVar = contextvars.ContextVar("intent_stage_timings", default=None)
+
+
+@contextmanager
+def collect_stage_timings():
+    """
+    Collect the seconds spent in each classification stage for calls made in this block.
+    Yields a dict of stage name to accumulated seconds.
+    """
+    timings: Dict[str, float] = {}
+    token = _stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings.reset(token)
+
+
+@contextmanager
+def use_result_cache(cache: IntentResultCache):
+    """
+    Classify with `cache` instead of the shared result cache for calls made in this block,
+    e.g. so evaluation runs neither read nor wipe production entries.
+    """
+    token = _result_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _result_cache.reset(token)
+
+
+@contextmanager
+def _stage(name: str):
+    timings = _stage_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
 
 # Enhanced intent mapping with synonyms and variations
 INTENT_MAPPING = {
@@ -98,6 +171,7 @@ INTENT_MAPPING = {
 }
 
 # Enhanced phrase-based patterns for better context understanding
+# A `.*` in these rules spans at most PHRASE_GAP_CHARS characters (see services/phrase_rules.py)
 PHRASE_PATTERNS = {
     "refund_request": [
         r"\b(want|need|would like)\s+(a\s+)?refund\b",
@@ -176,16 +250,67 @@ PHRASE_PATTERNS = {
     ]
 }
 
-# Entity patterns for better context understanding
+# Rules for texts that carry two intents at once (e.g. complaint + refund request)
+MULTI_INTENT_PATTERNS = {
+    ("complaint_issue", "refund_request"): [
+        r"\b(disappointed|frustrated|angry).*(refund|money back)\b",
+        r"\b(terrible|awful|poor).*(want|need).*(refund|return)\b"
+    ],
+    ("technical_support", "escalation"): [
+        r"\b(not working|broken|error).*(urgent|asap|manager)\b",
+        r"\b(bug|issue|problem).*(immediately|escalate)\b"
+    ],
+    ("billing_inquiry", "refund_request"): [
+        r"\b(wrong charge|billing error).*(refund|money back)\b",
+        r"\b(charged twice|unauthorized).*(want.*back|refund)\b"
+    ],
+    ("cancellation_request", "refund_request"): [
+        r"\b(cancel|stop).*(refund|money back)\b",
+        r"\b(terminate|end).*(return.*money|refund)\b"
+    ]
+}
+
+PHRASE_RULES = PhraseRuleSet("phrase", PHRASE_PATTERNS)
+MULTI_INTENT_RULES = PhraseRuleSet("multi-intent", MULTI_INTENT_PATTERNS)
+
+# Entity patterns for better context understanding. Each type is scanned on its own, so
+# types that match the same text (a 10-digit number is both a phone and an order number)
+# are all found. Adjacent optional whitespace is written so it can only be matched one way
+# and the email local part is length-capped, which keeps long numeric or dotted texts
+# from backtracking.
 ENTITY_PATTERNS = {
-    "money_amount": r"\$\d+(?:\.\d{2})?|\b\d+\s*(dollar|euro|pound|cent)s?\b",
-    "order_number": r"\b(order|tracking|reference)?\s*#?\s*\d{6,}\b",
-    "email": r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b",
+    "money_amount": r"\$\d+(?:\.\d{2})?|\b\d+\s*(?:dollar|euro|pound|cent)s?\b",
+    "order_number": r"\b(?:order|tracking|reference)?\s*(?:#\s*)?\d{6,}\b",
+    "email": r"\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,255}\.[A-Z|a-z]{2,}\b",
     "phone": r"\b\d{3}[-.]?\d{3}[-.]?\d{4}\b",
     "date": r"\b\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4}\b",
-    "product_reference": r"\b(product|item|model)\s+#?\s*[A-Z0-9\-]+\b"
+    "product_reference": r"\b(?:product|item|model)\s+(?:#\s*)?[A-Z0-9\-]+\b"
+}
+
+# Precompiled once, one scanner per entity type
+ENTITY_SCANNERS = {
+    entity_type: re.compile(pattern, re.IGNORECASE) for entity_type, pattern in ENTITY_PATTERNS.items()
 }
 
+
+class EntitySpan(NamedTuple):
+    type: str
+    text: str
+    start: int
+    end: int
+
+
+def scan_entities(text: str) -> List[EntitySpan]:
+    """
+    Find all entity spans, with offsets and types. Spans of different types may overlap.
+    """
+    spans = []
+    for entity_type, scanner in ENTITY_SCANNERS.items():
+        for match in scanner.finditer(text or ""):
+            spans.append(EntitySpan(entity_type, match.group(), match.start(), match.end()))
+    return spans
+
+
 # Temporal and escalation indicators
 TEMPORAL_INDICATORS = {
     "escalation_signals": ["still", "again", "continue", "keep", "repeatedly", "multiple times", "several times"],
@@ -288,12 +413,9 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
     Extract various entities from text to improve intent classification context.
     """
     entities = {}
-    text_lower = text.lower()
     
-    for entity_type, pattern in ENTITY_PATTERNS.items():
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            entities[entity_type] = matches
+    for span in scan_entities(text):
+        entities.setdefault(span.type, []).append(span.text)
     
     return entities
 
@@ -338,17 +460,13 @@ def detect_phrase_patterns(text: str, intent: str) -> float:
     if intent not in PHRASE_PATTERNS:
         return 0.0
     
-    text_lower = text.lower()
     total_score = 0.0
     
-    patterns = PHRASE_PATTERNS[intent]
-    for pattern in patterns:
-        matches = re.findall(pattern, text_lower)
-        if matches:
-            # Score based on pattern specificity and match quality
-            pattern_specificity = len(pattern) / 50  # Longer patterns are more specific
-            match_bonus = min(len(matches) * 0.1, 0.3)  # Bonus for multiple matches
-            total_score += 0.4 + pattern_specificity + match_bonus
+    for pattern, matches in PHRASE_RULES.scan(text.lower()).get(intent, ()):
+        # Score based on pattern specificity and match quality
+        pattern_specificity = len(pattern) / 50  # Longer patterns are more specific
+        match_bonus = min(matches * 0.1, 0.3)  # Bonus for multiple matches
+        total_score += 0.4 + pattern_specificity + match_bonus
     
     return min(total_score, 0.95)
 
@@ -386,34 +504,9 @@ def detect_multi_intents(text: str) -> List[Tuple[str, float]]:
     Detect when a text contains multiple intents (e.g., complaint + refund request).
     """
     multi_intents = []
-    text_lower = text.lower()
-    
-    # Common multi-intent patterns
-    multi_patterns = {
-        ("complaint_issue", "refund_request"): [
-            r"\b(disappointed|frustrated|angry).*(refund|money back)\b",
-            r"\b(terrible|awful|poor).*(want|need).*(refund|return)\b"
-        ],
-        ("technical_support", "escalation"): [
-            r"\b(not working|broken|error).*(urgent|asap|manager)\b",
-            r"\b(bug|issue|problem).*(immediately|escalate)\b"
-        ],
-        ("billing_inquiry", "refund_request"): [
-            r"\b(wrong charge|billing error).*(refund|money back)\b",
-            r"\b(charged twice|unauthorized).*(want.*back|refund)\b"
-        ],
-        ("cancellation_request", "refund_request"): [
-            r"\b(cancel|stop).*(refund|money back)\b",
-            r"\b(terminate|end).*(return.*money|refund)\b"
-        ]
-    }
-    
-    for (intent1, intent2), patterns in multi_patterns.items():
-        for pattern in patterns:
-            if re.search(pattern, text_lower):
-                multi_intents.append((intent1, 0.6))
-                multi_intents.append((intent2, 0.6))
-                break
+    for intent1, intent2 in MULTI_INTENT_RULES.scan(text.lower()):
+        multi_intents.append((intent1, 0.6))
+        multi_intents.append((intent2, 0.6))
     
     return multi_intents
 
@@ -495,53 +588,9 @@ def calculate_semantic_similarity_boost(text: str, intent: str) -> float:
 def preprocess_text(text: str) -> str:
     """
     Advanced text preprocessing for better intent classification with typo correction.
+    Uses the shared single-pass normalizer, memoized per text.
     """
-    if not text:
-        return ""
-    
-    # Convert to lowercase
-    text = text.lower().strip()
-    
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Common typo corrections for critical keywords
-    typo_corrections = {
-        "cencel": "cancel",
-        "cancle": "cancel", 
-        "cancell": "cancel",
-        "canel": "cancel",
-        "cancal": "cancel",
-        "wan't": "want",
-        "wont": "want",
-        "recieve": "receive",
-        "refund": "refund",  # Keep as is but normalize
-        "retrun": "return",
-        "retur": "return",
-    }
-    
-    # Apply typo corrections
-    for typo, correction in typo_corrections.items():
-        text = re.sub(r'\b' + re.escape(typo) + r'\b', correction, text)
-    
-    # Expand common contractions
-    contractions = {
-        "can't": "cannot", "won't": "will not", "n't": " not",
-        "i'm": "i am", "you're": "you are", "it's": "it is",
-        "that's": "that is", "what's": "what is", "where's": "where is",
-        "how's": "how is", "here's": "here is", "there's": "there is"
-    }
-    
-    for contraction, expansion in contractions.items():
-        text = text.replace(contraction, expansion)
-    
-    # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s\.\!\?\-]', ' ', text)
-    
-    # Handle repeated punctuation
-    text = re.sub(r'[\.!?]{2,}', '.', text)
-    
-    return text.strip()
+    return intent_text(text)
 
 def detect_urgency_and_sentiment(text: str) -> Tuple[float, str]:
     """
@@ -839,9 +888,10 @@ def consolidate_similar_intents(results: List[Dict]) -> List[Dict]:
     
     return final_results
 
-def calculate_enhanced_intent_score(text: str, intent: str) -> float:
+def calculate_enhanced_intent_score(text: str, intent: str, entities: Optional[Dict[str, List[str]]] = None) -> float:
     """
     Calculate enhanced intent score using all advanced techniques.
+    Pass the ticket's `entities` when scoring several intents so they are extracted once.
     """
     # Get base keyword score
     if intent in ENHANCED_INTENT_PATTERNS:
@@ -856,7 +906,8 @@ def calculate_enhanced_intent_score(text: str, intent: str) -> float:
     semantic_boost = calculate_semantic_similarity_boost(text, intent)
     
     # Extract entities for context
-    entities = extract_entities(text)
+    if entities is None:
+        entities = extract_entities(text)
     entity_boost = 0.0
     
     if intent in ENTITY_INTENT_BOOSTERS:
@@ -930,10 +981,7 @@ def debug_intent_classification(subject: str, description: str, intent: str = "r
     
     # Check phrase patterns
     if intent in PHRASE_PATTERNS:
-        phrase_matches = []
-        for pattern in PHRASE_PATTERNS[intent]:
-            if re.search(pattern, ticket_text.lower()):
-                phrase_matches.append(pattern)
+        phrase_matches = [pattern for pattern, _ in PHRASE_RULES.scan(ticket_text.lower()).get(intent, ())]
         debug_info["pattern_matches"]["phrase_patterns"] = phrase_matches
     
     # Check keyword patterns
@@ -974,11 +1022,21 @@ def classify_ticket_intent(subject, description, debug=False):
             return [{"intent": "model_unavailable", "probability": 1.0}]
         
         # Advanced text preprocessing
-        processed_subject = preprocess_text(subject) if subject else ""
-        processed_description = preprocess_text(description) if description else ""
+        with _stage("preprocess"):
+            processed_subject = preprocess_text(subject) if subject else ""
+            processed_description = preprocess_text(description) if description else ""
+        
+        # Identical tickets reuse the previous result for the same ruleset and model
+        result_cache = _result_cache.get() or intent_result_cache
+        with _stage("cache"):
+            cache_key = result_cache.key(processed_subject, processed_description)
+            cached = result_cache.get(cache_key) if not debug else None
+        if cached is not None:
+            return cached
         
         # Analyze relationship between subject and description
-        relationship = analyze_subject_description_relationship(processed_subject, processed_description)
+        with _stage("analysis"):
+            relationship = analyze_subject_description_relationship(processed_subject, processed_description)
         
         # Combine with intelligent context weighting
         if processed_subject and processed_description:
@@ -992,20 +1050,24 @@ def classify_ticket_intent(subject, description, debug=False):
             logger.warning("Empty ticket text provided")
             return [{"intent": "unknown", "probability": 1.0}]
         
-        # Analyze text quality for confidence adjustment
-        text_quality = analyze_text_quality(ticket_text)
-        
-        # Detect urgency and sentiment for score adjustment
-        urgency_score, sentiment = detect_urgency_and_sentiment(ticket_text)
+        with _stage("analysis"):
+            # Analyze text quality for confidence adjustment
+            text_quality = analyze_text_quality(ticket_text)
+            
+            # Detect urgency and sentiment for score adjustment
+            urgency_score, sentiment = detect_urgency_and_sentiment(ticket_text)
         
         # Extract entities for context enhancement
-        entities = extract_entities(ticket_text)
+        with _stage("entities"):
+            entities = extract_entities(ticket_text)
         
         # Detect multi-intents
-        multi_intents = detect_multi_intents(ticket_text)
+        with _stage("multi_intent"):
+            multi_intents = detect_multi_intents(ticket_text)
         
         # Get ML model predictions
-        predictions = intent_classifier(ticket_text)
+        with _stage("model"):
+            predictions = intent_classifier(ticket_text)
         
         # Process ML results with confidence thresholding
         ml_results = []
@@ -1035,14 +1097,15 @@ def classify_ticket_intent(subject, description, debug=False):
         
         # Enhanced keyword and phrase-based scoring
         enhanced_results = []
-        for intent in ENHANCED_INTENT_PATTERNS.keys():
-            score = calculate_enhanced_intent_score(ticket_text, intent)
-            if score > 0.01:  # Very low threshold to capture all possibilities
-                enhanced_results.append({
-                    "intent": intent,
-                    "probability": round(score, 4),
-                    "source": "enhanced_analysis"
-                })
+        with _stage("rules"):
+            for intent in ENHANCED_INTENT_PATTERNS.keys():
+                score = calculate_enhanced_intent_score(ticket_text, intent, entities)
+                if score > 0.01:  # Very low threshold to capture all possibilities
+                    enhanced_results.append({
+                        "intent": intent,
+                        "probability": round(score, 4),
+                        "source": "enhanced_analysis"
+                    })
         
         # Add multi-intent results
         for intent, score in multi_intents:
@@ -1052,21 +1115,22 @@ def classify_ticket_intent(subject, description, debug=False):
                 "source": "multi_intent"
             })
         
-        # Advanced ensemble scoring
-        final_results = _advanced_ensemble_scoring(
-            ml_results, enhanced_results, urgency_score, sentiment, 
-            text_quality, relationship, entities
-        )
-        
-        # Apply intelligent confidence thresholding
-        confidence_threshold = 0.01 if text_quality["quality"] > 0.5 else 0.005
-        final_results = [r for r in final_results if r["probability"] >= confidence_threshold]
-        
-        # Consolidate similar intents
-        final_results = consolidate_similar_intents(final_results)
-        
-        # Smart normalize probabilities (preserves high confidence)
-        final_results = normalize_probabilities(final_results)
+        with _stage("ensemble"):
+            # Advanced ensemble scoring
+            final_results = _advanced_ensemble_scoring(
+                ml_results, enhanced_results, urgency_score, sentiment, 
+                text_quality, relationship, entities
+            )
+            
+            # Apply intelligent confidence thresholding
+            confidence_threshold = 0.01 if text_quality["quality"] > 0.5 else 0.005
+            final_results = [r for r in final_results if r["probability"] >= confidence_threshold]
+            
+            # Consolidate similar intents
+            final_results = consolidate_similar_intents(final_results)
+            
+            # Smart normalize probabilities (preserves high confidence)
+            final_results = normalize_probabilities(final_results)
         
         # Remove source field before returning
         for result in final_results:
@@ -1078,6 +1142,8 @@ def classify_ticket_intent(subject, description, debug=False):
             logger.warning("No valid predictions after filtering, using fallback")
             return _get_enhanced_keyword_classification(ticket_text)
         
+        result_cache.set(cache_key, final_results)
+        
         # Add debug information if requested
         if debug and final_results:
             top_intent = final_results[0]["intent"]
@@ -0,0 +1,183 @@
+import json
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Classification passes the harness can run:
+#   cold - evaluation result cache cleared first, so every ticket runs the full pipeline
+#   warm - the same tickets again, served from the evaluation result cache
+# Passes use a private in-memory result cache, never the shared (possibly persistent) one.
+EVALUATION_MODES = ("cold", "warm")
+
+
+def load_labeled_tickets(path: str) -> List[Dict]:
+    """
+    Load labeled tickets from a JSON list or a JSONL file. Each ticket needs
+    'subject', 'description' and the expected 'intent'.
+    """
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            tickets = [json.loads(line) for line in f if line.strip()]
+        else:
+            tickets = json.load(f)
+
+    for position, ticket in enumerate(tickets):
+        missing = [field for field in ("subject", "description", "intent") if field not in ticket]
+        if missing:
+            raise ValueError(f"Ticket {position} is missing {', '.join(missing)}")
+    return tickets
+
+
+def classification_metrics(expected: Sequence[str], predicted: Sequence[str]) -> Dict:
+    """
+    Top-1 accuracy, macro F1 and per-intent precision/recall/F1/support.
+    """
+    true_positive = defaultdict(int)
+    predicted_count = defaultdict(int)
+    support = defaultdict(int)
+    for gold, guess in zip(expected, predicted):
+        support[gold] += 1
+        predicted_count[guess] += 1
+        if gold == guess:
+            true_positive[gold] += 1
+
+    per_intent = {}
+    for intent in sorted(support):
+        precision = true_positive[intent] / predicted_count[intent] if predicted_count[intent] else 0.0
+        recall = true_positive[intent] / support[intent]
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_intent[intent] = {
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "support": support[intent],
+        }
+
+    correct = sum(true_positive.values())
+    return {
+        "accuracy": round(correct / len(expected), 4) if expected else 0.0,
+        "macro_f1": round(float(np.mean([m["f1"] for m in per_intent.values()])), 4) if per_intent else 0.0,
+        "per_intent": per_intent,
+        "unexpected_predictions": sorted(set(predicted_count) - set(support)),
+    }
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """
+    Mean, median, p95 and max of a list of durations, in milliseconds.
+    """
+    if not seconds:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def _top_intent(results) -> str:
+    if isinstance(results, dict):
+        results = results.get("results", [])
+    return results[0]["intent"] if results else "unknown"
+
+
+def run_pass(tickets: Iterable[Dict], classify: Callable, collect_timings: Optional[Callable] = None) -> Dict:
+    """
+    Classify every ticket once, timing each call and (when `collect_timings` is given)
+    each pipeline stage. Returns the predictions and latency figures for the pass.
+    """
+    predictions, totals = [], []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    started = time.perf_counter()
+    for ticket in tickets:
+        call_start = time.perf_counter()
+        if collect_timings is not None:
+            with collect_timings() as timings:
+                results = classify(ticket["subject"], ticket["description"])
+            for stage, seconds in timings.items():
+                stages[stage].append(seconds)
+        else:
+            results = classify(ticket["subject"], ticket["description"])
+        totals.append(time.perf_counter() - call_start)
+        predictions.append(_top_intent(results))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "predictions": predictions,
+        "latency": {
+            "total": latency_summary(totals),
+            "stages": {stage: latency_summary(samples) for stage, samples in sorted(stages.items())},
+        },
+        "tickets_per_second": round(len(totals) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def evaluate(tickets: List[Dict], modes: Sequence[str] = EVALUATION_MODES) -> Dict:
+    """
+    Run the intent classifier over labeled tickets in each mode and build a report
+    with accuracy and latency figures, keyed to the ruleset/model fingerprint.
+    """
+    unknown = [mode for mode in modes if mode not in EVALUATION_MODES]
+    if unknown:
+        raise ValueError(f"Unknown modes {unknown}. Expected some of {', '.join(EVALUATION_MODES)}")
+
+    from services.intent_cache import IntentResultCache
+    from services.intent_classification import (
+        classify_ticket_intent, collect_stage_timings, intent_model_name, intent_result_cache, use_result_cache
+    )
+
+    expected = [ticket["intent"] for ticket in tickets]
+    report = {
+        "fingerprint": intent_result_cache.fingerprint,
+        "model": intent_model_name,
+        "tickets": len(tickets),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "modes": {},
+    }
+    cache = IntentResultCache(
+        intent_result_cache.fingerprint, maxsize=max(len(tickets), 1), path=None, name="intent-results-evaluation"
+    )
+    for mode in modes:
+        if mode == "cold":
+            cache.clear()
+        with use_result_cache(cache):
+            result = run_pass(tickets, classify_ticket_intent, collect_stage_timings)
+        report["modes"][mode] = {
+            **classification_metrics(expected, result.pop("predictions")),
+            **result,
+        }
+    return report
+
+
+def compare_reports(current: Dict, baseline: Dict, max_accuracy_drop: float = 0.01,
+                    max_recall_drop: float = 0.05, max_latency_increase: float = 0.25,
+                    min_support: int = 3) -> List[str]:
+    """
+    List the accuracy and speed regressions of `current` against `baseline`.
+    Latency is compared on p95 per mode, as a relative increase.
+    """
+    regressions = []
+    for mode, now in current["modes"].items():
+        before = baseline.get("modes", {}).get(mode)
+        if before is None:
+            continue
+
+        if before["accuracy"] - now["accuracy"] > max_accuracy_drop:
+            regressions.append(f"{mode}: accuracy {before['accuracy']:.4f} -> {now['accuracy']:.4f}")
+
+        for intent, metrics in now["per_intent"].items():
+            previous = before["per_intent"].get(intent)
+            if previous is None or metrics["support"] < min_support:
+                continue
+            if previous["recall"] - metrics["recall"] > max_recall_drop:
+                regressions.append(f"{mode}: {intent} recall {previous['recall']:.4f} -> {metrics['recall']:.4f}")
+
+        previous_p95 = before["latency"]["total"]["p95_ms"]
+        p95 = now["latency"]["total"]["p95_ms"]
+        if previous_p95 > 0 and (p95 - previous_p95) / previous_p95 > max_latency_increase:
+            regressions.append(f"{mode}: p95 latency {previous_p95:.3f}ms -> {p95:.3f}ms")
+    return regressions
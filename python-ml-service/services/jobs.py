@@ -0,0 +1,333 @@
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+from services.model_pools import submit_to_pool
+
+logger = logging.getLogger(__name__)
+
+# Queue configuration
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', '/app/data/jobs.sqlite3')
+JOBS_OUTPUT_DIR = os.environ.get('JOBS_OUTPUT_DIR', '/app/data/jobs')
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', '1.0'))
+# Server-side ticket files for jobs must live under this directory
+JOBS_INPUT_DIR = os.environ.get('JOBS_INPUT_DIR', '/app/data/imports')
+# Tickets stored per transaction while a job is submitted; the queue lock is released between chunks
+JOBS_INSERT_CHUNK = int(os.environ.get('JOBS_INSERT_CHUNK', '1000'))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    operations TEXT NOT NULL,
+    batch_size INTEGER NOT NULL,
+    output_path TEXT NOT NULL,
+    output_offset INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    run_started_at REAL,
+    run_processed INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+def _classify_batch(tickets: List[Dict]) -> List:
+    from services.intent_classification import classify_ticket_intent
+    return [classify_ticket_intent(t.get("subject", ""), t.get("description", "")) for t in tickets]
+
+
+def _default_operations() -> Dict[str, Callable[[List[Dict]], List]]:
+    """
+    Batch operations a job can run, imported lazily so the queue does not load models on its own.
+    Each operation takes a batch of tickets and returns one result per ticket. Batches run on
+    the model pools in the bulk lane, so real-time requests are scheduled ahead of them.
+    """
+    def embedding(tickets):
+        from services.SBERT_embedding import get_embedded_text
+        from services.near_duplicates import NEAR_DUPLICATE_ENABLED
+        return submit_to_pool(
+            "sbert", get_embedded_text, tickets, near_duplicates=NEAR_DUPLICATE_ENABLED, priority="bulk"
+        ).result().tolist()
+
+    def intent(tickets):
+        return submit_to_pool("intent", _classify_batch, tickets, priority="bulk").result()
+
+    def summary(tickets):
+        from services.summarize import summarize_texts
+        texts = [f"{t.get('subject', '')} {t.get('description', '')}" for t in tickets]
+        return submit_to_pool("summarizer", summarize_texts, texts, priority="bulk").result()
+
+    return {"embedding": embedding, "intent": intent, "summary": summary}
+
+
+class JobQueue:
+    """
+    File-backed bulk job queue.
+
+    Jobs and their tickets are stored in SQLite; a background thread runs one job at a
+    time in batches, appends results to a JSONL output file and checkpoints the number of
+    processed tickets together with the output file offset after every batch. A job that
+    was interrupted resumes from its last checkpoint when the queue starts again.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, output_dir: str = JOBS_OUTPUT_DIR,
+                 operations: Optional[Dict[str, Callable]] = None, poll_interval: float = JOBS_POLL_INTERVAL):
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self.operations = operations if operations is not None else _default_operations()
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: Iterable = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params))
+
+    def _transaction(self, sql: str, rows: List[tuple]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(sql, rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def submit(self, tickets: Iterable[Dict], operations: List[str], batch_size: int = 32) -> Dict:
+        """
+        Store a new job and its tickets. The tickets are consumed lazily and stored in chunks
+        of JOBS_INSERT_CHUNK, so a large file can be streamed straight into the queue while
+        other calls on the queue still get their turn.
+        """
+        unknown = [op for op in operations if op not in self.operations]
+        if not operations or unknown:
+            raise ValueError(f"Unknown operations {unknown}. Expected some of {', '.join(self.operations)}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        job_id = uuid.uuid4().hex
+        output_path = os.path.join(self.output_dir, f"{job_id}.jsonl")
+        total = 0
+        tickets = iter(tickets)
+        try:
+            # Items are invisible to the runner until the job row exists, so they can be
+            # committed chunk by chunk without holding the lock for the whole file
+            for chunk in iter(lambda: list(itertools.islice(tickets, JOBS_INSERT_CHUNK)), []):
+                rows = [(job_id, total + offset, json.dumps(ticket)) for offset, ticket in enumerate(chunk)]
+                self._transaction("INSERT INTO job_items (job_id, seq, payload) VALUES (?, ?, ?)", rows)
+                total += len(rows)
+            self._transaction(
+                "INSERT INTO jobs (id, status, operations, batch_size, output_path, total, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                [(job_id, json.dumps(operations), batch_size, output_path, total, time.time())]
+            )
+        except BaseException:
+            self._execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            raise
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._describe(row) if row else None
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        rows = self._execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._describe(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        self._execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN (?, ?)",
+            (time.time(), job_id, *ACTIVE_STATUSES)
+        )
+        return self.get(job_id)
+
+    def _describe(self, row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["operations"] = json.loads(job["operations"])
+        job.pop("output_offset")
+        run_started_at = job.pop("run_started_at")
+        run_processed = job.pop("run_processed")
+
+        # Throughput is measured over the current run so a resume does not skew it
+        rate = 0.0
+        if run_started_at and run_processed:
+            end = job["finished_at"] or time.time()
+            rate = run_processed / max(end - run_started_at, 1e-6)
+        remaining = job["total"] - job["processed"]
+        job["progress"] = round(job["processed"] / job["total"], 4) if job["total"] else 1.0
+        job["tickets_per_second"] = round(rate, 2)
+        job["eta_seconds"] = round(remaining / rate, 1) if rate and job["status"] == "running" else None
+        return job
+
+    def start(self):
+        """
+        Start the background runner. Jobs left running by a previous process are resumed.
+        """
+        if self._thread is not None:
+            return
+        self._execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="job-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """
+        Stop after the current batch. The job keeps its checkpoint and resumes on the next start.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run_forever(self):
+        while not self._stopping.is_set():
+            row = self._execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self.run_job(row["id"])
+            except Exception as e:
+                logger.error(f"Job {row['id']} failed: {e}", exc_info=True)
+                self._execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (str(e), time.time(), row["id"])
+                )
+
+    def run_job(self, job_id: str):
+        """
+        Run (or resume) one job from its last checkpoint until it finishes, is cancelled or the queue stops.
+        """
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), "
+            "run_started_at = ?, run_processed = 0 WHERE id = ?",
+            (now, now, job_id)
+        )
+        operations = json.loads(row["operations"])
+        processed = row["processed"]
+
+        with open(row["output_path"], "a+b") as output:
+            # Drop any results written after the last checkpoint
+            output.truncate(row["output_offset"])
+            output.seek(row["output_offset"])
+
+            while processed < row["total"]:
+                status = self._execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+                if status != "running" or self._stopping.is_set():
+                    return
+
+                items = self._execute(
+                    "SELECT seq, payload FROM job_items WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                    (job_id, processed, row["batch_size"])
+                ).fetchall()
+                tickets = [json.loads(item["payload"]) for item in items]
+                results = {op: self.operations[op](tickets) for op in operations}
+
+                lines = []
+                for position, (item, ticket) in enumerate(zip(items, tickets)):
+                    record = {"seq": item["seq"], "id": ticket.get("id")}
+                    for op in operations:
+                        record[op] = results[op][position]
+                    lines.append(json.dumps(record) + "\n")
+                output.write("".join(lines).encode("utf-8"))
+                output.flush()
+                os.fsync(output.fileno())
+
+                processed += len(items)
+                self._execute(
+                    "UPDATE jobs SET processed = ?, output_offset = ?, run_processed = run_processed + ? WHERE id = ?",
+                    (processed, output.tell(), len(items), job_id)
+                )
+
+        self._execute(
+            "UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ? AND status = 'running'",
+            (time.time(), job_id)
+        )
+        self._execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+
+
+def resolve_input_path(path: str, root: str = JOBS_INPUT_DIR) -> str:
+    """
+    Resolve a job input file, relative to `root` unless absolute, with symlinks and '..'
+    followed. Raises ValueError for anything outside `root` or not a regular file.
+    """
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Input files must be under {JOBS_INPUT_DIR}")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"Input file not found: {path}")
+    return resolved
+
+
+def read_tickets_file(path: str) -> Iterable[Dict]:
+    """
+    Stream tickets from a JSONL file, or load them from a JSON array file.
+    """
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path) as f:
+            yield from json.load(f)
+
+
+# Global queue instance
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Get or create the process-wide job queue and start its runner.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+            _queue.start()
+    return _queue
+
+
+def stop_job_queue():
+    """
+    Stop the process-wide runner if it was started.
+    """
+    if _queue is not None:
+        _queue.stop()
@@ -0,0 +1,268 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+from services.cache import get_caches
+from services.deadlines import endpoint_name
+
+# Number of recent requests kept per endpoint
+MEMORY_HISTORY_SIZE = int(os.environ.get('MEMORY_HISTORY_SIZE', '50'))
+# Trace Python allocations with tracemalloc for per-request peaks (adds overhead to every allocation)
+MEMORY_TRACEMALLOC = os.environ.get('MEMORY_TRACEMALLOC', 'false').lower() == 'true'
+
+# Label for requests that matched no route, so unknown paths do not add endpoints
+UNMATCHED_ENDPOINT = "unmatched"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Where each loaded model lives; modules that were never imported are skipped
+_MODEL_SOURCES = {
+    "sbert": ("services.SBERT_embedding", lambda module: module._models),
+    "distilbert": ("services.DistilBERT_embedding", lambda module: module.distilbert_model),
+    "intent": ("services.intent_classification", lambda module: getattr(module.intent_classifier, "model", None)),
+    "summarizer": ("services.summarize", lambda module: getattr(module.summarizer, "model", None)),
+    "qa": ("services.answer", lambda module: getattr(module.qa_pipeline, "model", None)),
+}
+
+_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=MEMORY_HISTORY_SIZE))
+_history_lock = threading.Lock()
+
+
+def current_rss() -> Optional[int]:
+    """
+    Resident set size in bytes, read from /proc without any dependency.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Process RSS, USS (private memory) and peak RSS in bytes. Uses psutil when installed,
+    otherwise /proc/self/status and /proc/self/smaps_rollup.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            info = psutil.Process().memory_full_info()
+            return {"rss": info.rss, "uss": getattr(info, "uss", None), "peak_rss": _proc_status_kb("VmHWM")}
+        except psutil.Error:
+            # AccessDenied (USS needs to read smaps) or NoSuchProcess: fall back to /proc
+            pass
+
+    uss = None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            private = 0
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:", "Private_Hugetlb:")):
+                    private += int(line.split()[1]) * 1024
+            uss = private
+    except OSError:
+        pass
+    return {"rss": current_rss(), "uss": uss, "peak_rss": _proc_status_kb("VmHWM")}
+
+
+def _proc_status_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _tensor_bytes(tensors) -> int:
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def model_memory() -> Dict[str, Dict[str, Any]]:
+    """
+    Parameter and buffer bytes of every loaded model.
+    """
+    models = {}
+    for name, (module_name, getter) in _MODEL_SOURCES.items():
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        try:
+            model = getter(module)
+        except AttributeError:
+            model = None
+        # Modules holding several models (one per model name) are reported per model
+        loaded = {f"{name}:{key}": value for key, value in model.items()} if isinstance(model, dict) else {name: model}
+        for label, model in loaded.items():
+            if model is None or not hasattr(model, "parameters"):
+                continue
+            parameters = list(model.parameters())
+            models[label] = {
+                "parameter_bytes": _tensor_bytes(parameters),
+                "buffer_bytes": _tensor_bytes(model.buffers()),
+                "dtype": str(parameters[0].dtype) if parameters else None,
+            }
+    return models
+
+
+def _approx_size(value: Any, depth: int = 0) -> int:
+    """
+    Rough size of a cached value: exact for arrays, shallow-recursive for containers.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if depth > 3:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_approx_size(k, depth + 1) + _approx_size(v, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_approx_size(item, depth + 1) for item in value)
+    return sys.getsizeof(value)
+
+
+def cache_memory() -> Dict[str, Dict[str, Any]]:
+    """
+    Entry count and approximate size of every named cache.
+    """
+    caches = {}
+    for name, cache in get_caches().items():
+        caches[name] = {
+            "entries": len(cache),
+            "approx_bytes": sum(_approx_size(key) + _approx_size(value) for key, value in cache.items()),
+            "maxsize": cache.maxsize,
+        }
+    return caches
+
+
+def record_request(endpoint: str, rss_before: Optional[int], rss_after: Optional[int],
+                   traced_peak: Optional[int], duration: float):
+    with _history_lock:
+        _history[endpoint].append({
+            "rss_growth": max(rss_after - rss_before, 0) if rss_before is not None and rss_after is not None else None,
+            "traced_peak": traced_peak,
+            "duration_seconds": round(duration, 4),
+            "at": time.time(),
+        })
+
+
+def endpoint_memory() -> Dict[str, Dict[str, Any]]:
+    """
+    Peak allocation over the last requests of each endpoint.
+    `rss_growth` is the resident-memory increase across a request; `traced_peak` is the
+    peak of Python-heap allocations when MEMORY_TRACEMALLOC is on. Both are process-wide,
+    so concurrent requests are attributed to each other.
+    """
+    with _history_lock:
+        history = {endpoint: list(requests) for endpoint, requests in _history.items()}
+
+    summary = {}
+    for endpoint, requests in history.items():
+        growth = [r["rss_growth"] for r in requests if r["rss_growth"] is not None]
+        traced = [r["traced_peak"] for r in requests if r["traced_peak"] is not None]
+        summary[endpoint] = {
+            "requests": len(requests),
+            "peak_rss_growth": max(growth) if growth else None,
+            "peak_traced_allocation": max(traced) if traced else None,
+        }
+    return summary
+
+
+def memory_report() -> Dict[str, Any]:
+    return {
+        "process": process_memory(),
+        "models": model_memory(),
+        "caches": cache_memory(),
+        "endpoints": endpoint_memory(),
+        "tracemalloc": tracemalloc.is_tracing(),
+    }
+
+
+def route_endpoint(scope) -> str:
+    """
+    Endpoint of a handled request by its route template (e.g. "jobs/{job_id}"), so paths
+    with ids share one entry; requests that matched no route share UNMATCHED_ENDPOINT.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return endpoint_name(path) if path else UNMATCHED_ENDPOINT
+
+
+async def memory_tracking_middleware(request, call_next):
+    """
+    Record resident-memory growth (and the traced allocation peak when enabled) per request,
+    keyed by route template.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    rss_before = current_rss()
+    start_time = time.time()
+    try:
+        return await call_next(request)
+    finally:
+        traced_peak = tracemalloc.get_traced_memory()[1] if tracing else None
+        record_request(route_endpoint(request.scope), rss_before, current_rss(), traced_peak, time.time() - start_time)
+
+
+class MemoryCollector:
+    """
+    Prometheus collector exporting the memory report as gauges, computed at scrape time.
+    """
+
+    def collect(self):
+        process = process_memory()
+        process_gauge = GaugeMetricFamily('ml_process_memory_bytes', 'Process memory by kind', labels=['kind'])
+        for kind, value in process.items():
+            if value is not None:
+                process_gauge.add_metric([kind], value)
+        yield process_gauge
+
+        model_gauge = GaugeMetricFamily('ml_model_memory_bytes', 'Loaded model tensor memory', labels=['model', 'kind'])
+        for name, info in model_memory().items():
+            model_gauge.add_metric([name, "parameters"], info["parameter_bytes"])
+            model_gauge.add_metric([name, "buffers"], info["buffer_bytes"])
+        yield model_gauge
+
+        entries_gauge = GaugeMetricFamily('ml_cache_entries', 'Entries per cache', labels=['cache'])
+        bytes_gauge = GaugeMetricFamily('ml_cache_memory_bytes', 'Approximate memory per cache', labels=['cache'])
+        for name, info in cache_memory().items():
+            entries_gauge.add_metric([name], info["entries"])
+            bytes_gauge.add_metric([name], info["approx_bytes"])
+        yield entries_gauge
+        yield bytes_gauge
+
+        peak_gauge = GaugeMetricFamily(
+            'ml_endpoint_peak_rss_growth_bytes', 'Largest RSS growth over recent requests', labels=['endpoint']
+        )
+        for endpoint, info in endpoint_memory().items():
+            if info["peak_rss_growth"] is not None:
+                peak_gauge.add_metric([endpoint], info["peak_rss_growth"])
+        yield peak_gauge
+
+
+_collector_registered = False
+
+
+def install_memory_metrics():
+    """
+    Register the memory collector with Prometheus and start tracemalloc if configured.
+    """
+    global _collector_registered
+    if MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not _collector_registered:
+        REGISTRY.register(MemoryCollector())
+        _collector_registered = True
@@ -0,0 +1,309 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from services.deadlines import check_deadline, current_state, operation_name
+from services.model_workers import isolated, stop_workers, worker_for
+from services.sharding import sharded, sharded_workers, stop_shards
+
+# Worker threads per model pool, e.g. "sbert=2,summarizer=1"
+DEFAULT_POOL_SIZES = {
+    "sbert": 2,
+    "minilm": 2,
+    "distilbert": 1,
+    "intent": 2,
+    "keywords": 1,
+    "summarizer": 1,
+    "qa": 1,
+}
+
+# Which pool each operation runs on
+OPERATION_POOLS = {
+    "sbert-embed": "sbert",
+    "minilm-embed": "minilm",
+    "distilbert-embed": "distilbert",
+    "classify-intent": "intent",
+    "extract-keywords": "keywords",
+    "summarize": "summarizer",
+    "answer": "qa",
+    "answer-questions": "qa",
+}
+
+# Priority lanes and their scheduling weights, e.g. "interactive=9,bulk=1".
+# When both lanes have work, each lane gets at least its weight's share of dispatches.
+PRIORITY_HEADER = "x-priority"
+DEFAULT_PRIORITY = "interactive"
+DEFAULT_PRIORITY_WEIGHTS = {"interactive": 9, "bulk": 1}
+# Lane for requests that do not send the header, by operation (see deadlines.operation_name).
+# /sbert-embed stays interactive because search embeds its queries there; bulk callers send x-priority.
+DEFAULT_ROUTE_PRIORITIES = {
+    "distilbert-embed": "bulk",
+    "index/tickets": "bulk",
+}
+
+POOL_QUEUE_DEPTH = Gauge(
+    'ml_pool_queue_depth',
+    'Model calls waiting for a pool worker',
+    ['pool', 'lane']
+)
+POOL_WAIT = Histogram(
+    'ml_pool_wait_seconds',
+    'Time model calls wait for a pool worker',
+    ['pool', 'lane'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+POOL_TASKS = Counter(
+    'ml_pool_tasks_total',
+    'Model calls dispatched to pool workers',
+    ['pool', 'lane']
+)
+POOL_PROMOTIONS = Counter(
+    'ml_pool_promotions_total',
+    'Queued model calls moved to a higher-weighted lane because a caller from that lane joined them',
+    ['pool', 'from_lane', 'to_lane']
+)
+
+
+def _parse_pairs(spec: str, defaults: Dict[str, Any], cast: Callable) -> Dict[str, Any]:
+    values = dict(defaults)
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        values[name.strip()] = cast(value.strip())
+    return values
+
+
+POOL_SIZES = _parse_pairs(os.environ.get('MODEL_POOL_SIZES', ''), DEFAULT_POOL_SIZES, lambda v: max(int(v), 1))
+PRIORITY_WEIGHTS = _parse_pairs(os.environ.get('PRIORITY_WEIGHTS', ''), DEFAULT_PRIORITY_WEIGHTS, lambda v: max(int(v), 1))
+ROUTE_PRIORITIES = _parse_pairs(os.environ.get('ROUTE_PRIORITIES', ''), DEFAULT_ROUTE_PRIORITIES, str)
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("priority", default=DEFAULT_PRIORITY)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def set_priority(lane: str) -> contextvars.Token:
+    if lane not in PRIORITY_WEIGHTS:
+        raise ValueError(f"Unknown priority '{lane}'. Expected one of {', '.join(PRIORITY_WEIGHTS)}")
+    return _priority.set(lane)
+
+
+class PriorityPool:
+    """
+    Fixed set of worker threads for one model, fed from one queue per priority lane.
+
+    Lanes are picked by smooth weighted round-robin over the lanes that have work, so
+    interactive calls overtake a backlog of bulk batches, while bulk is still guaranteed
+    its weighted share and never starves. Within a lane calls run in FIFO order.
+    """
+
+    def __init__(self, name: str, workers: int, weights: Dict[str, int] = PRIORITY_WEIGHTS):
+        self.name = name
+        self.weights = dict(weights)
+        self._lanes: Dict[str, Deque[Tuple[Future, Callable, float]]] = {lane: deque() for lane in weights}
+        self._credit = {lane: 0 for lane in weights}
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads: List[threading.Thread] = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"pool-{name}_{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, lane: str, call: Callable) -> Future:
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown priority '{lane}'")
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError(f"Model pool '{self.name}' is shut down")
+            self._lanes[lane].append((future, call, time.monotonic()))
+            POOL_QUEUE_DEPTH.labels(pool=self.name, lane=lane).set(len(self._lanes[lane]))
+            self._condition.notify()
+        return future
+
+    def promote(self, future: Future, lane: str) -> bool:
+        """
+        Move a call still waiting in a lower-weighted lane to `lane`, ahead of the calls
+        there that were queued after it. Returns False if it is no longer queued.
+        """
+        with self._condition:
+            for current, queue in self._lanes.items():
+                if self.weights[current] >= self.weights[lane]:
+                    continue
+                entry = next((entry for entry in queue if entry[0] is future), None)
+                if entry is None:
+                    continue
+                queue.remove(entry)
+                target = self._lanes[lane]
+                position = len(target)
+                while position and target[position - 1][2] > entry[2]:
+                    position -= 1
+                target.insert(position, entry)
+                POOL_QUEUE_DEPTH.labels(pool=self.name, lane=current).set(len(queue))
+                POOL_QUEUE_DEPTH.labels(pool=self.name, lane=lane).set(len(target))
+                POOL_PROMOTIONS.labels(pool=self.name, from_lane=current, to_lane=lane).inc()
+                return True
+        return False
+
+    def _next_lane(self) -> Optional[str]:
+        ready = [lane for lane, queue in self._lanes.items() if queue]
+        if not ready:
+            return None
+        if len(ready) == 1:
+            return ready[0]
+        total = 0
+        for lane in ready:
+            self._credit[lane] += self.weights[lane]
+            total += self.weights[lane]
+        chosen = max(ready, key=self._credit.get)
+        self._credit[chosen] -= total
+        return chosen
+
+    def _work(self):
+        while True:
+            with self._condition:
+                lane = self._next_lane()
+                while lane is None and not self._shutdown:
+                    self._condition.wait()
+                    lane = self._next_lane()
+                if lane is None:
+                    return
+                future, call, queued_at = self._lanes[lane].popleft()
+                POOL_QUEUE_DEPTH.labels(pool=self.name, lane=lane).set(len(self._lanes[lane]))
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            POOL_WAIT.labels(pool=self.name, lane=lane).observe(time.monotonic() - queued_at)
+            POOL_TASKS.labels(pool=self.name, lane=lane).inc()
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self._condition:
+            return {lane: len(queue) for lane, queue in self._lanes.items()}
+
+    def shutdown(self):
+        with self._condition:
+            self._shutdown = True
+            for queue in self._lanes.values():
+                while queue:
+                    queue.popleft()[0].cancel()
+            self._condition.notify_all()
+
+
+_pools: Dict[str, PriorityPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str) -> PriorityPool:
+    """
+    Get or create the workers for a model pool. Each model gets its own threads so a slow
+    model (e.g. BART generation) cannot occupy the workers another model needs.
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = PriorityPool(name, POOL_SIZES.get(name, 1))
+            _pools[name] = pool
+    return pool
+
+
+def pool_for(operation: str) -> str:
+    return OPERATION_POOLS.get(operation, operation)
+
+
+def _run_if_wanted(name: str, call: Callable) -> Any:
+    # Work that waited in the pool queue past its deadline (or lost its client) is dropped unrun
+    check_deadline(name, stage="queued")
+    return call()
+
+
+def _run_in_worker(name: str, fn: Callable, args: tuple, kwargs: Dict[str, Any], affinity: Optional[str]) -> Any:
+    check_deadline(name, stage="queued")
+    state = current_state()
+    deadline = state.deadline if state is not None else None
+    if sharded(name):
+        return sharded_workers(name, POOL_SIZES.get(name, 1)).call(affinity, fn, args, kwargs, deadline)
+    return worker_for(name).call(fn, args, kwargs, deadline)
+
+
+def submit_to_pool(name: str, fn: Callable, *args, priority: Optional[str] = None, local: bool = False,
+                   affinity: Optional[str] = None, **kwargs) -> Future:
+    """
+    Queue a blocking model call on the named pool from any thread, in the caller's
+    priority lane unless one is given, carrying the caller's context variables.
+
+    When the pool is isolated (MODEL_ISOLATION), the call is sent to the worker process
+    owned by the pool thread that picks it up, so `fn` must be a module-level function
+    and its arguments picklable. `local=True` keeps a call in this process, for work
+    that needs API-process state such as the similarity index.
+
+    When the pool is also sharded (MODEL_SHARDING), `affinity` (a digest of the normalized
+    input) picks the worker process, so repeated inputs hit that process's caches.
+    """
+    context = contextvars.copy_context()
+    if isolated(name) and not local:
+        call = functools.partial(context.run, _run_in_worker, name, fn, args, kwargs, affinity)
+    else:
+        call = functools.partial(context.run, _run_if_wanted, name, functools.partial(fn, *args, **kwargs))
+    return get_pool(name).submit(priority or current_priority(), call)
+
+
+def promote_call(name: str, future: Future, lane: str) -> bool:
+    """
+    Move a call queued on the named pool to a higher-weighted lane, e.g. when an
+    interactive caller starts waiting on a bulk computation.
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+    return pool is not None and pool.promote(future, lane)
+
+
+async def run_in_pool(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking model call on the named pool, carrying the caller's context variables.
+    Accepts the same `priority`, `local` and `affinity` options as submit_to_pool.
+    """
+    return await asyncio.wrap_future(submit_to_pool(name, fn, *args, **kwargs))
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.queue_depths() for name, pool in pools.items()}
+
+
+async def priority_middleware(request, call_next):
+    """
+    Put the request in its priority lane: the x-priority header, else the operation's default.
+    """
+    operation = operation_name(request.url.path, request.url.query)
+    lane = request.headers.get(PRIORITY_HEADER) or ROUTE_PRIORITIES.get(operation, DEFAULT_PRIORITY)
+    if lane not in PRIORITY_WEIGHTS:
+        lane = DEFAULT_PRIORITY
+    token = set_priority(lane)
+    try:
+        return await call_next(request)
+    finally:
+        _priority.reset(token)
+
+
+def shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+    stop_workers()
+    stop_shards()
@@ -0,0 +1,180 @@
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from services.cache import get_caches
+from services.deadlines import RequestState, bind
+
+logger = logging.getLogger(__name__)
+
+# Pools whose model runs in dedicated worker processes instead of the API process,
+# e.g. "summarizer,qa". One process per pool thread, so MODEL_POOL_SIZES sizes them too;
+# MODEL_SHARDING (services/sharding.py) routes calls to them by input instead of by thread.
+MODEL_ISOLATION = {pool.strip() for pool in os.environ.get('MODEL_ISOLATION', '').split(',') if pool.strip()}
+# Set inside a worker process to the pool it serves
+WORKER_POOL_ENV = "MODEL_WORKER_POOL"
+
+WORKER_RESTARTS = Counter(
+    'ml_model_worker_restarts_total',
+    'Model worker processes restarted after exiting unexpectedly',
+    ['pool']
+)
+
+
+def isolated(pool: str) -> bool:
+    return pool in MODEL_ISOLATION
+
+
+def loads_model_here(pool: str) -> bool:
+    """
+    Whether this process should load the model of `pool`: always in its worker
+    process, and in the API process only when the pool is not isolated.
+    """
+    worker_pool = os.environ.get(WORKER_POOL_ENV)
+    if worker_pool is not None:
+        return worker_pool == pool
+    return not isolated(pool)
+
+
+def send_message(conn, obj: Any):
+    """
+    Pickle with protocol 5 and send large buffers (NumPy arrays) out of band,
+    so they are written straight from their memory instead of being copied into the pickle.
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    conn.send_bytes(len(buffers).to_bytes(4, "little") + payload)
+    for buffer in buffers:
+        conn.send_bytes(buffer.raw())
+
+
+def recv_message(conn) -> Any:
+    message = conn.recv_bytes()
+    count = int.from_bytes(message[:4], "little")
+    buffers = [conn.recv_bytes() for _ in range(count)]
+    return pickle.loads(message[4:], buffers=buffers)
+
+
+def cache_counts() -> Dict[str, Tuple[int, int]]:
+    """
+    (hits, misses) of every named cache in this process.
+    """
+    return {name: (cache.hits, cache.misses) for name, cache in get_caches().items()}
+
+
+def _worker_main(pool: str, conn):
+    """
+    Worker process loop: receive (fn, args, kwargs, deadline), run it and send back the result
+    together with the worker's cache counts, so the API process can report hit rates.
+    Models load on first use, when the function's module is imported here.
+    """
+    os.environ[WORKER_POOL_ENV] = pool
+    while True:
+        try:
+            fn, args, kwargs, deadline = recv_message(conn)
+        except EOFError:
+            return
+        except Exception as e:
+            send_message(conn, ("error", RuntimeError(f"Could not decode call: {e}"), cache_counts()))
+            continue
+
+        # Between-batch deadline checks keep working inside the worker
+        bind(RequestState(deadline) if deadline is not None else None)
+        try:
+            reply = ("ok", fn(*args, **kwargs), cache_counts())
+        except Exception as e:
+            reply = ("error", e, cache_counts())
+        try:
+            send_message(conn, reply)
+        except Exception as e:
+            send_message(conn, ("error", RuntimeError(f"{type(e).__name__}: {e}"), cache_counts()))
+
+
+class ProcessWorker:
+    """
+    One long-running worker process for a model pool, driven by a single pool thread.
+    If the process dies, the call in flight fails and a fresh process is started,
+    so a crash in one model never takes down the API process or the other models.
+    Metrics incremented inside the worker stay in the worker; its cache counts as of
+    the last call are kept in `caches`.
+    """
+
+    def __init__(self, pool: str, name: Optional[str] = None):
+        self.pool = pool
+        self.name = name or pool
+        self.process = None
+        self.conn = None
+        self.caches: Dict[str, Tuple[int, int]] = {}
+        self.start()
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(self.pool, child_conn), name=f"model-{self.name}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.caches = {}
+        logger.info(f"Started {self.name} model worker (pid {self.process.pid})")
+
+    def stop(self):
+        if self.conn is not None:
+            self.conn.close()
+        if self.process is not None:
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+
+    def call(self, fn: Callable, args: tuple, kwargs: Dict[str, Any], deadline: Optional[float]) -> Any:
+        if not self.process.is_alive():
+            self._restart()
+        try:
+            send_message(self.conn, (fn, args, kwargs, deadline))
+            status, payload, self.caches = recv_message(self.conn)
+        except (EOFError, OSError) as e:
+            exit_code = self.process.exitcode
+            self._restart()
+            raise RuntimeError(f"{self.name} worker process died (exit code {exit_code})") from e
+        if status == "error":
+            raise payload
+        return payload
+
+    def _restart(self):
+        logger.warning(f"Restarting {self.name} model worker (exit code {self.process.exitcode})")
+        WORKER_RESTARTS.labels(pool=self.pool).inc()
+        self.stop()
+        self.start()
+
+
+_local = threading.local()
+_workers: List[ProcessWorker] = []
+_workers_lock = threading.Lock()
+
+
+def worker_for(pool: str) -> ProcessWorker:
+    """
+    The worker process owned by the current pool thread, started on first use.
+    """
+    worker = getattr(_local, "worker", None)
+    if worker is None:
+        worker = ProcessWorker(pool)
+        _local.worker = worker
+        with _workers_lock:
+            _workers.append(worker)
+    return worker
+
+
+def stop_workers():
+    with _workers_lock:
+        workers = list(_workers)
+        _workers.clear()
+    for worker in workers:
+        worker.stop()
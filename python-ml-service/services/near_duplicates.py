@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from prometheus_client import Counter
+
+from services.text_normalization import collapse_whitespace
+
+# Group near-identical texts in bulk embedding and encode one per group
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'false').lower() == 'true'
+# Estimated Jaccard similarity of word shingles above which two texts share a vector
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.9'))
+NEAR_DUPLICATE_SHINGLE_WORDS = int(os.environ.get('NEAR_DUPLICATE_SHINGLE_WORDS', '3'))
+NEAR_DUPLICATE_PERMUTATIONS = 128
+
+NEAR_DUPLICATE_ITEMS = Counter(
+    'ml_near_duplicate_items_total',
+    'Texts of bulk batches that were encoded, or skipped because a near-duplicate was encoded',
+    ['operation', 'outcome']
+)
+
+# Ids, counters and timestamps are masked so templated texts shingle the same
+_DIGITS = re.compile(r"\d+")
+
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hash family: odd 64-bit multipliers, wrapping uint64 arithmetic
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, NEAR_DUPLICATE_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, NEAR_DUPLICATE_PERMUTATIONS, dtype=np.uint64)
+
+_totals = {"encoded": 0, "skipped": 0}
+_totals_lock = threading.Lock()
+
+
+def _lsh_bands(threshold: float, permutations: int) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) so the LSH candidate threshold (1/bands)^(1/rows) sits safely below
+    `threshold`: candidates are verified afterwards, so recall matters more than precision.
+    """
+    target = threshold * 0.9
+    best = (permutations, 1)
+    for rows in range(1, permutations + 1):
+        if permutations % rows:
+            continue
+        bands = permutations // rows
+        if (1 / bands) ** (1 / rows) <= target:
+            best = (bands, rows)
+    return best
+
+
+def shingles(text: str, size: int = NEAR_DUPLICATE_SHINGLE_WORDS) -> List[bytes]:
+    words = _DIGITS.sub("0", collapse_whitespace(text).lower()).split()
+    if len(words) <= size:
+        return [" ".join(words).encode("utf-8")]
+    return [" ".join(words[i:i + size]).encode("utf-8") for i in range(len(words) - size + 1)]
+
+
+def signatures(texts: Sequence[str], size: int = NEAR_DUPLICATE_SHINGLE_WORDS) -> np.ndarray:
+    """
+    MinHash signatures, one row of NEAR_DUPLICATE_PERMUTATIONS uint32 values per text.
+    """
+    result = np.empty((len(texts), NEAR_DUPLICATE_PERMUTATIONS), dtype=np.uint32)
+    for row, text in enumerate(texts):
+        hashes = np.fromiter((zlib.crc32(shingle) for shingle in set(shingles(text, size))), dtype=np.uint64)
+        permuted = (_MULTIPLIERS[:, None] * hashes[None, :] + _OFFSETS[:, None]) >> np.uint64(32)
+        result[row] = permuted.min(axis=1)
+    return result
+
+
+def group_near_duplicates(operation: str, texts: Sequence[str],
+                          threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Tuple[List[int], List[int]]:
+    """
+    Group texts whose estimated shingle similarity to a group's first text reaches `threshold`.
+    Same contract as dedupe_batch: (representative positions, slot of each text).
+
+    Signatures are bucketed with LSH, so each text is only compared with the representatives
+    it shares a band with. Every member is within `threshold` of its own representative.
+    """
+    if not texts:
+        return [], []
+    bands, rows = _lsh_bands(threshold, NEAR_DUPLICATE_PERMUTATIONS)
+    signature_rows = signatures(texts)
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    representatives: List[int] = []
+    inverse: List[int] = []
+
+    for position, signature in enumerate(signature_rows):
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+        candidates = {slot for key in keys for slot in buckets.get(key, ())}
+        best_slot, best_similarity = None, threshold
+        for slot in sorted(candidates):
+            similarity = float(np.mean(signature_rows[representatives[slot]] == signature))
+            if similarity >= best_similarity:
+                best_slot, best_similarity = slot, similarity
+        if best_slot is None:
+            best_slot = len(representatives)
+            representatives.append(position)
+            for key in keys:
+                buckets[key].append(best_slot)
+        inverse.append(best_slot)
+
+    skipped = len(texts) - len(representatives)
+    NEAR_DUPLICATE_ITEMS.labels(operation=operation, outcome="encoded").inc(len(representatives))
+    NEAR_DUPLICATE_ITEMS.labels(operation=operation, outcome="skipped").inc(skipped)
+    with _totals_lock:
+        _totals["encoded"] += len(representatives)
+        _totals["skipped"] += skipped
+    return representatives, inverse
+
+
+def near_duplicate_stats() -> Dict:
+    """
+    Totals since start and the share of encodes skipped thanks to near-duplicates.
+    """
+    with _totals_lock:
+        encoded, skipped = _totals["encoded"], _totals["skipped"]
+    return {
+        "enabled": NEAR_DUPLICATE_ENABLED,
+        "threshold": NEAR_DUPLICATE_THRESHOLD,
+        "encoded": encoded,
+        "skipped": skipped,
+        "skipped_ratio": round(skipped / (encoded + skipped), 4) if encoded + skipped else 0.0,
+    }
@@ -0,0 +1,116 @@
+import logging
+import os
+import re
+import time
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from services.cache import LRUCache
+
+try:
+    # google-re2 matches in time linear in the input, with no backtracking at all
+    import re2
+except ImportError:
+    re2 = None
+
+logger = logging.getLogger(__name__)
+
+# Most characters a `.*` in a phrase rule may span
+PHRASE_GAP_CHARS = int(os.environ.get('PHRASE_GAP_CHARS', '200'))
+# Characters of a ticket the phrase rules look at; the rest is ignored
+PHRASE_MAX_CHARS = int(os.environ.get('PHRASE_MAX_CHARS', '5000'))
+# "re2" to require google-re2, "re" to never use it, "auto" to use it when installed
+PHRASE_ENGINE = os.environ.get('PHRASE_ENGINE', 'auto')
+PHRASE_MATCH_CACHE_SIZE = int(os.environ.get('PHRASE_MATCH_CACHE_SIZE', '1000'))
+
+PHRASE_MATCH_SECONDS = Histogram(
+    'ml_phrase_rules_seconds',
+    'Time spent matching one text against a phrase rule set',
+    ['ruleset'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+PHRASE_TEXT_TRUNCATED = Counter(
+    'ml_phrase_rules_truncated_total',
+    'Texts cut to PHRASE_MAX_CHARS before phrase matching',
+    ['ruleset']
+)
+
+_UNBOUNDED_GAP = re.compile(r"(?<!\\)\.\*")
+
+
+def engine_name() -> str:
+    """
+    The regex engine phrase rules are compiled with.
+    """
+    return "re2" if re2 is not None and PHRASE_ENGINE != "re" else "re"
+
+
+def bound_gaps(rule: str, gap: int = PHRASE_GAP_CHARS) -> str:
+    """
+    Replace every `.*` in a rule with a gap of at most `gap` characters.
+    """
+    return _UNBOUNDED_GAP.sub(f".{{0,{gap}}}", rule)
+
+
+def _compile(pattern: str):
+    if re2 is not None and PHRASE_ENGINE != "re":
+        try:
+            return re2.compile(pattern)
+        except Exception as e:
+            logger.warning(f"Phrase rule not supported by re2, using re: {pattern!r} ({e})")
+    elif PHRASE_ENGINE == "re2":
+        raise RuntimeError("PHRASE_ENGINE=re2 but google-re2 is not installed")
+    return re.compile(pattern)
+
+
+class PhraseRuleSet:
+    """
+    A table of phrase rules (key -> regexes) compiled once. Gaps are bounded and input
+    is capped at `max_chars`, so with `re` one text costs at most O(max_chars * gap^k) for
+    a rule with k gaps, since backtracking tries every split of nested gaps (k is at most 2
+    in the current tables); with re2 it is O(max_chars). A combined pattern of every rule
+    is searched first, so texts that match nothing are rejected in a single pass.
+    """
+
+    def __init__(self, name: str, rules: Dict[Hashable, Sequence[str]],
+                 gap: int = PHRASE_GAP_CHARS, max_chars: int = PHRASE_MAX_CHARS):
+        self.name = name
+        self.max_chars = max_chars
+        self.rules: Dict[Hashable, List[Tuple[str, object]]] = {
+            key: [(rule, _compile(bound_gaps(rule, gap))) for rule in key_rules]
+            for key, key_rules in rules.items()
+        }
+        self._any = _compile("|".join(
+            f"(?:{bound_gaps(rule, gap)})" for key_rules in rules.values() for rule in key_rules
+        ))
+        self._matches = LRUCache(f"phrase-matches-{name}", PHRASE_MATCH_CACHE_SIZE)
+
+    def scan(self, text: str) -> Dict[Hashable, List[Tuple[str, int]]]:
+        """
+        The rules that match `text`, per key, as (rule as written, number of matches).
+        Keys without a matching rule are left out. Results are memoized per text.
+        """
+        text = text or ""
+        if len(text) > self.max_chars:
+            PHRASE_TEXT_TRUNCATED.labels(ruleset=self.name).inc()
+            text = text[:self.max_chars]
+
+        found = self._matches.get(text)
+        if found is not None:
+            return found
+
+        started = time.perf_counter()
+        found = {}
+        if self._any.search(text):
+            for key, key_rules in self.rules.items():
+                hits = []
+                for rule, pattern in key_rules:
+                    count = sum(1 for _ in pattern.finditer(text))
+                    if count:
+                        hits.append((rule, count))
+                if hits:
+                    found[key] = hits
+        PHRASE_MATCH_SECONDS.labels(ruleset=self.name).observe(time.perf_counter() - started)
+        self._matches.set(text, found)
+        return found
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Profiling configuration. With no sample rate and no allowed callers, nothing is installed.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_ALLOWED_CALLERS = {
+    caller.strip() for caller in os.environ.get('PROFILE_ALLOWED_CALLERS', '').split(',') if caller.strip()
+}
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/app/data/profiles')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+PROFILE_HEADER = "x-profile-request"
+
+
+def profiling_enabled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_ALLOWED_CALLERS)
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler that records the stacks of every Python thread
+    at a fixed interval, so work done on the model pools is captured along with
+    the event loop. Output is in collapsed-stack format ("thread;frame;frame count"),
+    which flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def should_profile(request) -> Optional[str]:
+    """
+    Decide whether to profile a request. Returns the trigger ('header' or 'sampled') or None.
+    The header is honored only for allow-listed callers ('*' allows any caller).
+    """
+    if PROFILE_ALLOWED_CALLERS and request.headers.get(PROFILE_HEADER):
+        caller = request.client.host if request.client else ""
+        if "*" in PROFILE_ALLOWED_CALLERS or caller in PROFILE_ALLOWED_CALLERS:
+            return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def write_profile(profiler: SamplingProfiler, metadata: dict) -> str:
+    """
+    Store the collapsed stacks and a JSON metadata sidecar in PROFILE_DIR. Returns the profile id.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    endpoint = metadata["endpoint"].strip("/").replace("/", "_") or "root"
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+        f.write(profiler.collapsed())
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump({**metadata, "samples": profiler.sample_count, "interval": profiler.interval}, f)
+    return profile_id
+
+
+async def profiling_middleware(request, call_next):
+    """
+    Run selected requests under the sampling profiler and store the profile with
+    endpoint and input-size metadata. Only installed when profiling is configured.
+    """
+    trigger = should_profile(request)
+    if trigger is None:
+        return await call_next(request)
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    start_time = time.time()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        profiler.stop()
+        duration = time.time() - start_time
+        try:
+            profile_id = write_profile(profiler, {
+                "endpoint": request.url.path,
+                "method": request.method,
+                "trigger": trigger,
+                "input_bytes": int(request.headers.get("content-length") or 0),
+                "status": status,
+                "duration_seconds": round(duration, 4),
+                "started_at": start_time,
+            })
+            logger.info(f"Stored profile {profile_id} for {request.url.path} ({duration:.3f}s)")
+        except OSError as e:
+            logger.warning(f"Could not store profile for {request.url.path}: {e}")
+            profile_id = None
+
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
@@ -0,0 +1,49 @@
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+
+class ContextWindows(NamedTuple):
+    context: str
+    # Overlapping slices of the context's token ids, with each token's character span
+    windows: List[List[int]]
+    offsets: List[List[tuple]]
+
+
+def slice_windows(context: str, ids: Sequence[int], offsets: Sequence[tuple], size: int, stride: int) -> ContextWindows:
+    """
+    Cut a tokenized context into windows of `size` tokens, consecutive windows sharing
+    `stride` tokens so answers near a window edge are not lost. An empty context gives
+    one empty window.
+    """
+    step = max(size - stride, 1)
+    windows, window_offsets = [], []
+    for start in range(0, max(len(ids), 1), step):
+        windows.append(list(ids[start:start + size]))
+        window_offsets.append(list(offsets[start:start + size]))
+        if start + size >= len(ids):
+            break
+    return ContextWindows(context, windows, window_offsets)
+
+
+def context_start(tokenizer, question_ids: List[int]) -> int:
+    """
+    Position of the first context token once special tokens are added around the pair.
+    """
+    probe = tokenizer.build_inputs_with_special_tokens([-1], [-2])
+    return probe.index(-2) - 1 + len(question_ids)
+
+
+def best_span(start_logits: np.ndarray, end_logits: np.ndarray, max_answer_tokens: int) -> Tuple[int, int, float]:
+    """
+    Highest-probability (start, end, score) with start <= end and at most `max_answer_tokens`
+    tokens. Logits cover the context tokens only.
+    """
+    start_probs = np.exp(start_logits - start_logits.max())
+    start_probs /= start_probs.sum()
+    end_probs = np.exp(end_logits - end_logits.max())
+    end_probs /= end_probs.sum()
+    scores = np.triu(np.outer(start_probs, end_probs))
+    scores = np.tril(scores, max_answer_tokens - 1)
+    start, end = np.unravel_index(int(scores.argmax()), scores.shape)
+    return int(start), int(end), float(scores[start, end])
@@ -0,0 +1,79 @@
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> set:
+    """
+    Lowercased word set used for lexical overlap.
+    """
+    return set(_TOKEN.findall((text or "").lower()))
+
+
+def lexical_text(subject: Optional[str], description: Optional[str]) -> str:
+    """
+    Subject and description joined for lexical overlap, without the embedding models'
+    separator token, which would otherwise count as a word every text shares.
+    """
+    return " ".join(part for part in (subject, description) if part)
+
+
+def lexical_overlap(query_text: str, candidate_texts: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Fraction of the query's words found in each candidate text (0 when a candidate has no text).
+    """
+    query_tokens = tokenize(query_text)
+    if not query_tokens:
+        return np.zeros(len(candidate_texts), dtype=np.float32)
+    return np.array(
+        [len(query_tokens & tokenize(text)) / len(query_tokens) if text else 0.0 for text in candidate_texts],
+        dtype=np.float32
+    )
+
+
+def rerank(query_vector, candidate_vectors, ids: Sequence[str], top_k: int = 10,
+           lexical_scores: Optional[np.ndarray] = None, lexical_weight: float = 0.0) -> List[dict]:
+    """
+    Score every candidate against the query with one normalized matrix product and return the top-k.
+
+    :param query_vector: Query embedding (any norm).
+    :param candidate_vectors: Candidate embeddings, one row per id (any norm).
+    :param ids: Candidate ids in row order.
+    :param top_k: Number of results to return.
+    :param lexical_scores: Optional per-candidate lexical scores in [0, 1].
+    :param lexical_weight: Weight of the lexical score in the blended score.
+    :return: List of {'id', 'score', 'semantic', 'lexical'} dicts, best first.
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if len(ids) == 0:
+        return []
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    if candidates.shape[1] != query.shape[0]:
+        raise ValueError(f"Query has dimension {query.shape[0]} but candidates have {candidates.shape[1]}")
+
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    norms = np.maximum(np.linalg.norm(candidates, axis=1), 1e-12)
+    semantic = (candidates @ query) / norms
+
+    if lexical_scores is not None and lexical_weight > 0:
+        scores = (1.0 - lexical_weight) * semantic + lexical_weight * lexical_scores
+    else:
+        lexical_scores = None
+        scores = semantic
+
+    k = min(top_k, len(ids))
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+
+    return [
+        {
+            "id": ids[i],
+            "score": round(float(scores[i]), 6),
+            "semantic": round(float(semantic[i]), 6),
+            "lexical": round(float(lexical_scores[i]), 6) if lexical_scores is not None else None,
+        }
+        for i in best
+    ]
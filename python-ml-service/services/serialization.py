@@ -0,0 +1,60 @@
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    # orjson writes NumPy arrays straight from their buffers, without Python float objects
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _as_array(obj: Any) -> Any:
+    # torch tensors are converted without importing torch here
+    if hasattr(obj, "detach") and hasattr(obj, "numpy"):
+        return obj.detach().cpu().numpy()
+    return obj
+
+
+def _orjson_default(obj: Any) -> Any:
+    # Reached for tensors, and for arrays orjson does not serialize natively
+    # (non-contiguous views, object or unusual dtypes)
+    obj = _as_array(obj)
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind in "fiub" and not obj.flags.c_contiguous:
+            return np.ascontiguousarray(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_default(obj: Any) -> Any:
+    obj = _as_array(obj)
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize a response body that may contain NumPy arrays, NumPy scalars or torch tensors.
+    Uses orjson when installed and the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content, default=_json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class NumpyJSONResponse(JSONResponse):
+    """
+    JSON response for model outputs. Return it from an endpoint to skip FastAPI's
+    jsonable_encoder walk and serialize arrays directly from their buffers.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
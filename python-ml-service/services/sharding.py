@@ -0,0 +1,219 @@
+import bisect
+import hashlib
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from services.model_workers import ProcessWorker, isolated
+
+# Isolated pools (MODEL_ISOLATION) whose worker processes form one cache-affine set, e.g. "sbert,intent".
+# Calls are consistent-hashed on their normalized input, so repeated inputs reach the process
+# that already has them cached instead of whichever pool thread picks the call up.
+MODEL_SHARDING = {pool.strip() for pool in os.environ.get('MODEL_SHARDING', '').split(',') if pool.strip()}
+# Points per shard on the hash ring; more points spread keys more evenly
+SHARD_VIRTUAL_NODES = int(os.environ.get('SHARD_VIRTUAL_NODES', '128'))
+# How long a shard whose process died stays off the ring while its replacement starts
+SHARD_EJECT_SECONDS = float(os.environ.get('SHARD_EJECT_SECONDS', '30'))
+
+SHARD_CALLS = Counter(
+    'ml_shard_calls_total',
+    'Model calls sent to each shard of a sharded pool, routed by input affinity or spread round-robin',
+    ['pool', 'shard', 'routing']
+)
+SHARD_CACHE_HIT_RATIO = Gauge(
+    'ml_shard_cache_hit_ratio',
+    'Cache hit ratio inside each shard process since it started',
+    ['pool', 'shard', 'cache']
+)
+SHARD_LOAD_SKEW = Gauge(
+    'ml_shard_load_skew',
+    'Calls on the busiest shard over the mean per shard (1 is perfectly even)',
+    ['pool']
+)
+SHARD_EJECTIONS = Counter(
+    'ml_shard_ejections_total',
+    'Shards taken off the hash ring because their worker process died',
+    ['pool', 'shard']
+)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes. Removing a node only moves the keys it owned
+    to its neighbours, and adding one only takes its share (about 1/n) from the others.
+    Lookups are lock-free: changes build a new ring and swap it in.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = SHARD_VIRTUAL_NODES):
+        self.replicas = replicas
+        self._ring: Tuple[List[int], List[str]] = ([], [])
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self._ring[1]))
+
+    def add(self, node: str):
+        points, owners = self._ring
+        if node in owners:
+            return
+        entries = list(zip(points, owners)) + [(_hash(f"{node}#{replica}"), node) for replica in range(self.replicas)]
+        entries.sort()
+        self._ring = ([point for point, _ in entries], [owner for _, owner in entries])
+
+    def remove(self, node: str):
+        points, owners = self._ring
+        entries = [(point, owner) for point, owner in zip(points, owners) if owner != node]
+        self._ring = ([point for point, _ in entries], [owner for _, owner in entries])
+
+    def node_for(self, key: str) -> Optional[str]:
+        points, owners = self._ring
+        if not points:
+            return None
+        return owners[bisect.bisect(points, _hash(key)) % len(points)]
+
+
+class ShardedWorkers:
+    """
+    The worker processes of a sharded pool, one per pool thread. Each call goes to the shard
+    owning its affinity key on the hash ring and waits there if another pool thread is using
+    that shard; calls without a key are spread round-robin.
+
+    A shard whose process dies is restarted as usual, and taken off the ring for
+    SHARD_EJECT_SECONDS so only its keys move while the replacement loads its model.
+    The last shard on the ring is never taken off.
+    """
+
+    def __init__(self, pool: str, count: int, replicas: int = SHARD_VIRTUAL_NODES,
+                 eject_seconds: float = SHARD_EJECT_SECONDS):
+        self.pool = pool
+        self.eject_seconds = eject_seconds
+        self.names = [f"{pool}-{index}" for index in range(max(count, 1))]
+        self.ring = HashRing(self.names, replicas)
+        self._workers: Dict[str, ProcessWorker] = {}
+        self._locks = {name: threading.Lock() for name in self.names}
+        self._calls = {name: 0 for name in self.names}
+        # Shard name -> when it goes back on the ring
+        self._ejected: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._spread = itertools.count()
+
+    def shard_for(self, affinity: Optional[str]) -> str:
+        with self._lock:
+            now = time.monotonic()
+            for name, readmit_at in list(self._ejected.items()):
+                if readmit_at <= now:
+                    del self._ejected[name]
+                    self.ring.add(name)
+            if affinity is None:
+                live = self.ring.nodes
+                return live[next(self._spread) % len(live)]
+            return self.ring.node_for(affinity)
+
+    def call(self, affinity: Optional[str], fn: Callable, args: tuple, kwargs: Dict[str, Any],
+             deadline: Optional[float]) -> Any:
+        name = self.shard_for(affinity)
+        with self._locks[name]:
+            worker = self._workers.get(name)
+            if worker is None:
+                worker = ProcessWorker(self.pool, name)
+                self._workers[name] = worker
+            pid = worker.process.pid
+            try:
+                return worker.call(fn, args, kwargs, deadline)
+            finally:
+                self._record(name, worker, "spread" if affinity is None else "affinity",
+                             restarted=worker.process.pid != pid)
+
+    def _record(self, name: str, worker: ProcessWorker, routing: str, restarted: bool):
+        SHARD_CALLS.labels(pool=self.pool, shard=name, routing=routing).inc()
+        for cache, (hits, misses) in worker.caches.items():
+            if hits + misses:
+                SHARD_CACHE_HIT_RATIO.labels(pool=self.pool, shard=name, cache=cache).set(hits / (hits + misses))
+        with self._lock:
+            self._calls[name] += 1
+            SHARD_LOAD_SKEW.labels(pool=self.pool).set(self._load_skew())
+            if restarted and name not in self._ejected and len(self.ring.nodes) > 1:
+                self._ejected[name] = time.monotonic() + self.eject_seconds
+                self.ring.remove(name)
+                SHARD_EJECTIONS.labels(pool=self.pool, shard=name).inc()
+
+    def _load_skew(self) -> float:
+        total = sum(self._calls.values())
+        if not total:
+            return 1.0
+        return max(self._calls.values()) / (total / len(self._calls))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = dict(self._calls)
+            skew = self._load_skew()
+            live = set(self.ring.nodes)
+        shards = {}
+        for name in self.names:
+            worker = self._workers.get(name)
+            caches = worker.caches if worker is not None else {}
+            shards[name] = {
+                "pid": worker.process.pid if worker is not None else None,
+                "on_ring": name in live,
+                "calls": calls[name],
+                "caches": {
+                    cache: {
+                        "hits": hits,
+                        "misses": misses,
+                        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                    }
+                    for cache, (hits, misses) in caches.items()
+                },
+            }
+        return {"shards": shards, "load_skew": round(skew, 4)}
+
+    def stop(self):
+        for name in self.names:
+            with self._locks[name]:
+                worker = self._workers.pop(name, None)
+            if worker is not None:
+                worker.stop()
+
+
+_sharded: Dict[str, ShardedWorkers] = {}
+_sharded_lock = threading.Lock()
+
+
+def sharded(pool: str) -> bool:
+    return pool in MODEL_SHARDING and isolated(pool)
+
+
+def sharded_workers(pool: str, count: int) -> ShardedWorkers:
+    """
+    Get or create the shards of a pool; `count` only applies on creation.
+    """
+    with _sharded_lock:
+        workers = _sharded.get(pool)
+        if workers is None:
+            workers = ShardedWorkers(pool, count)
+            _sharded[pool] = workers
+    return workers
+
+
+def shard_stats() -> Dict[str, Dict[str, Any]]:
+    with _sharded_lock:
+        pools = dict(_sharded)
+    return {pool: workers.stats() for pool, workers in pools.items()}
+
+
+def stop_shards():
+    with _sharded_lock:
+        pools = list(_sharded.values())
+        _sharded.clear()
+    for workers in pools:
+        workers.stop()
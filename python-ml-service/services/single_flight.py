@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+
+from services.deadlines import FlightState, bind, current_state, wait_within_deadline
+from services.model_pools import PRIORITY_WEIGHTS, current_priority, pool_for, promote_call, submit_to_pool
+from services.text_normalization import collapse_whitespace
+
+logger = logging.getLogger(__name__)
+
+# How many model calls were actually computed vs. shared with an identical in-flight call
+SINGLE_FLIGHT_CALLS = Counter(
+    'ml_single_flight_calls_total',
+    'Model calls seen by the single-flight layer',
+    ['operation', 'outcome']
+)
+
+# How many batch items were encoded vs. fanned out from an identical item in the same batch
+BATCH_ITEMS = Counter(
+    'ml_batch_items_total',
+    'Batch items seen by intra-batch deduplication',
+    ['operation', 'outcome']
+)
+
+
+# Operations whose output depends on line breaks (conversation_text drops greeting and
+# closing lines by their line starts), so inputs differing only in whitespace are not shared
+WHITESPACE_SENSITIVE_OPERATIONS = {"summarize"}
+
+
+def _raw_input(text: Any) -> str:
+    return "" if text is None else str(text)
+
+
+def normalize_input(text: Any) -> str:
+    """
+    Normalize model input for keying: collapse whitespace and strip the ends.
+    Case is preserved because the summarizer output depends on it.
+    """
+    return collapse_whitespace(text)
+
+
+def make_key(operation: str, model: str, *parts: Any) -> Tuple[str, str, str]:
+    """
+    Build a single-flight key from the operation, the model and the normalized input parts.
+    Parts of whitespace-sensitive operations are hashed as they are.
+    """
+    normalize = _raw_input if operation in WHITESPACE_SENSITIVE_OPERATIONS else normalize_input
+    digest = hashlib.sha1(
+        "\x1f".join(normalize(part) for part in parts).encode("utf-8")
+    ).hexdigest()
+    return (operation, model, digest)
+
+
+class Flight:
+    """
+    One shared computation: its task, the combined state of its callers, and the priority
+    lane of its pool call, which is raised when a caller from a higher-weighted lane joins.
+    """
+
+    def __init__(self, state: FlightState, lane: str):
+        self.state = state
+        self.lane = lane
+        self.task: Optional[asyncio.Future] = None
+        self.pool: Optional[str] = None
+        self.call: Optional[Future] = None
+
+    def join(self, state, lane: str):
+        self.state.join(state)
+        if PRIORITY_WEIGHTS.get(lane, 0) <= PRIORITY_WEIGHTS.get(self.lane, 0):
+            return
+        self.lane = lane
+        # A call not yet submitted picks the new lane up when it is
+        if self.call is not None:
+            promote_call(self.pool, self.call, lane)
+
+
+class SingleFlight:
+    """
+    Shares one computation between concurrent callers asking for the same key.
+
+    The computation runs on the operation's model pool as its own task, so a caller
+    that goes away does not cancel the work for the others still waiting on it.
+    Each caller stops waiting at its own deadline; the computation itself is only
+    dropped once every caller sharing it has given up.
+    The computation runs in the highest-priority lane of its callers.
+    Callers receive the same result object and must not mutate it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, Flight] = {}
+
+    def inflight_count(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Tuple[str, str, str], fn: Callable, *args, **kwargs) -> Any:
+        operation = key[0]
+        flight = self._inflight.get(key)
+        if flight is not None:
+            flight.join(current_state(), current_priority())
+            SINGLE_FLIGHT_CALLS.labels(operation=operation, outcome="coalesced").inc()
+            return await wait_within_deadline(asyncio.shield(flight.task), operation)
+
+        SINGLE_FLIGHT_CALLS.labels(operation=operation, outcome="computed").inc()
+        flight = Flight(FlightState(current_state()), current_priority())
+        flight.task = asyncio.ensure_future(self._compute(flight, key, fn, *args, **kwargs))
+        self._inflight[key] = flight
+        flight.task.add_done_callback(lambda finished: self._forget(key, finished))
+        return await wait_within_deadline(asyncio.shield(flight.task), operation)
+
+    @staticmethod
+    async def _compute(flight: Flight, key: Tuple[str, str, str], fn: Callable, *args, **kwargs) -> Any:
+        # The task has its own context copy, so this only affects the shared computation
+        bind(flight.state)
+        flight.pool = pool_for(key[0])
+        # The input digest routes the call to the same worker process on sharded pools
+        flight.call = submit_to_pool(flight.pool, fn, *args, priority=flight.lane, affinity=key[2], **kwargs)
+        return await asyncio.wrap_future(flight.call)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        # Retrieve the exception so it is not reported as unhandled when every caller went away
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight computation for {key[0]} failed: {task.exception()}")
+
+
+def dedupe_batch(operation: str, keys: Sequence[Hashable]) -> Tuple[List[int], List[int]]:
+    """
+    Find the distinct items of a batch.
+
+    :param operation: Operation name used to label the metrics.
+    :param keys: One hashable key per batch item (usually the normalized text).
+    :return: (unique_positions, inverse) where unique_positions are the indices of the first
+             occurrence of each distinct key and inverse maps every item to its slot in unique_positions.
+    """
+    first_seen: Dict[Hashable, int] = {}
+    unique_positions: List[int] = []
+    inverse: List[int] = []
+
+    for position, key in enumerate(keys):
+        slot = first_seen.get(key)
+        if slot is None:
+            slot = len(unique_positions)
+            first_seen[key] = slot
+            unique_positions.append(position)
+        inverse.append(slot)
+
+    BATCH_ITEMS.labels(operation=operation, outcome="computed").inc(len(unique_positions))
+    BATCH_ITEMS.labels(operation=operation, outcome="deduplicated").inc(len(inverse) - len(unique_positions))
+    return unique_positions, inverse
+
+
+def fan_out(results: Sequence[Any], inverse: Sequence[int]) -> List[Any]:
+    """
+    Expand results computed for the distinct items back to the original batch order.
+    """
+    return [results[slot] for slot in inverse]
+
+
+# Process-wide single-flight group shared by all endpoints
+single_flight = SingleFlight()
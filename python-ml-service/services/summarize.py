@@ -1,26 +1,62 @@
 import os
-import re
-from typing import List
+import time
+from typing import Dict, List, Optional
 
+import numpy as np
 import torch
+from prometheus_client import Counter
 from transformers import pipeline
 
+from services.SBERT_embedding import encode_texts, resolve_embedding_model
+from services.deadlines import check_deadline, current_state
+from services.extractive import select_sentences, split_sentences, summary_tier, textrank
+from services.generation_budget import GENERATION_STRATEGIES, GenerationCost, plan_generation
+from services.model_workers import loads_model_here
+from services.single_flight import dedupe_batch, fan_out, normalize_input
+from services.text_normalization import conversation_text
+
 # Set cache directory for transformers
 cache_dir = os.environ.get('TRANSFORMERS_CACHE', '/app/models')
 
-# Load the summarization model
-try:
-    summarizer = pipeline(
-        "summarization",
-        model="facebook/bart-large-cnn",
-        tokenizer="facebook/bart-large-cnn",
-        device=0 if torch.cuda.is_available() else -1,  # Use GPU if available
-        model_kwargs={"cache_dir": cache_dir}
-    )
-    print("✅ BART summarization model loaded.")
-except Exception as e:
-    print(f"❌ Error loading summarization model: {e}")
-    summarizer = None
+MODEL_NAME = "facebook/bart-large-cnn"
+
+# Summary tiers by the word count of the preprocessed text (see extractive.summary_tier):
+#   passthrough - up to the requested summary length, already short enough to return as is
+#   extractive  - up to SUMMARY_EXTRACTIVE_MAX_WORDS and several sentences, TextRank over sentence embeddings
+#   abstractive - anything else, or extractive texts whose best sentences overrun the length, generated by BART
+SUMMARY_EXTRACTIVE_MAX_WORDS = int(os.environ.get('SUMMARY_EXTRACTIVE_MAX_WORDS', '250'))
+# Encoder for extractive sentence embeddings, e.g. "minilm" or "mpnet"
+SUMMARY_SENTENCE_MODEL = os.environ.get('SUMMARY_SENTENCE_MODEL', 'minilm')
+
+# Share of the remaining request budget that generation plans to use, leaving room for the rest
+SUMMARY_BUDGET_SHARE = float(os.environ.get('SUMMARY_BUDGET_SHARE', '0.8'))
+
+SUMMARY_TIERS = Counter(
+    'ml_summary_tier_total',
+    'Texts summarized, by the tier that produced the summary',
+    ['tier']
+)
+SUMMARY_GENERATION = Counter(
+    'ml_summary_generation_total',
+    'Abstractive summaries by generation strategy, and whether the latency budget degraded them',
+    ['strategy', 'degraded']
+)
+
+# Load the summarization model (only in its worker process when the summarizer pool is isolated)
+summarizer = None
+if loads_model_here("summarizer"):
+    try:
+        summarizer = pipeline(
+            "summarization",
+            model=MODEL_NAME,
+            tokenizer=MODEL_NAME,
+            device=0 if torch.cuda.is_available() else -1,  # Use GPU if available
+            model_kwargs={"cache_dir": cache_dir}
+        )
+        print("✅ BART summarization model loaded.")
+    except Exception as e:
+        print(f"❌ Error loading summarization model: {e}")
+        summarizer = None
 
 
 def preprocess_conversation(text: str, max_words: int = 700) -> str:
@@ -30,42 +66,148 @@ def preprocess_conversation(text: str, max_words: int = 700) -> str:
     - Strips excessive line breaks and whitespace
     - Truncates to `max_words`
     """
-    greetings = re.compile(r"\b(hi|hello|hey|dear|good (morning|afternoon|evening))\b[:,]?", re.IGNORECASE)
-    closings = re.compile(r"\b(thank[s]?|regards|best|cheers|sincerely)\b[:,]?", re.IGNORECASE)
+    return conversation_text(text, max_words)
 
-    lines = text.splitlines()
-    cleaned = []
-    for line in lines:
-        line = line.strip()
-        if not line or greetings.match(line) or closings.match(line):
-            continue
-        cleaned.append(line)
 
-    cleaned_text = " ".join(cleaned)
-    words = cleaned_text.split()
-    return " ".join(words[:max_words])
+def extractive_summaries(texts: List[str], max_words: int) -> List[Optional[str]]:
+    """
+    TextRank summaries of several texts, with all their sentences embedded in one call.
+    None for a text with a single sentence or no sentence within `max_words`.
+    """
+    sentences = [split_sentences(text) for text in texts]
+    flat = [sentence for text_sentences in sentences for sentence in text_sentences]
+    _, encoder = resolve_embedding_model(SUMMARY_SENTENCE_MODEL)
+    embeddings = encode_texts(flat, encoder.model_name) if flat else None
 
+    summaries, offset = [], 0
+    for text, text_sentences in zip(texts, sentences):
+        count = len(text_sentences)
+        if count <= 1:
+            summaries.append(None)
+        else:
+            scores = textrank(np.asarray(embeddings[offset:offset + count], dtype=np.float32))
+            summaries.append(select_sentences(text_sentences, scores, max_words))
+        offset += count
+    return summaries
 
-def summarize_texts(texts: List[str], max_summary_len: int = 50, min_summary_len: int = 10) -> List[str]:
+
+_generation_cost = GenerationCost()
+
+
+def _generate(texts: List[str], budget: Optional[float], max_summary_len: int, min_summary_len: int,
+              batch_size: int) -> List[Dict]:
     """
-    Summarizes a list of text strings using the BART summarizer.
-    Each text is preprocessed before summarization.
+    Abstractive summaries of one batch within `budget` seconds (None for no limit), falling
+    back to extractive summaries when generation cannot fit.
     """
-    if summarizer is None:
-        raise RuntimeError("Summarization model not available.")
+    words = [len(text.split()) for text in texts]
+    plan = plan_generation(_generation_cost, words, max_summary_len, min_summary_len, budget)
+    if plan is None:
+        SUMMARY_GENERATION.labels(strategy="extractive-fallback", degraded="true").inc(len(texts))
+        return [
+            {
+                # Texts that cannot be summarized by selection are cut to length instead
+                "summary": summary if summary is not None else " ".join(text.split()[:max_summary_len]),
+                "tier": "abstractive",
+                "strategy": "extractive-fallback",
+                "degraded": True,
+            }
+            for text, summary in zip(texts, extractive_summaries(texts, max_summary_len))
+        ]
 
-    # Preprocess each conversation before summarization
-    preprocessed_texts = [preprocess_conversation(text) for text in texts]
-
-    # Run summarization in batch
-    summaries = summarizer(
-        preprocessed_texts,
-        max_length=max_summary_len,
-        min_length=min_summary_len,
+    name, beams, max_tokens = plan
+    options = {}
+    if budget is not None:
+        # Generation stops at this point and returns what it has so far
+        options["max_time"] = budget
+    started = time.monotonic()
+    generated = summarizer(
+        texts,
+        max_length=max_tokens,
+        min_length=min(min_summary_len, max_tokens),
+        num_beams=beams,
+        early_stopping=True,
         do_sample=False,
         truncation=True,
-        batch_size=4
+        batch_size=batch_size,
+        **options
     )
+    elapsed = time.monotonic() - started
+    stopped_early = budget is not None and elapsed >= budget * 0.95
+    if not stopped_early:
+        _generation_cost.observe(words, beams, max_tokens, elapsed)
 
-    return [s["summary_text"] for s in summaries]
+    degraded = stopped_early or name != GENERATION_STRATEGIES[0][0]
+    strategy = f"{name}-stopped" if stopped_early else name
+    SUMMARY_GENERATION.labels(strategy=strategy, degraded=str(degraded).lower()).inc(len(texts))
+    return [
+        {"summary": summary["summary_text"], "tier": "abstractive", "strategy": strategy, "degraded": degraded}
+        for summary in generated
+    ]
 
+
+def summarize_with_details(texts: List[str], max_summary_len: int = 50, min_summary_len: int = 10) -> List[Dict]:
+    """
+    Summarizes a list of text strings, picking a tier per text by its length: texts within
+    `max_summary_len` words are returned as they are, medium ones with several sentences get
+    an extractive summary and everything else goes through the BART summarizer. Each text is preprocessed first, and
+    identical preprocessed texts are summarized once.
+
+    When the request has a deadline, BART's beams and summary length are chosen to fit the
+    remaining time, generation is stopped at the budget, and texts that cannot fit get an
+    extractive summary instead.
+
+    :return: One dict per text: 'summary', 'tier', 'strategy' and 'degraded' (True when
+             the latency budget forced a cheaper strategy or cut generation short).
+    """
+    # Preprocess each conversation before summarization
+    preprocessed_texts = [preprocess_conversation(text) for text in texts]
+    unique_positions, inverse = dedupe_batch("summarize", [normalize_input(text) for text in preprocessed_texts])
+
+    unique_texts = [preprocessed_texts[position] for position in unique_positions]
+    tiers = [summary_tier(text, max_summary_len, SUMMARY_EXTRACTIVE_MAX_WORDS) for text in unique_texts]
+
+    extractive = [i for i, tier in enumerate(tiers) if tier == "extractive"]
+    summaries = list(unique_texts)
+    if extractive:
+        check_deadline("summarize")
+        for i, summary in zip(extractive, extractive_summaries([unique_texts[i] for i in extractive], max_summary_len)):
+            if summary is None:
+                tiers[i] = "abstractive"
+            else:
+                summaries[i] = summary
+
+    results = [
+        {"summary": summary, "tier": tier, "strategy": tier, "degraded": False}
+        for summary, tier in zip(summaries, tiers)
+    ]
+    for tier in tiers:
+        SUMMARY_TIERS.labels(tier=tier).inc()
+
+    abstractive = [i for i, tier in enumerate(tiers) if tier == "abstractive"]
+    if abstractive and summarizer is None:
+        raise RuntimeError("Summarization model not available.")
+    batch_size = 4
+    deadline = getattr(current_state(), "deadline", None)
+
+    # Run summarization batch by batch, stopping early if the caller has given up
+    for start in range(0, len(abstractive), batch_size):
+        check_deadline("summarize")
+        batch = abstractive[start:start + batch_size]
+        budget = None
+        if deadline is not None:
+            # This batch's share of what is left, by the number of texts still to summarize
+            remaining = max(deadline - time.monotonic(), 0.0) * SUMMARY_BUDGET_SHARE
+            budget = remaining * len(batch) / (len(abstractive) - start)
+        generated = _generate([unique_texts[i] for i in batch], budget, max_summary_len, min_summary_len, batch_size)
+        for i, result in zip(batch, generated):
+            results[i] = result
+
+    return fan_out(results, inverse)
+
+
+def summarize_texts(texts: List[str], max_summary_len: int = 50, min_summary_len: int = 10) -> List[str]:
+    """
+    Summaries only; see summarize_with_details.
+    """
+    return [result["summary"] for result in summarize_with_details(texts, max_summary_len, min_summary_len)]
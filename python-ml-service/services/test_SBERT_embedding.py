@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import torch
+
+from services import SBERT_embedding
+from services.SBERT_embedding import EMBEDDING_MODELS, DEFAULT_EMBEDDING_MODEL, resolve_embedding_model
+from services.deadlines import QUERY_OPERATIONS
+
+
+class FakeSentenceTransformer:
+    """
+    Encodes each text as a normalized vector of its character codes, and counts calls.
+    """
+
+    def __init__(self, model_name, cache_folder=None):
+        self.model_name = model_name
+        self.encoded = []
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+    def half(self):
+        return self
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        vectors = np.array([[ord(texts[i][0]), len(texts[i]), 1.0] for i in range(len(texts))], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return torch.from_numpy(vectors)
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    monkeypatch.setattr(SBERT_embedding, "SentenceTransformer", FakeSentenceTransformer)
+    monkeypatch.setattr(SBERT_embedding, "_models", {})
+    monkeypatch.setattr(SBERT_embedding, "_embedding_caches", {})
+    return SBERT_embedding._models
+
+
+def test_models_resolve_by_short_or_full_name():
+    assert resolve_embedding_model("minilm") == ("minilm", EMBEDDING_MODELS["minilm"])
+    assert resolve_embedding_model("all-MiniLM-L6-v2") == ("minilm", EMBEDDING_MODELS["minilm"])
+    assert resolve_embedding_model(DEFAULT_EMBEDDING_MODEL)[1].operation == "sbert-embed"
+    with pytest.raises(ValueError, match="Unknown embedding model"):
+        resolve_embedding_model("bert-large")
+
+
+def test_every_alternative_model_has_its_own_request_operation():
+    _, operations = QUERY_OPERATIONS["sbert-embed"]
+    for name, model in EMBEDDING_MODELS.items():
+        if name == DEFAULT_EMBEDDING_MODEL:
+            continue
+        assert operations[name] == operations[model.model_name] == model.operation
+
+
+def test_each_model_is_loaded_once_with_its_own_cache(fake_models):
+    mpnet = EMBEDDING_MODELS["mpnet"].model_name
+    minilm = EMBEDDING_MODELS["minilm"].model_name
+
+    first = SBERT_embedding.encode_texts(["hello", "world"], mpnet)
+    again = SBERT_embedding.encode_texts(["hello", "world"], mpnet)
+    other = SBERT_embedding.encode_texts(["hello"], minilm)
+
+    assert set(fake_models) == {mpnet, minilm}
+    assert SBERT_embedding.get_model(mpnet) is fake_models[mpnet]
+    assert fake_models[mpnet].encoded == ["hello", "world"]
+    assert fake_models[minilm].encoded == ["hello"]
+    np.testing.assert_array_equal(first, again)
+    np.testing.assert_array_equal(other[0], first[0])
+
+    caches = SBERT_embedding._embedding_caches
+    assert caches[mpnet].name == "sbert-embeddings-mpnet"
+    assert caches[minilm].name == "sbert-embeddings-minilm"
+    assert len(caches[mpnet]) == 2 and len(caches[minilm]) == 1
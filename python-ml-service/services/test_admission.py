@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from services.admission import AdmissionController, Overloaded
+
+
+def test_queue_is_served_in_order_and_full_queue_is_rejected():
+    async def scenario():
+        controller = AdmissionController("test-order", concurrency=1, max_queue=2, queue_timeout=5)
+        order = []
+
+        async def request(label):
+            await controller.acquire()
+            order.append(label)
+            await asyncio.sleep(0.01)
+            controller.release(0.01)
+
+        await controller.acquire()
+        waiting = [asyncio.ensure_future(request(label)) for label in ("a", "b")]
+        await asyncio.sleep(0)
+        assert controller.queued == 2
+
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after >= 1
+
+        controller.release(0.01)
+        await asyncio.gather(*waiting)
+        assert order == ["a", "b"]
+        assert controller.active == 0 and controller.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiter_times_out_and_frees_its_queue_slot():
+    async def scenario():
+        controller = AdmissionController("test-timeout", concurrency=1, max_queue=1, queue_timeout=0.02)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "timeout"
+        assert controller.queued == 0
+
+        controller.release()
+        await controller.acquire()
+        assert controller.active == 1
+
+    asyncio.run(scenario())
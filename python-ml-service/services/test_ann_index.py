@@ -0,0 +1,67 @@
+import numpy as np
+
+from services.ann_index import ANNIndex
+
+
+def _random_vectors(count, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_exact_search_before_training():
+    vectors = _random_vectors(50)
+    index = ANNIndex(train_threshold=1000)
+    index.upsert([f"t{i}" for i in range(50)], vectors)
+
+    results = index.search(vectors[7], top_k=3)
+    assert results[0][0] == "t7"
+    assert abs(results[0][1] - 1.0) < 1e-5
+    assert len(results) == 3
+
+
+def test_ivf_search_recall_against_brute_force():
+    vectors = _random_vectors(3000, seed=1)
+    ids = [str(i) for i in range(len(vectors))]
+    index = ANNIndex(train_threshold=1000)
+    index.upsert(ids, vectors)
+    assert index.stats()["trained"]
+
+    queries = _random_vectors(20, seed=2)
+    hits = 0
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query))[:10].astype(str))
+        found = {ticket_id for ticket_id, _ in index.search(query, top_k=10, nprobe=16)}
+        hits += len(exact & found)
+    assert hits / (len(queries) * 10) >= 0.8
+
+
+def test_upsert_replaces_and_delete_removes():
+    vectors = _random_vectors(10)
+    index = ANNIndex(train_threshold=1000)
+    index.upsert([str(i) for i in range(10)], vectors)
+
+    index.upsert(["3"], vectors[5])
+    assert len(index) == 10
+    assert index.search(vectors[5], top_k=2)[0][1] > 0.999
+
+    assert index.delete(["5", "missing"]) == 1
+    assert "5" not in {ticket_id for ticket_id, _ in index.search(vectors[5], top_k=10)}
+
+
+def test_snapshot_round_trip(tmp_path):
+    vectors = _random_vectors(1500, seed=3)
+    index = ANNIndex(train_threshold=1000)
+    index.upsert([str(i) for i in range(len(vectors))], vectors)
+    index.delete(["0", "1"])
+    index.snapshot(str(tmp_path / "index"))
+
+    restored = ANNIndex.load(str(tmp_path / "index"))
+    assert len(restored) == len(vectors) - 2
+    assert restored.stats()["trained"]
+    assert restored.search(vectors[42], top_k=1, nprobe=64)[0][0] == "42"
+
+    # Restored indexes keep accepting inserts without touching the snapshot
+    restored.upsert(["new"], vectors[0])
+    assert restored.search(vectors[0], top_k=1, nprobe=64)[0][0] == "new"
+    assert len(ANNIndex.load(str(tmp_path / "index"))) == len(vectors) - 2
@@ -0,0 +1,46 @@
+from services import cache
+from services.cache import LRUCache, get_caches
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache("test-lru", maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # "a" is now the most recent
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    assert [key for key, _ in lru.items()] == ["a", "c"]
+    assert lru.stats()["hits"] == 3 and lru.stats()["misses"] == 1
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    lru = LRUCache("test-ttl", maxsize=4, ttl=10)
+    lru.set("old", 1)
+    clock.now += 6
+    lru.set("new", 2)
+    clock.now += 5
+
+    assert lru.items() == [("new", 2)]
+    assert lru.get("old", "missing") == "missing"
+    assert len(lru) == 1  # expired entries are dropped when looked up
+    assert lru.get("new") == 2
+
+
+def test_zero_size_cache_stores_nothing_and_caches_register_by_name():
+    disabled = LRUCache("test-disabled", maxsize=0)
+    disabled.set("a", 1)
+
+    assert disabled.get("a") is None and len(disabled) == 0
+    assert get_caches()["test-disabled"] is disabled
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from services.deadlines import DeadlineExceeded, FlightState, RequestState, bind, check_deadline
+from services.single_flight import SingleFlight, make_key
+
+
+def test_shared_work_is_dropped_only_when_every_waiter_gave_up():
+    expired = RequestState(time.monotonic() - 1)
+    live = RequestState(time.monotonic() + 60)
+    disconnected = RequestState()
+    disconnected.cancel()
+
+    assert FlightState(expired).drop_reason() == "deadline"
+    assert FlightState(disconnected).drop_reason() == "disconnected"
+
+    flight = FlightState(expired)
+    flight.join(live)
+    assert flight.drop_reason() is None
+
+    flight = FlightState(disconnected)
+    flight.join(None)  # a caller without a request context never gives up
+    assert flight.drop_reason() is None
+
+
+def test_caller_stops_waiting_at_its_deadline_and_work_stops_between_batches():
+    batches = []
+
+    def slow_batches():
+        for batch in range(50):
+            check_deadline("test")
+            batches.append(batch)
+            time.sleep(0.01)
+        return len(batches)
+
+    async def scenario():
+        bind(RequestState(time.monotonic() + 0.05))
+        group = SingleFlight()
+        with pytest.raises(DeadlineExceeded):
+            await group.do(make_key("test-deadline", "model", "text"), slow_batches)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert 0 < len(batches) < 50
+
+
+def test_query_parameters_can_select_another_operation():
+    from services.admission import ADMISSION_LIMITS
+    from services.deadlines import operation_name
+    from services.model_pools import DEFAULT_PRIORITY, ROUTE_PRIORITIES
+
+    assert operation_name("/api/v1/sbert-embed") == "sbert-embed"
+    assert operation_name("/api/v1/sbert-embed", "output=int8&model=mpnet") == "sbert-embed"
+    assert operation_name("/api/v1/sbert-embed", "model=minilm") == "minilm-embed"
+    assert operation_name("/api/v1/sbert-embed", "model=all-MiniLM-L6-v2&output=pca") == "minilm-embed"
+    assert operation_name("/api/v1/summarize", "model=minilm") == "summarize"
+
+    # Neither encoder is scheduled as bulk work by default, and the fast one gets its own limits
+    assert ROUTE_PRIORITIES.get("minilm-embed", DEFAULT_PRIORITY) == "interactive"
+    assert ROUTE_PRIORITIES.get("sbert-embed", DEFAULT_PRIORITY) == "interactive"
+    assert ADMISSION_LIMITS["minilm-embed"] != ADMISSION_LIMITS["sbert-embed"]
+
+
+def test_requests_only_get_a_deadline_when_someone_asked_for_one(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from services import deadlines
+    from services.deadlines import DeadlineMiddleware, _parse_timeouts, current_state
+
+    assert _parse_timeouts("") == {}
+    assert _parse_timeouts("summarize=60, minilm-embed=2.5") == {"summarize": 60.0, "minilm-embed": 2.5}
+
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+
+    @app.post("/api/v1/sbert-embed")
+    async def sbert_embed():
+        state = current_state()
+        return {"remaining": state.remaining()}
+
+    client = TestClient(app)
+    monkeypatch.setattr(deadlines, "REQUEST_TIMEOUTS", {})
+    assert client.post("/api/v1/sbert-embed").json()["remaining"] is None
+    remaining = client.post("/api/v1/sbert-embed", headers={"x-request-timeout-ms": "5000"}).json()["remaining"]
+    assert 0 < remaining <= 5
+
+    monkeypatch.setattr(deadlines, "REQUEST_TIMEOUTS", {"minilm-embed": 2.0})
+    assert client.post("/api/v1/sbert-embed").json()["remaining"] is None
+    assert 0 < client.post("/api/v1/sbert-embed?model=minilm").json()["remaining"] <= 2
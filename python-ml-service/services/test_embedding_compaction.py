@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from services.embedding_compaction import compact, fit_projection
+
+
+def test_pca_modes_refuse_vectors_from_another_model():
+    sample = np.random.default_rng(0).standard_normal((32, 16)).astype(np.float32)
+    projection = fit_projection(sample, 4, "all-mpnet-base-v2")
+
+    assert compact(sample, "pca", projection, model_name="all-mpnet-base-v2")["dim"] == 4
+    with pytest.raises(ValueError, match="fitted on all-mpnet-base-v2"):
+        compact(sample, "pca", projection, model_name="all-MiniLM-L6-v2")
+    assert compact(sample, "int8", projection, model_name="all-MiniLM-L6-v2")["dim"] == 16
+
+
+def test_empty_batches_compact_to_empty_vectors():
+    sample = np.random.default_rng(0).standard_normal((32, 16)).astype(np.float32)
+    projection = fit_projection(sample, 4)
+
+    for mode, dim in (("float", 0), ("int8", 0), ("pca", 4), ("pca_int8", 4)):
+        result = compact([], mode, projection)
+        assert result["dim"] == dim
+        assert result["vectors"].shape == (0, dim)
+        if mode.endswith("int8"):
+            assert result["scales"].shape == (0,)
+    assert compact(np.zeros((0, 16)), "int8")["dim"] == 16
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from services import enrich
+from services.enrich import enrich_tickets
+from services.text_normalization import conversation_text
+
+TICKETS = [
+    {"subject": "Printer jammed", "description": "Paper stuck in tray two"},
+    {"subject": "Refund", "description": "Charged twice for my order"},
+    {"subject": "  Printer   jammed ", "description": "Paper stuck in\ntray two"},
+]
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """
+    Replace every model behind enrich with a fake that records what it was asked to compute.
+    """
+    calls = {"embed": [], "keywords": [], "intent": [], "summarize": []}
+    lock = threading.Lock()
+
+    def record(stage, value):
+        with lock:
+            calls[stage].append(value)
+
+    def get_embedded_text(tickets, model_name=None):
+        record("embed", [ticket["subject"] for ticket in tickets])
+        return np.array([[len(ticket["subject"]), 1.0] for ticket in tickets], dtype=np.float32)
+
+    def extract_keywords_from_embedding(ticket, embedding):
+        record("keywords", (ticket["subject"], tuple(embedding)))
+        return [ticket["subject"].lower()]
+
+    def classify_ticket_intent(subject, description):
+        record("intent", subject)
+        return [{"intent": f"about {subject}", "confidence": 0.9}]
+
+    def summarize_with_details(texts):
+        record("summarize", list(texts))
+        return [{"summary": conversation_text(text)[:10]} for text in texts]
+
+    monkeypatch.setattr(enrich, "get_embedded_text", get_embedded_text)
+    monkeypatch.setattr(enrich, "extract_keywords_from_embedding", extract_keywords_from_embedding)
+    monkeypatch.setattr(enrich, "classify_ticket_intent", classify_ticket_intent)
+    monkeypatch.setattr(enrich, "summarize_with_details", summarize_with_details)
+    return calls
+
+
+def test_duplicate_tickets_are_computed_once_and_fanned_out(fake_models):
+    results = asyncio.run(enrich_tickets(TICKETS))
+
+    assert fake_models["embed"] == [["Printer jammed", "Refund"]]
+    assert sorted(fake_models["intent"]) == ["Printer jammed", "Refund"]
+    # Summaries see the raw text of every ticket
+    assert fake_models["summarize"] == [[f"{t['subject']} {t['description']}" for t in TICKETS]]
+    assert np.array_equal(results[0]["embedding"], results[2]["embedding"])
+    first, duplicate = ({k: v for k, v in r.items() if k != "embedding"} for r in (results[0], results[2]))
+    assert first == duplicate
+    assert results[1]["intent"] == [{"intent": "about Refund", "confidence": 0.9}]
+    assert results[1]["summary"] == "Refund Cha"
+    assert set(results[0]) == {"embedding", "intent", "keywords", "summary"}
+
+
+def test_summaries_keep_the_line_breaks_preprocessing_depends_on(fake_models):
+    ticket = {
+        "subject": "Hello team, printer offline",
+        "description": "Hi,\nI tried resetting it twice.\nBest regards,\nBob",
+    }
+    results = asyncio.run(enrich_tickets([ticket], ["summary", "intent"]))
+
+    assert results[0]["summary"] == "I tried re"
+    assert fake_models["intent"] == ["Hello team, printer offline"]
+
+
+def test_keywords_reuse_the_embedding_stage(fake_models):
+    results = asyncio.run(enrich_tickets(TICKETS[:2], ["keywords"]))
+
+    assert fake_models["embed"] == [["Printer jammed", "Refund"]]
+    assert sorted(fake_models["keywords"]) == [("Printer jammed", (14.0, 1.0)), ("Refund", (6.0, 1.0))]
+    assert fake_models["intent"] == [] and fake_models["summarize"] == []
+    assert results == [{"keywords": ["printer jammed"]}, {"keywords": ["refund"]}]
+
+
+def test_a_failing_stage_fails_the_request(fake_models, monkeypatch):
+    def fail(subject, description):
+        raise RuntimeError("intent model not available")
+
+    monkeypatch.setattr(enrich, "classify_ticket_intent", fail)
+    with pytest.raises(RuntimeError, match="intent model not available"):
+        asyncio.run(enrich_tickets(TICKETS[:1], ["intent", "summary"]))
+
+
+def test_outputs_are_validated_and_empty_batches_short_circuit(fake_models):
+    with pytest.raises(ValueError, match="Unknown outputs \\['sentiment'\\]"):
+        asyncio.run(enrich_tickets(TICKETS, ["intent", "sentiment"]))
+    with pytest.raises(ValueError):
+        asyncio.run(enrich_tickets(TICKETS, []))
+    assert asyncio.run(enrich_tickets([])) == []
+    assert all(not calls for calls in fake_models.values())
@@ -0,0 +1,43 @@
+import numpy as np
+
+from services.extract_keywords import embedding_digest, generate_candidates, maximal_marginal_relevance
+
+
+def test_candidates_skip_stopword_edges_and_punctuation():
+    candidates = generate_candidates("The refund for my order. Order refund is late, please help!", (1, 2))
+    assert candidates[:2] == ["refund", "order"]
+    assert "order refund" in candidates
+    assert "refund for" not in candidates and "my order" not in candidates
+    # Bigrams never cross the sentence boundary
+    assert "order order" not in candidates
+    assert "late help" not in candidates
+
+
+def test_candidates_drop_bare_numbers_and_respect_the_limit():
+    candidates = generate_candidates("order 1234567 shipped order 1234567", (1, 2), max_candidates=2)
+    assert "1234567" not in generate_candidates("order 1234567 shipped", (1, 1))
+    assert candidates == ["order", "order 1234567"]
+    assert generate_candidates("") == []
+
+
+def test_mmr_with_no_diversity_ranks_by_relevance():
+    embeddings = np.eye(4, dtype=np.float32)
+    similarity = np.array([0.2, 0.9, 0.5, 0.7])
+    assert maximal_marginal_relevance(similarity, embeddings, 3, diversity=0.0) == [1, 3, 2]
+    assert maximal_marginal_relevance(similarity, embeddings, 10, diversity=0.0) == [1, 3, 2, 0]
+    assert maximal_marginal_relevance(similarity[:0], embeddings[:0], 3, diversity=0.5) == []
+
+
+def test_mmr_skips_near_duplicates_of_selected_candidates():
+    embeddings = np.array([[1, 0], [0.99, 0.141], [0, 1]], dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarity = np.array([0.9, 0.88, 0.6])
+    assert maximal_marginal_relevance(similarity, embeddings, 2, diversity=0.0) == [0, 1]
+    assert maximal_marginal_relevance(similarity, embeddings, 2, diversity=0.5) == [0, 2]
+
+
+def test_embedding_digest_tells_embeddings_apart():
+    vector = np.array([0.1, 0.2, 0.3])
+    assert embedding_digest(None) == ""
+    assert embedding_digest(vector) == embedding_digest(vector.astype(np.float32))
+    assert embedding_digest(vector) != embedding_digest(vector * 2)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from services.extractive import select_sentences, split_sentences, summary_tier, textrank
+from services.text_normalization import conversation_text
+
+TRANSCRIPT = """Hi there,
+Customer: my card was charged twice for order 4471
+Agent: sorry about that let me look into it
+Customer: it happened yesterday evening after checkout froze
+Agent: I see both charges one will be refunded in three to five days
+Thanks,
+"""
+
+
+def test_split_sentences():
+    text = "My order is late. Where is it?  Please help!\nOrder 1234"
+    assert split_sentences(text) == ["My order is late.", "Where is it?", "Please help!", "Order 1234"]
+    assert split_sentences("") == []
+
+
+def test_central_sentences_rank_highest():
+    # Three sentences about one topic and one outlier
+    embeddings = np.array([[1, 0], [0.9, 0.1], [0.95, 0.05], [0, 1]], dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = textrank(embeddings)
+    assert np.isclose(scores.sum(), 1.0)
+    assert scores.argmin() == 3
+    assert len(textrank(np.zeros((0, 2), dtype=np.float32))) == 0
+
+
+def test_selection_keeps_original_order_within_word_budget():
+    sentences = ["one two three", "four five", "six seven eight nine", "ten"]
+    scores = np.array([0.1, 0.4, 0.3, 0.2])
+    assert select_sentences(sentences, scores, max_words=6) == "four five six seven eight nine"
+    assert select_sentences(sentences, scores, max_words=4) == "four five ten"
+    assert select_sentences(sentences, scores, max_words=1) == "ten"
+
+
+def test_selection_never_overruns_the_budget():
+    sentences = [" ".join(["word"] * 121), "short one"]
+    assert select_sentences(sentences, np.array([0.9, 0.1]), max_words=50) == "short one"
+    assert select_sentences(sentences[:1], np.array([1.0]), max_words=50) is None
+
+
+def test_passthrough_follows_the_summary_length():
+    text = " ".join(["word"] * 30) + ". Another sentence."
+    assert summary_tier(text, max_words=50, extractive_max_words=250) == "passthrough"
+    assert summary_tier(text, max_words=20, extractive_max_words=250) == "extractive"
+
+
+def test_preprocessed_unpunctuated_conversation_is_not_extractive():
+    # Preprocessing joins the lines, so the transcript is a single "sentence"
+    text = conversation_text(TRANSCRIPT * 4)
+    assert 50 < len(text.split()) <= 250
+    assert len(split_sentences(text)) == 1
+    assert summary_tier(text, max_words=50, extractive_max_words=250) == "abstractive"
+
+    punctuated = conversation_text(TRANSCRIPT.replace("\nAgent", ".\nAgent").replace("\nCustomer", ".\nCustomer") * 4)
+    assert summary_tier(punctuated, max_words=50, extractive_max_words=250) == "extractive"
@@ -0,0 +1,49 @@
+import pytest
+
+from services.generation_budget import GenerationCost, plan_generation
+
+# Two 512-word texts: one unit per text, beam and output token
+WORDS = [512, 512]
+
+
+@pytest.fixture
+def cost():
+    return GenerationCost(seconds_per_token=0.01)
+
+
+def test_richest_strategy_that_fits_the_budget(cost):
+    # beam4 over 50 tokens: 0.01 * 4 * 50 * 2 = 4s, beam2 2s, greedy 1s
+    assert plan_generation(cost, WORDS, 50, 10, None) == ("beam4", 4, 50)
+    assert plan_generation(cost, WORDS, 50, 10, 4.0) == ("beam4", 4, 50)
+    assert plan_generation(cost, WORDS, 50, 10, 3.0) == ("beam2", 2, 50)
+    assert plan_generation(cost, WORDS, 50, 10, 1.5) == ("greedy", 1, 50)
+
+
+def test_short_greedy_summary_down_to_min_tokens(cost):
+    # One greedy token for the batch costs 0.02s
+    assert plan_generation(cost, WORDS, 50, 10, 0.5) == ("greedy-short", 1, 25)
+    assert plan_generation(cost, WORDS, 50, 10, 0.2) == ("greedy-short", 1, 10)
+
+
+def test_no_plan_when_min_tokens_do_not_fit(cost):
+    assert plan_generation(cost, WORDS, 50, 10, 0.19) is None
+    assert plan_generation(cost, WORDS, 50, 10, 0.0) is None
+
+
+def test_short_inputs_weigh_less_but_not_nothing(cost):
+    assert cost.units([1024], 1, 10) == 20
+    assert cost.units([10], 1, 10) == cost.units([128], 1, 10) == 2.5
+
+
+def test_observed_batches_move_the_estimate(cost):
+    # 4 beams x 50 tokens x 2 texts = 400 units measured at 8s: 0.02 s/unit
+    cost.observe(WORDS, 4, 50, 8.0)
+    assert cost.seconds_per_token == pytest.approx(0.01 + 0.2 * (0.02 - 0.01))
+    for _ in range(50):
+        cost.observe(WORDS, 4, 50, 8.0)
+    assert cost.seconds_per_token == pytest.approx(0.02, rel=1e-3)
+    # Slower estimates push plans to cheaper strategies
+    assert plan_generation(cost, WORDS, 50, 10, 4.0) == ("beam2", 2, 50)
+
+    cost.observe([], 4, 50, 1.0)
+    assert cost.seconds_per_token == pytest.approx(0.02, rel=1e-3)
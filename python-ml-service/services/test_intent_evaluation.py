@@ -0,0 +1,36 @@
+from services.intent_evaluation import classification_metrics, compare_reports, latency_summary, run_pass
+
+
+def test_per_intent_precision_and_recall():
+    metrics = classification_metrics(
+        ["refund_request", "refund_request", "billing_inquiry", "escalation"],
+        ["refund_request", "billing_inquiry", "billing_inquiry", "other"],
+    )
+    assert metrics["accuracy"] == 0.5
+    assert metrics["per_intent"]["refund_request"] == {"precision": 1.0, "recall": 0.5, "f1": 0.6667, "support": 2}
+    assert metrics["per_intent"]["billing_inquiry"]["precision"] == 0.5
+    assert metrics["per_intent"]["escalation"]["recall"] == 0.0
+    assert metrics["unexpected_predictions"] == ["other"]
+
+
+def test_run_pass_records_predictions_and_latency():
+    tickets = [{"subject": "s", "description": "d", "intent": "x"}] * 3
+    result = run_pass(tickets, lambda subject, description: [{"intent": "x", "probability": 1.0}])
+    assert result["predictions"] == ["x", "x", "x"]
+    assert result["latency"]["total"]["max_ms"] >= result["latency"]["total"]["p50_ms"] >= 0
+    assert result["tickets_per_second"] > 0
+
+
+def test_regressions_against_baseline():
+    def report(accuracy, recall, p95):
+        return {"modes": {"cold": {
+            "accuracy": accuracy,
+            "per_intent": {"refund_request": {"precision": 1.0, "recall": recall, "f1": 1.0, "support": 5}},
+            "latency": {"total": {**latency_summary([0.001]), "p95_ms": p95}},
+        }}}
+
+    baseline = report(0.9, 0.8, 10.0)
+    assert compare_reports(report(0.9, 0.8, 11.0), baseline) == []
+    regressions = compare_reports(report(0.85, 0.6, 20.0), baseline)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("cold: accuracy")
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from services import jobs
+from services.jobs import JobQueue, resolve_input_path
+
+
+def _operations(calls):
+    def length(tickets):
+        calls.append(len(tickets))
+        return [len(t["description"]) for t in tickets]
+    return {"length": length}
+
+
+def _wait_for(queue, job_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job did not reach {status}: {queue.get(job_id)}")
+
+
+def test_job_runs_in_batches_and_writes_results(tmp_path):
+    calls = []
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "out"), _operations(calls), poll_interval=0.01)
+    tickets = [{"id": str(i), "subject": "s", "description": "x" * i} for i in range(10)]
+    job = queue.submit(iter(tickets), ["length"], batch_size=4)
+    queue.start()
+
+    job = _wait_for(queue, job["id"], "completed")
+    queue.stop()
+
+    assert calls == [4, 4, 2]
+    assert job["processed"] == job["total"] == 10
+    with open(job["output_path"]) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["length"] for r in records] == list(range(10))
+    assert [r["id"] for r in records] == [str(i) for i in range(10)]
+
+
+def test_interrupted_job_resumes_from_checkpoint(tmp_path):
+    db_path, out_dir = str(tmp_path / "jobs.sqlite3"), str(tmp_path / "out")
+    calls = []
+    queue = JobQueue(db_path, out_dir, _operations(calls))
+    job = queue.submit([{"description": "x" * i} for i in range(6)], ["length"], batch_size=2)
+
+    # Simulate a crash after the first checkpoint plus a partially written batch
+    queue._execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job["id"],))
+    original_length = queue.operations["length"]
+
+    def crash_after_first_batch(tickets):
+        if calls:
+            raise RuntimeError("process died")
+        return original_length(tickets)
+
+    queue.operations["length"] = crash_after_first_batch
+    try:
+        queue.run_job(job["id"])
+    except RuntimeError:
+        pass
+    with open(job["output_path"], "a") as f:
+        f.write('{"seq": 2, "partial": true}\n')
+
+    restarted = JobQueue(db_path, out_dir, _operations(calls), poll_interval=0.01)
+    restarted.start()
+    job = _wait_for(restarted, job["id"], "completed")
+    restarted.stop()
+
+    with open(job["output_path"]) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["seq"] for r in records] == list(range(6))
+    assert [r["length"] for r in records] == list(range(6))
+
+
+def test_submitting_a_large_file_does_not_hold_up_other_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_INSERT_CHUNK", 10)
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "out"), _operations([]))
+    reading = threading.Event()
+
+    def slow_file():
+        for i in range(100):
+            reading.set()
+            time.sleep(0.002)
+            yield {"description": "x" * i}
+
+    submitted = []
+    submitter = threading.Thread(target=lambda: submitted.append(queue.submit(slow_file(), ["length"])))
+    submitter.start()
+    reading.wait(timeout=5)
+    started = time.monotonic()
+    assert queue.list() == []  # the job is not visible until all of its tickets are stored
+    assert time.monotonic() - started < 0.1
+    submitter.join()
+
+    assert submitted[0]["total"] == 100
+    items = queue._execute("SELECT seq FROM job_items WHERE job_id = ? ORDER BY seq", (submitted[0]["id"],))
+    assert [row["seq"] for row in items.fetchall()] == list(range(100))
+
+
+def test_failed_submission_leaves_no_tickets_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_INSERT_CHUNK", 3)
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "out"), _operations([]))
+
+    def broken_file():
+        for i in range(7):
+            yield {"description": "x"}
+        raise ValueError("bad line")
+
+    with pytest.raises(ValueError, match="bad line"):
+        queue.submit(broken_file(), ["length"])
+    assert queue.list() == []
+    assert queue._execute("SELECT COUNT(*) AS n FROM job_items").fetchone()["n"] == 0
+
+
+def test_unknown_operation_is_rejected(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "out"), _operations([]))
+    try:
+        queue.submit([{"description": "x"}], ["nope"])
+    except ValueError as e:
+        assert "nope" in str(e)
+    else:
+        raise AssertionError("Expected a ValueError")
+
+
+def test_input_paths_are_confined_to_the_input_dir(tmp_path):
+    root = tmp_path / "imports"
+    root.mkdir()
+    (root / "tickets.jsonl").write_text("{}\n")
+    (tmp_path / "secret.json").write_text("[]")
+    os.symlink(tmp_path / "secret.json", root / "link.json")
+
+    assert resolve_input_path("tickets.jsonl", str(root)) == os.path.realpath(root / "tickets.jsonl")
+    assert resolve_input_path(str(root / "tickets.jsonl"), str(root)) == os.path.realpath(root / "tickets.jsonl")
+    for path in ["../secret.json", str(tmp_path / "secret.json"), "link.json", "/etc/passwd", "missing.jsonl", "."]:
+        with pytest.raises(ValueError):
+            resolve_input_path(path, str(root))
@@ -0,0 +1,61 @@
+import sys
+import types
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import memory
+from services.cache import LRUCache
+
+
+def test_requests_are_recorded_by_route_template(monkeypatch):
+    monkeypatch.setattr(memory, "_history", memory.defaultdict(lambda: memory.deque(maxlen=5)))
+    app = FastAPI()
+    app.middleware("http")(memory.memory_tracking_middleware)
+
+    @app.get("/api/v1/jobs/{job_id}")
+    async def job(job_id: str):
+        return {"id": job_id}
+
+    client = TestClient(app)
+    for path in ["/api/v1/jobs/1", "/api/v1/jobs/2", "/api/v1/jobs/3", "/nope/1", "/nope/2"]:
+        client.get(path)
+
+    endpoints = memory.endpoint_memory()
+    assert set(endpoints) == {"jobs/{job_id}", memory.UNMATCHED_ENDPOINT}
+    assert endpoints["jobs/{job_id}"]["requests"] == 3
+    assert endpoints[memory.UNMATCHED_ENDPOINT]["requests"] == 2
+
+
+def test_history_is_bounded_per_endpoint(monkeypatch):
+    monkeypatch.setattr(memory, "_history", memory.defaultdict(lambda: memory.deque(maxlen=2)))
+    for rss_after in (10, 30, 20):
+        memory.record_request("similar", 0, rss_after, None, 0.01)
+    assert memory.endpoint_memory()["similar"] == {
+        "requests": 2, "peak_rss_growth": 30, "peak_traced_allocation": None
+    }
+
+
+def test_psutil_errors_fall_back_to_proc(monkeypatch):
+    class Error(Exception):
+        pass
+
+    class AccessDenied(Error):
+        pass
+
+    def process():
+        raise AccessDenied()
+
+    monkeypatch.setitem(sys.modules, "psutil", types.SimpleNamespace(Error=Error, Process=process))
+    report = memory.process_memory()
+    assert set(report) == {"rss", "uss", "peak_rss"}
+    assert report["rss"] == memory.current_rss()
+
+
+def test_cache_memory_counts_array_bytes():
+    cache = LRUCache("test-memory-arrays", 4)
+    cache.set("a", np.zeros(256, dtype=np.float32))
+    info = memory.cache_memory()["test-memory-arrays"]
+    assert info["entries"] == 1 and info["maxsize"] == 4
+    assert info["approx_bytes"] >= 1024
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+from services.model_pools import PriorityPool, _pools, _priority, get_pool, set_priority, submit_to_pool
+from services.single_flight import SingleFlight, make_key
+
+
+def test_interactive_overtakes_bulk_but_bulk_keeps_its_share():
+    pool = PriorityPool("test-lanes", workers=1, weights={"interactive": 3, "bulk": 1})
+    started, gate = threading.Event(), threading.Event()
+    order = []
+    try:
+        # Occupy the only worker so the queues fill up before anything is scheduled
+        pool.submit("bulk", lambda: started.set() or gate.wait())
+        started.wait(timeout=5)
+        futures = [pool.submit("bulk", lambda i=i: order.append(f"b{i}")) for i in range(4)]
+        futures += [pool.submit("interactive", lambda i=i: order.append(f"i{i}")) for i in range(6)]
+        gate.set()
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        pool.shutdown()
+
+    # Interactive work jumps the bulk backlog, yet bulk gets one slot in every four
+    assert order == ["i0", "i1", "b0", "i2", "i3", "i4", "b1", "i5", "b2", "b3"]
+
+
+def test_cancelled_call_is_skipped():
+    pool = PriorityPool("test-cancel", workers=1)
+    gate = threading.Event()
+    ran = []
+    try:
+        pool.submit("interactive", gate.wait)
+        skipped = pool.submit("interactive", lambda: ran.append("skipped"))
+        kept = pool.submit("interactive", lambda: ran.append("kept"))
+        skipped.cancel()
+        gate.set()
+        kept.result(timeout=5)
+    finally:
+        pool.shutdown()
+    assert ran == ["kept"]
+
+
+def test_promoted_call_keeps_its_place_among_later_interactive_calls():
+    pool = PriorityPool("test-promote", workers=1)
+    started, gate = threading.Event(), threading.Event()
+    order = []
+    try:
+        pool.submit("interactive", lambda: started.set() or gate.wait())
+        started.wait(timeout=5)
+        bulk = pool.submit("bulk", lambda: order.append("bulk"))
+        later = pool.submit("interactive", lambda: order.append("later"))
+        assert pool.promote(bulk, "interactive")
+        assert not pool.promote(bulk, "bulk")  # never demoted
+        assert pool.queue_depths() == {"interactive": 2, "bulk": 0}
+        gate.set()
+        later.result(timeout=5)
+        assert not pool.promote(bulk, "interactive")  # no longer queued
+    finally:
+        pool.shutdown()
+    assert order == ["bulk", "later"]
+
+
+def test_interactive_caller_joining_a_bulk_flight_promotes_it():
+    name = "test-flight-lanes"
+    started, gate = threading.Event(), threading.Event()
+
+    async def call_in_lane(group, lane):
+        token = set_priority(lane)
+        try:
+            return await group.do(make_key(name, "model", "same text"), str.upper, "done")
+        finally:
+            _priority.reset(token)
+
+    async def scenario():
+        # Occupy the pool's only worker so the shared call stays queued
+        submit_to_pool(name, lambda: started.set() or gate.wait())
+        started.wait(timeout=5)
+        group = SingleFlight()
+        leader = asyncio.ensure_future(call_in_lane(group, "bulk"))
+        await asyncio.sleep(0.05)
+        assert get_pool(name).queue_depths() == {"interactive": 0, "bulk": 1}
+        joiner = asyncio.ensure_future(call_in_lane(group, "interactive"))
+        await asyncio.sleep(0.05)
+        depths = get_pool(name).queue_depths()
+        gate.set()
+        return depths, await leader, await joiner
+
+    try:
+        depths, leader, joiner = asyncio.run(scenario())
+    finally:
+        _pools.pop(name).shutdown()
+    assert depths == {"interactive": 1, "bulk": 0}
+    assert leader == joiner == "DONE"
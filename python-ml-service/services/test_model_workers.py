@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+from services.model_workers import ProcessWorker
+
+
+def double(vectors):
+    return vectors * 2, os.environ.get("MODEL_WORKER_POOL")
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def crash():
+    os._exit(3)
+
+
+@pytest.fixture
+def worker():
+    worker = ProcessWorker("test")
+    yield worker
+    worker.stop()
+
+
+def test_arrays_round_trip_through_the_worker_process(worker):
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    doubled, pool = worker.call(double, (vectors,), {}, None)
+    np.testing.assert_array_equal(doubled, vectors * 2)
+    assert pool == "test"
+
+
+def test_errors_are_raised_in_the_caller(worker):
+    with pytest.raises(ValueError, match="bad input"):
+        worker.call(fail, ("bad input",), {}, None)
+
+
+def test_crashed_worker_is_replaced(worker):
+    first_pid = worker.process.pid
+    with pytest.raises(RuntimeError, match="died"):
+        worker.call(crash, (), {}, None)
+    assert worker.process.pid != first_pid
+    doubled, _ = worker.call(double, (np.ones(2),), {}, None)
+    np.testing.assert_array_equal(doubled, [2, 2])
@@ -0,0 +1,31 @@
+from services.near_duplicates import _lsh_bands, group_near_duplicates, near_duplicate_stats
+
+ALERT = ("Automated alert {id}: disk usage on host web-{host} exceeded 90 percent at {time}. "
+         "Please check the storage dashboard and free space on the affected volume before it fills up.")
+
+
+def test_templated_alerts_share_one_representative():
+    texts = [ALERT.format(id=f"INC-{n}", host=n % 7, time=f"2024-05-{n:02d} 10:{n:02d}") for n in range(1, 21)]
+    texts.insert(5, "My order 1234 arrived broken and I want a refund for the damaged item please.")
+    representatives, inverse = group_near_duplicates("test", texts)
+    assert representatives == [0, 5]
+    assert inverse[5] == 1 and all(slot == 0 for i, slot in enumerate(inverse) if i != 5)
+
+
+def test_distinct_texts_are_all_encoded():
+    texts = [
+        "I want to cancel my subscription before the next billing cycle.",
+        "The app keeps crashing when I open the settings page on Android.",
+        "I was charged twice for the same order this month.",
+        "How do I change the email address on my account?",
+    ]
+    assert group_near_duplicates("test", texts) == ([0, 1, 2, 3], [0, 1, 2, 3])
+
+
+def test_threshold_and_stats():
+    texts = ["refund my order now please", "refund my order now please thanks a lot"]
+    assert group_near_duplicates("test", texts, threshold=0.3)[0] == [0]
+    assert group_near_duplicates("test", texts, threshold=0.95)[0] == [0, 1]
+    bands, rows = _lsh_bands(0.9, 128)
+    assert bands * rows == 128 and (1 / bands) ** (1 / rows) < 0.9
+    assert 0 < near_duplicate_stats()["skipped_ratio"] < 1
@@ -0,0 +1,39 @@
+import re
+import time
+
+from services.phrase_rules import PhraseRuleSet, bound_gaps
+
+RULES = {
+    "information_request": [r"\b(how\s+(can|do|to)|what\s+is|where\s+is|when|why)\b.*\?"],
+    "refund_request": [r"\b(want|need)\s+my\s+money\b", r"\bcharged twice\b.*(want.*back|refund)\b"],
+}
+
+
+def test_gaps_are_bounded():
+    assert bound_gaps(r"a.*b\.*c", gap=5) == r"a.{0,5}b\.*c"
+    rules = PhraseRuleSet("test-gaps", RULES, gap=20)
+    assert "information_request" in rules.scan("when will it ship?")
+    assert rules.scan("when " + "x" * 50 + "?") == {}
+
+
+def test_counts_match_the_unbounded_rules_on_ordinary_text():
+    rules = PhraseRuleSet("test-counts", RULES)
+    text = "i want my money. why? i need my money now. i was charged twice and want it back"
+    found = rules.scan(text)
+    for key, key_rules in RULES.items():
+        expected = [(rule, len(re.findall(rule, text))) for rule in key_rules if re.search(rule, text)]
+        assert found.get(key, []) == expected
+
+
+def test_adversarial_long_inputs_stay_cheap():
+    rules = PhraseRuleSet("test-adversarial", RULES, max_chars=20000)
+    texts = [
+        "when why " * 10000,                 # many anchors, no closing "?"
+        "charged twice want " * 5000,        # nested gaps that never complete
+        "a" * 200000 + " how can i?",        # match only past the input cap
+    ]
+    for text in texts:
+        started = time.perf_counter()
+        found = rules.scan(text)
+        assert time.perf_counter() - started < 1.0
+        assert "information_request" not in found
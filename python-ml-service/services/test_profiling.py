@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import profiling
+from services.profiling import PROFILE_HEADER, SamplingProfiler, profiling_middleware
+
+
+def busy_model_call(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_other_threads_in_collapsed_format():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_model_call, args=(stop,), name="pool-test_0")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.sample_count > 0
+    stacks = profiler.collapsed().splitlines()
+    worker_stacks = [line for line in stacks if line.startswith("pool-test_0;")]
+    assert worker_stacks and all("test_profiling.py:busy_model_call" in line for line in worker_stacks)
+    assert not any(line.startswith("profiler;") for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+
+
+def make_client():
+    app = FastAPI()
+    app.middleware("http")(profiling_middleware)
+
+    @app.post("/api/v1/summarize")
+    async def summarize():
+        return {"summary": "ok"}
+
+    return TestClient(app)
+
+
+def test_only_allow_listed_callers_can_request_a_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "PROFILE_ALLOWED_CALLERS", {"10.0.0.5"})
+    client = make_client()
+
+    response = client.post("/api/v1/summarize", headers={PROFILE_HEADER: "1"})
+    assert "X-Profile-Id" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+    monkeypatch.setattr(profiling, "PROFILE_ALLOWED_CALLERS", {"testclient"})
+    response = client.post("/api/v1/summarize", headers={PROFILE_HEADER: "1"}, content=b"0123456789")
+    profile_id = response.headers["X-Profile-Id"]
+    assert response.json() == {"summary": "ok"}
+    assert "-api_v1_summarize-" in profile_id
+    assert sorted(os.listdir(tmp_path)) == [f"{profile_id}.folded", f"{profile_id}.json"]
+
+    with open(tmp_path / f"{profile_id}.json") as f:
+        metadata = json.load(f)
+    assert metadata["endpoint"] == "/api/v1/summarize"
+    assert metadata["trigger"] == "header"
+    assert metadata["status"] == 200
+    assert metadata["input_bytes"] == 10
+
+
+def test_sampled_requests_are_profiled_without_the_header(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_ALLOWED_CALLERS", set())
+    response = make_client().post("/api/v1/summarize")
+
+    with open(tmp_path / f"{response.headers['X-Profile-Id']}.json") as f:
+        assert json.load(f)["trigger"] == "sampled"
+
+
+def test_unwritable_profile_dir_does_not_fail_the_request(tmp_path, monkeypatch):
+    blocked = tmp_path / "not-a-dir"
+    blocked.write_text("")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(blocked))
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    response = make_client().post("/api/v1/summarize")
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
@@ -0,0 +1,52 @@
+import numpy as np
+
+from services.qa_spans import best_span, context_start, slice_windows
+
+
+class StubTokenizer:
+    """
+    RoBERTa-style pair layout: <s> question </s></s> context </s>
+    """
+
+    def build_inputs_with_special_tokens(self, first, second):
+        return [0] + first + [2, 2] + second + [2]
+
+
+def test_context_starts_after_the_question_and_separators():
+    tokenizer = StubTokenizer()
+    question = [11, 12, 13]
+    inputs = tokenizer.build_inputs_with_special_tokens(question, [21, 22])
+    start = context_start(tokenizer, question)
+    assert start == 6
+    assert inputs[start:start + 2] == [21, 22]
+
+
+def test_windows_overlap_by_the_stride_and_cover_the_context():
+    ids = list(range(10))
+    offsets = [(i * 2, i * 2 + 1) for i in ids]
+    result = slice_windows("ctx", ids, offsets, size=4, stride=1)
+    assert result.windows == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+    assert result.offsets[1][0] == (6, 7)
+    assert result.context == "ctx"
+
+    assert slice_windows("short", ids[:3], offsets[:3], size=4, stride=2).windows == [[0, 1, 2]]
+    assert slice_windows("", [], [], size=4, stride=2).windows == [[]]
+    # A stride as large as the window still advances
+    assert len(slice_windows("ctx", ids, offsets, size=4, stride=4).windows) == 7
+
+
+def test_best_span_never_ends_before_it_starts():
+    start_logits = np.array([0.0, 0.0, 0.0, 9.0])
+    end_logits = np.array([9.0, 0.0, 0.0, 0.0])
+    start, end, score = best_span(start_logits, end_logits, max_answer_tokens=30)
+    assert start <= end
+    assert 0 < score <= 1
+
+
+def test_best_span_respects_the_answer_length_bound():
+    start_logits = np.array([9.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+    end_logits = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 9.0])
+    assert best_span(start_logits, end_logits, max_answer_tokens=6)[:2] == (0, 5)
+    start, end, _ = best_span(start_logits, end_logits, max_answer_tokens=3)
+    assert end - start + 1 <= 3
+    assert best_span(np.array([1.0]), np.array([1.0]), max_answer_tokens=1) == (0, 0, 1.0)
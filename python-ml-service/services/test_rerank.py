@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from services.rerank import lexical_overlap, lexical_text, rerank
+
+
+def test_candidates_are_ranked_by_cosine_regardless_of_norm():
+    candidates = np.array([[0.0, 5.0], [2.0, 0.1], [-1.0, 0.0], [0.3, 0.3]])
+    results = rerank([10.0, 0.0], candidates, ["up", "close", "opposite", "diagonal"], top_k=3)
+
+    assert [result["id"] for result in results] == ["close", "diagonal", "up"]
+    assert results[0]["score"] == pytest.approx(2.0 / np.hypot(2.0, 0.1), abs=1e-6)
+    assert results[1]["score"] == pytest.approx(np.sqrt(0.5), abs=1e-6)
+    assert all(result["lexical"] is None for result in results)
+
+
+def test_lexical_overlap_blends_into_the_score():
+    texts = ["Printer jammed on tray two", None, "printer offline"]
+    lexical = lexical_overlap("printer jammed", texts)
+    assert lexical.tolist() == [1.0, 0.0, 0.5]
+
+    candidates = np.array([[0.6, 0.8], [1.0, 0.0], [0.8, 0.6]])
+    semantic_only = rerank([1.0, 0.0], candidates, ["a", "b", "c"], lexical_scores=lexical)
+    blended = rerank([1.0, 0.0], candidates, ["a", "b", "c"], lexical_scores=lexical, lexical_weight=0.5)
+
+    assert [result["id"] for result in semantic_only] == ["b", "c", "a"]
+    assert [result["id"] for result in blended] == ["a", "c", "b"]
+    assert blended[0]["score"] == pytest.approx(0.5 * 0.6 + 0.5 * 1.0, abs=1e-6)
+    assert blended[0]["lexical"] == 1.0
+
+
+def test_empty_and_mismatched_candidates():
+    assert rerank([1.0, 0.0], np.zeros((0, 2)), []) == []
+    assert lexical_overlap("", ["anything"]).tolist() == [0.0]
+    with pytest.raises(ValueError, match="dimension 3"):
+        rerank([1.0, 0.0, 0.0], np.ones((2, 2)), ["a", "b"])
+
+
+def test_lexical_text_has_no_separator_token_to_match_on():
+    from services.text_normalization import ticket_text
+
+    candidates = [lexical_text("VPN down", "Cannot connect"), lexical_text("Billing", None), lexical_text(None, None)]
+    assert candidates == ["VPN down Cannot connect", "Billing", ""]
+    # The embedding text's separator would make unrelated tickets overlap
+    assert lexical_overlap(ticket_text("Refund", "request"), [ticket_text("VPN down", "Cannot connect")])[0] > 0
+    assert lexical_overlap(lexical_text("Refund", "request"), candidates).tolist() == [0.0, 0.0, 0.0]
@@ -0,0 +1,36 @@
+import json
+
+import numpy as np
+import pytest
+
+from services import serialization
+from services.serialization import NumpyJSONResponse, dumps
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        if serialization.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+def test_arrays_serialize_to_the_same_values_as_lists(encoder):
+    vectors = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+    decoded = json.loads(dumps({"vectors": vectors, "dim": np.int64(8)}))
+    assert decoded["dim"] == 8
+    np.testing.assert_array_equal(np.asarray(decoded["vectors"], dtype=np.float32), vectors)
+
+
+def test_views_and_other_dtypes(encoder):
+    matrix = np.arange(12, dtype=np.float64).reshape(3, 4)
+    content = {"columns": matrix[:, 1], "codes": np.array([-3, 7], dtype=np.int8), "flags": np.array([True])}
+    assert json.loads(dumps(content)) == {"columns": [1.0, 5.0, 9.0], "codes": [-3, 7], "flags": [True]}
+
+
+def test_response_renders_without_python_lists(encoder):
+    response = NumpyJSONResponse([np.ones(2, dtype=np.float32)])
+    assert json.loads(response.body) == [[1.0, 1.0]]
+    assert response.headers["content-type"] == "application/json"
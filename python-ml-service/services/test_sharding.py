@@ -0,0 +1,77 @@
+import os
+from collections import Counter
+
+import pytest
+
+from services.cache import LRUCache
+from services.sharding import HashRing, ShardedWorkers
+
+KEYS = [f"ticket-{i}" for i in range(20000)]
+
+# Lives in each worker process that imports this module to run `lookup`
+cache = LRUCache("test-shard-lookups", 100)
+
+
+def lookup(text):
+    hit = cache.get(text) is not None
+    cache.set(text, True)
+    return os.getpid(), hit
+
+
+def crash():
+    os._exit(3)
+
+
+def test_keys_spread_evenly_over_nodes():
+    ring = HashRing([f"sbert-{i}" for i in range(4)])
+    load = Counter(ring.node_for(key) for key in KEYS)
+    assert set(load) == set(ring.nodes)
+    assert max(load.values()) / (len(KEYS) / 4) < 1.25
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing([f"sbert-{i}" for i in range(4)])
+    before = {key: ring.node_for(key) for key in KEYS}
+    ring.remove("sbert-2")
+    moved = [key for key in KEYS if ring.node_for(key) != before[key]]
+    assert moved and all(before[key] == "sbert-2" for key in moved)
+
+
+def test_adding_a_node_only_takes_keys_for_itself():
+    ring = HashRing([f"sbert-{i}" for i in range(3)])
+    before = {key: ring.node_for(key) for key in KEYS}
+    ring.add("sbert-3")
+    moved = [key for key in KEYS if ring.node_for(key) != before[key]]
+    assert all(ring.node_for(key) == "sbert-3" for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+@pytest.fixture
+def shards():
+    workers = ShardedWorkers("test", 2, eject_seconds=60)
+    yield workers
+    workers.stop()
+
+
+def test_same_input_reaches_the_same_process_and_its_cache(shards):
+    first_pid, first_hit = shards.call("digest-a", lookup, ("a",), {}, None)
+    pid, hit = shards.call("digest-a", lookup, ("a",), {}, None)
+    assert (pid, first_hit, hit) == (first_pid, False, True)
+
+    stats = shards.stats()
+    shard = stats["shards"][shards.shard_for("digest-a")]
+    assert shard["calls"] == 2
+    assert shard["caches"]["test-shard-lookups"]["hit_ratio"] == 0.5
+    assert stats["load_skew"] == 2.0
+
+
+def test_dead_shard_leaves_the_ring_until_it_is_readmitted(shards):
+    name = shards.shard_for("digest-a")
+    with pytest.raises(RuntimeError, match="died"):
+        shards.call("digest-a", crash, (), {}, None)
+    assert shards.ring.nodes == [other for other in shards.names if other != name]
+    assert shards.shard_for("digest-a") != name
+
+    shards.eject_seconds = 0
+    shards._ejected[name] = 0
+    assert shards.shard_for("digest-a") == name
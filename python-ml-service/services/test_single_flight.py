@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.model_pools import _pools
+from services.single_flight import SingleFlight, dedupe_batch, fan_out, make_key
+
+
+def run_flights(name, fn, callers):
+    """
+    Start `callers` identical calls on the pool `name` while `fn` is held back, then let it run.
+    """
+    gate = threading.Event()
+    calls = []
+
+    def blocked(value):
+        calls.append(value)
+        gate.wait(timeout=5)
+        return fn(value)
+
+    async def scenario():
+        group = SingleFlight()
+        key = make_key(name, "model", "same text")
+        waiting = [asyncio.ensure_future(group.do(key, blocked, "text")) for _ in range(callers)]
+        await asyncio.sleep(0.05)
+        inflight = group.inflight_count()
+        gate.set()
+        results = await asyncio.gather(*waiting, return_exceptions=True)
+        return results, inflight, group.inflight_count()
+
+    try:
+        results, inflight, remaining = asyncio.run(scenario())
+    finally:
+        _pools.pop(name).shutdown()
+    return calls, results, inflight, remaining
+
+
+def test_identical_concurrent_calls_share_one_computation():
+    calls, results, inflight, remaining = run_flights("test-coalesce", lambda value: [value.upper()], 5)
+
+    assert calls == ["text"]
+    assert inflight == 1 and remaining == 0
+    assert all(result == ["TEXT"] for result in results)
+    # Callers share the result object itself
+    assert all(result is results[0] for result in results)
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    def fail(value):
+        raise ValueError(f"bad {value}")
+
+    calls, results, inflight, remaining = run_flights("test-errors", fail, 3)
+
+    assert calls == ["text"]
+    assert all(isinstance(result, ValueError) and str(result) == "bad text" for result in results)
+    assert remaining == 0
+
+    async def retry():
+        return await SingleFlight().do(make_key("test-errors", "model", "same text"), str.upper, "text")
+
+    try:
+        assert asyncio.run(retry()) == "TEXT"
+    finally:
+        _pools.pop("test-errors").shutdown()
+
+
+def test_keys_normalize_whitespace_but_keep_case_and_part_boundaries():
+    spaced = make_key("classify-intent", "albert", "  Printer\n jammed \t again ")
+    assert spaced == make_key("classify-intent", "albert", "Printer jammed again")
+    assert make_key("classify-intent", "albert", "Printer") != make_key("classify-intent", "albert", "printer")
+    assert make_key("answer", "roberta", "a b", "c") != make_key("answer", "roberta", "a", "b c")
+    assert make_key("sbert-embed", "mpnet", "x")[:2] == ("sbert-embed", "mpnet")
+    assert make_key("sbert-embed", "mpnet", "x") != make_key("sbert-embed", "minilm", "x")
+
+
+def test_summary_keys_keep_line_breaks():
+    # Preprocessing drops the greeting line only while it is a line of its own
+    separate_lines = "Hello,\nThe printer is offline."
+    one_line = "Hello, The printer is offline."
+    assert make_key("summarize", "bart", separate_lines) != make_key("summarize", "bart", one_line)
+    assert make_key("summarize", "bart", separate_lines) == make_key("summarize", "bart", separate_lines)
+    assert make_key("summarize", "bart", None) == make_key("summarize", "bart", "")
+
+
+@pytest.mark.parametrize("keys", [[], ["a"], ["a", "b", "a", "c", "b", "a"], ["x", "x", "x"]])
+def test_dedupe_batch_and_fan_out_round_trip(keys):
+    unique_positions, inverse = dedupe_batch("test-batch", keys)
+
+    assert [keys[position] for position in unique_positions] == list(dict.fromkeys(keys))
+    assert fan_out([keys[position] for position in unique_positions], inverse) == keys
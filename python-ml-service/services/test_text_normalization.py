@@ -0,0 +1,26 @@
+from services.text_normalization import (
+    MEMO_MIN_LENGTH, collapse_whitespace, conversation_text, intent_text, normalized, ticket_text
+)
+
+
+def test_intent_text_applies_every_rule_in_one_pass():
+    text = "  I CAN'T  cancle my order!!! It's   been a week, I wont wait & don't   want  it?? "
+    assert intent_text(text) == "i cannot cancel my order. it is been a week  i want wait   do not want it."
+
+
+def test_typos_are_whole_words_only():
+    assert intent_text("cancelled canceling cancell") == "cancelled canceling cancel"
+    assert intent_text("retrun the retur retrurn") == "return the return retrurn"
+
+
+def test_conversation_drops_greeting_and_closing_lines():
+    text = "Hi team,\n\nmy   order never arrived.\nGood morning all\nPlease help.\n\nThanks,\nDana"
+    assert conversation_text(text) == "my order never arrived. Please help. Dana"
+    assert conversation_text(text, max_words=2) == "my order"
+
+
+def test_long_texts_are_normalized_once():
+    text = "Refund please " * (MEMO_MIN_LENGTH // 10)
+    assert normalized(text) is normalized(text)
+    assert collapse_whitespace(text) == text.strip()
+    assert ticket_text("Subject", None) == "Subject [SEP] "
@@ -0,0 +1,152 @@
+import os
+import re
+from typing import Any, Optional, Tuple
+
+from services.cache import LRUCache
+
+# Texts shorter than this are normalized directly; caching them costs more than it saves
+MEMO_MIN_LENGTH = 64
+TEXT_NORMALIZATION_CACHE_SIZE = int(os.environ.get('TEXT_NORMALIZATION_CACHE_SIZE', '5000'))
+
+TICKET_SEPARATOR = " [SEP] "
+
+# Common typo corrections for critical intent keywords (whole words only)
+TYPO_CORRECTIONS = {
+    "cencel": "cancel",
+    "cancle": "cancel",
+    "cancell": "cancel",
+    "canel": "cancel",
+    "cancal": "cancel",
+    "wan't": "want",
+    "wont": "want",
+    "recieve": "receive",
+    "retrun": "return",
+    "retur": "return",
+}
+
+# Contractions expanded anywhere in the text
+CONTRACTIONS = {
+    "can't": "cannot", "won't": "will not", "n't": " not",
+    "i'm": "i am", "you're": "you are", "it's": "it is",
+    "that's": "that is", "what's": "what is", "where's": "where is",
+    "how's": "how is", "here's": "here is", "there's": "there is"
+}
+
+
+def _alternation(words) -> str:
+    # Longest first, so a word is never cut short by one of its prefixes
+    return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+# Every intent-text substitution in one pass. At each position the first alternative that
+# matches wins, which reproduces applying them one after another: typos are tried before
+# contractions, and no replacement produces text another rule would match.
+_INTENT_REPLACER = re.compile(
+    r"(?P<space>\s+)"
+    rf"|\b(?P<typo>{_alternation(TYPO_CORRECTIONS)})\b"
+    rf"|(?P<contraction>{_alternation(CONTRACTIONS)})"
+    r"|(?P<punctuation>[.!?]{2,})"
+    r"|(?P<special>[^\w\s.!?\-])"
+)
+
+_INTENT_REPLACEMENTS = {
+    "space": lambda match: " ",
+    "typo": lambda match: TYPO_CORRECTIONS[match.group()],
+    "contraction": lambda match: CONTRACTIONS[match.group()],
+    "punctuation": lambda match: ".",
+    "special": lambda match: " ",
+}
+
+# Conversation lines that open or close a message and carry no content
+_GREETING_OR_CLOSING = re.compile(
+    r"\b(?:hi|hello|hey|dear|good (?:morning|afternoon|evening)|thanks?|regards|best|cheers|sincerely)\b",
+    re.IGNORECASE
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _intent_replace(match) -> str:
+    return _INTENT_REPLACEMENTS[match.lastgroup](match)
+
+
+class NormalizedText:
+    """
+    The per-service variants of one text, each computed on first use and kept with the
+    others, so a text that reaches several endpoints is normalized once per variant.
+    """
+
+    __slots__ = ("raw", "_collapsed", "_intent", "_conversation_words")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self._collapsed: Optional[str] = None
+        self._intent: Optional[str] = None
+        self._conversation_words: Optional[Tuple[str, ...]] = None
+
+    @property
+    def collapsed(self) -> str:
+        """Whitespace collapsed and ends stripped; case kept. Used for keys and model input."""
+        if self._collapsed is None:
+            self._collapsed = _WHITESPACE.sub(" ", self.raw).strip()
+        return self._collapsed
+
+    @property
+    def intent(self) -> str:
+        """Lowercased, typo-corrected, contractions expanded and special characters removed."""
+        if self._intent is None:
+            self._intent = _INTENT_REPLACER.sub(_intent_replace, self.raw.lower().strip()).strip()
+        return self._intent
+
+    @property
+    def conversation_words(self) -> Tuple[str, ...]:
+        """Words of the conversation with greeting and closing lines dropped."""
+        if self._conversation_words is None:
+            words = []
+            for line in self.raw.splitlines():
+                line = line.strip()
+                if line and not _GREETING_OR_CLOSING.match(line):
+                    words.extend(line.split())
+            self._conversation_words = tuple(words)
+        return self._conversation_words
+
+
+_memo = LRUCache("normalized-text", TEXT_NORMALIZATION_CACHE_SIZE)
+
+
+def normalized(text: str) -> NormalizedText:
+    """
+    Get the normalized variants of a text, memoized per text for longer inputs.
+    """
+    if len(text) < MEMO_MIN_LENGTH:
+        return NormalizedText(text)
+    entry = _memo.get(text)
+    if entry is None:
+        entry = NormalizedText(text)
+        _memo.set(text, entry)
+    return entry
+
+
+def collapse_whitespace(text: Any) -> str:
+    if not text:
+        return ""
+    return normalized(str(text)).collapsed
+
+
+def intent_text(text: str) -> str:
+    if not text:
+        return ""
+    return normalized(text).intent
+
+
+def conversation_text(text: str, max_words: int = 700) -> str:
+    if not text:
+        return ""
+    return " ".join(normalized(text).conversation_words[:max_words])
+
+
+def ticket_text(subject: Optional[str], description: Optional[str]) -> str:
+    """
+    Join subject and description the way the embedding models expect, treating None as empty.
+    """
+    return (subject or "") + TICKET_SEPARATOR + (description or "")